@@ -1,11 +1,16 @@
 from django.contrib import admin
-from .models import Appointment, DataSubjectRightsRequest, BlogCategory, BlogPost, StaffMember, CookieConsent, TrainingInquiry
+from django.utils import timezone
+from .models import Appointment, DataSubjectRightsRequest, BlogCategory, BlogPost, StaffMember, CookieConsent, TrainingInquiry, OutboxEmail
+from .blog_cache import invalidate_all as invalidate_blog_cache
+from .pagination import invalidate_counts
+from .search import search_posts
+from .sitemaps import invalidate as invalidate_sitemap
 
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
-    list_display = ['name', 'email', 'phone', 'created_at', 'data_processing_consent', 'marketing_consent']
-    list_filter = ['created_at', 'data_processing_consent', 'marketing_consent']
+    list_display = ['name', 'email', 'phone', 'subject', 'created_at', 'data_processing_consent', 'marketing_consent']
+    list_filter = ['subject', 'created_at', 'data_processing_consent', 'marketing_consent']
     search_fields = ['name', 'email', 'phone']
     readonly_fields = ['created_at', 'data_processing_consent_date', 'marketing_consent_date']
 
@@ -45,7 +50,7 @@ class BlogPostAdmin(admin.ModelAdmin):
     list_filter = ['status', 'category', 'published_at', 'created_at']
     search_fields = ['title', 'excerpt', 'content']
     prepopulated_fields = {'slug': ('title',)}
-    readonly_fields = ['views_count', 'created_at', 'updated_at']
+    readonly_fields = ['views_count', 'read_time', 'word_count', 'created_at', 'updated_at']
     date_hierarchy = 'published_at'
     
     fieldsets = (
@@ -60,26 +65,41 @@ class BlogPostAdmin(admin.ModelAdmin):
             'fields': ('excerpt', 'content', 'featured_image')
         }),
         ('Ustawienia', {
-            'fields': ('read_time', 'published_at')
+            'fields': ('published_at',)
         }),
         ('Statystyki', {
-            'fields': ('views_count', 'created_at', 'updated_at'),
+            'fields': ('views_count', 'read_time', 'word_count', 'created_at', 'updated_at'),
             'classes': ('collapse',)
         })
     )
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('category')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains over search_fields
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term), False
     
     actions = ['make_published', 'make_draft']
     
     def make_published(self, request, queryset):
+        # Keyset pagination orders by published_at, so it must be set
+        queryset.filter(published_at__isnull=True).update(published_at=timezone.now())
         queryset.update(status='published')
+        # update() skips post_save, so refresh the sitemap and caches explicitly
+        invalidate_sitemap()
+        invalidate_counts()
+        invalidate_blog_cache()
         self.message_user(request, f'{queryset.count()} artykułów zostało opublikowanych.')
     make_published.short_description = 'Opublikuj wybrane artykuły'
     
     def make_draft(self, request, queryset):
         queryset.update(status='draft')
+        invalidate_sitemap()
+        invalidate_counts()
+        invalidate_blog_cache()
         self.message_user(request, f'{queryset.count()} artykułów zostało oznaczonych jako szkic.')
     make_draft.short_description = 'Oznacz jako szkic'
 
@@ -117,6 +137,8 @@ class CookieConsentAdmin(admin.ModelAdmin):
     search_fields = ['ip_address', 'session_key']
     readonly_fields = ['consented_at', 'analytics_consent', 'ip_address', 'session_key', 'user_agent']
     date_hierarchy = 'consented_at'
+    # Skip the unfiltered COUNT(*) over the whole log on every changelist view
+    show_full_result_count = False
 
     fieldsets = (
         ('Wybór użytkownika', {
@@ -143,3 +165,28 @@ class TrainingInquiryAdmin(admin.ModelAdmin):
     search_fields = ["company", "name", "email", "phone"]
     readonly_fields = ["created_at"]
     date_hierarchy = "created_at"
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'kind', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['subject', 'recipients']
+    readonly_fields = ['kind', 'subject', 'body', 'from_email', 'recipients', 'status', 'attempts',
+                       'next_attempt_at', 'last_error', 'created_at', 'sent_at']
+    date_hierarchy = 'created_at'
+
+    actions = ['retry_now']
+
+    def has_add_permission(self, request):
+        # Messages are only queued by the site itself
+        return False
+
+    def retry_now(self, request, queryset):
+        # Already delivered (alone or in a digest) messages would reach the
+        # recipient twice; held ones go out with the next digest anyway
+        updated = queryset.exclude(status__in=['sent', 'digested', 'held']).update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} wiadomości ponownie zakolejkowano.')
+    retry_now.short_description = 'Wyślij ponownie wybrane wiadomości'
@@ -0,0 +1,159 @@
+"""
+Async versions of the blog read paths, the healthcheck and the booking and
+cookie-consent endpoints, routed instead of their app/views.py counterparts
+when ASYNC_VIEWS is on (the ASGI deployment, see project/asgi.py).
+
+Queries go through Django's async ORM and async cache API, so a slow
+database holds a coroutine rather than a whole worker. What has no async API
+runs in a thread with sync_to_async: the booking transaction (the async ORM
+has no transactions), full-text search (raw SQL), the buffered view/consent
+writers and template rendering, which can evaluate lazy objects.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
+
+from . import blog_cache
+from .bot_gate import screen_bots
+from .counters import view_counter
+from .forms import AppointmentForm
+from .ingest import consent_buffer
+from .models import BlogPost
+from .pagination import KeysetPaginator, PageMoved, acached_count
+from .ratelimit import ratelimit
+from .search import search_posts
+from .submissions import idempotent
+from .views import _consentFromRequest, _pingDatabase, _saveBooking, _searchPage
+
+logger = logging.getLogger(__name__)
+
+arender = sync_to_async(render)
+
+
+@ratelimit('5/m')
+@idempotent('book')
+@screen_bots
+async def book(request):
+    if request.method != 'POST':
+        return redirect('home')
+    logger.info("Booking form submitted")
+
+    form = AppointmentForm(request.POST)
+    if not form.is_valid():
+        logger.warning(f"Form validation failed. Errors: {form.errors}")
+        messages.error(request, 'Proszę poprawić błędy w formularzu.')
+        return await arender(request, 'home.html', {'form': form})
+
+    try:
+        await sync_to_async(_saveBooking)(form, request.POST.get('subject', ''))
+    except Exception as e:
+        logger.error(f"Booking failed: {e}", exc_info=True)
+        messages.error(request, 'Wystąpił błąd podczas zapisywania. Spróbuj ponownie lub zadzwoń.')
+        return await arender(request, 'home.html', {'form': form})
+    messages.success(request, 'Wizyta została umówiona pomyślnie!')
+    return redirect('thanks')
+
+
+def _search(posts, search_query, params):
+    return _searchPage(search_posts(posts, search_query), search_query, params)
+
+
+async def blog(request):
+    category_slug = request.GET.get('category', '')
+    search_query = request.GET.get('q', '')
+
+    posts = BlogPost.objects.filter(status='published').select_related('category')
+    if category_slug:
+        posts = posts.filter(category__slug=category_slug)
+
+    if search_query:
+        page_obj, total_posts, pagination = await sync_to_async(_search)(posts, search_query, request.GET)
+    else:
+        total_posts = await acached_count(posts, f'category={category_slug}')
+        paginator = KeysetPaginator(posts, 6, total_posts)
+        try:
+            page_obj = await paginator.apage(request.GET)
+        except PageMoved as moved:
+            return redirect(f'{request.path}{moved.query}')
+        pagination = paginator.links(page_obj, request.GET)
+
+    categories = await blog_cache.aget_categories()
+    selected_category = None
+    if category_slug:
+        selected_category = await blog_cache.aget_category(category_slug)
+        if selected_category is None:
+            raise Http404
+
+    return await arender(request, 'blog.html', {
+        'page_obj': page_obj,
+        'categories': categories,
+        'selected_category': selected_category,
+        'search_query': search_query,
+        'total_posts': total_posts,
+        'pagination': pagination,
+    })
+
+
+async def blog_post_detail(request, slug):
+    post = await blog_cache.aget_post(slug)
+    if post is None:
+        raise Http404
+
+    if post.needs_render:
+        await sync_to_async(post.refresh_rendered_content)()
+        await sync_to_async(blog_cache.invalidate_post)(post)
+
+    await sync_to_async(view_counter.hit)(post.pk)
+
+    return await arender(request, 'blog_post_detail.html', {
+        'post': post,
+        'related_posts': await blog_cache.aget_related_posts(post),
+        'recent_posts': await blog_cache.aget_recent_posts(exclude=post.pk),
+    })
+
+
+async def blog_category(request, slug):
+    category = await blog_cache.aget_category(slug)
+    if category is None:
+        raise Http404
+    posts = BlogPost.objects.filter(category=category, status='published').select_related('category')
+
+    total_posts = await acached_count(posts, f'category={category.slug}')
+    paginator = KeysetPaginator(posts, 6, total_posts)
+    try:
+        page_obj = await paginator.apage(request.GET)
+    except PageMoved as moved:
+        return redirect(f'{request.path}{moved.query}')
+
+    return await arender(request, 'blog_category.html', {
+        'category': category,
+        'page_obj': page_obj,
+        'pagination': paginator.links(page_obj, request.GET),
+        'total_posts': total_posts,
+    })
+
+
+async def healthcheck(request):
+    """Health check endpoint — returns only ok/error, no internal details."""
+    try:
+        await sync_to_async(_pingDatabase)()
+        return HttpResponse("ok", content_type="text/plain", status=200)
+    except Exception as e:
+        logger.error(f"Health check failed: {e}")
+        return HttpResponse("error", content_type="text/plain", status=500)
+
+
+@ratelimit('10/m')
+@require_POST
+async def log_cookie_consent(request):
+    """Async log_cookie_consent (see app/views.py)."""
+    consent = _consentFromRequest(request)
+    if consent is None:
+        return HttpResponse(status=400)
+    # add() flushes inline when the buffer is full
+    await sync_to_async(consent_buffer.add)(consent)
+    return HttpResponse(status=204)
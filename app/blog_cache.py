@@ -0,0 +1,229 @@
+"""
+Cached read models for the public blog pages.
+
+Published posts by slug, related posts per category, the recent-posts list
+and the category list (with published post counts, one query) are kept in
+the Django cache for BLOG_CACHE_TIMEOUT seconds. Entries are deleted by the
+BlogPost/BlogCategory signals in app/signals.py as soon as the data behind
+them changes, so the timeout is only a safety net. Bulk queryset updates
+(admin actions) skip signals and call invalidate_all(), which moves every
+key to a new generation.
+
+Hits and misses are counted per process and added to shared cache counters
+every few seconds; ``manage.py blog_cache_stats`` reports the hit rate.
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+GENERATION_KEY = 'blog:rm:generation'
+HITS_KEY = 'blog:rm:hits'
+MISSES_KEY = 'blog:rm:misses'
+
+RELATED_LIMIT = 3
+RECENT_LIMIT = 5
+
+
+def _timeout():
+    return getattr(settings, 'BLOG_CACHE_TIMEOUT', 300)
+
+
+def _key(name, generation=None):
+    if generation is None:
+        generation = cache.get(GENERATION_KEY, 0)
+    return f'blog:rm:{generation}:{name}'
+
+
+class HitStats:
+    """Per-process hit/miss tallies, pushed to the shared cache periodically."""
+
+    flush_interval = 10
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._last_flush = time.monotonic()
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                return
+            hits, misses = self._hits, self._misses
+            self._hits = self._misses = 0
+            self._last_flush = time.monotonic()
+        self._push(hits, misses)
+
+    def flush(self):
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            self._hits = self._misses = 0
+        self._push(hits, misses)
+
+    def _push(self, hits, misses):
+        for key, value in ((HITS_KEY, hits), (MISSES_KEY, misses)):
+            if not value:
+                continue
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                if not cache.add(key, value, timeout=None):
+                    cache.incr(key, value)
+
+    def totals(self):
+        """Shared (hits, misses) including this process' unflushed tallies."""
+        self.flush()
+        return cache.get(HITS_KEY, 0), cache.get(MISSES_KEY, 0)
+
+    def reset(self):
+        with self._lock:
+            self._hits = self._misses = 0
+        cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+stats = HitStats()
+
+
+@atexit.register
+def _flush_stats_on_exit():
+    try:
+        stats.flush()
+    except Exception:
+        pass
+
+
+def _cached(name, loader):
+    key = _key(name)
+    value = cache.get(key)
+    stats.record(value is not None)
+    if value is None:
+        value = loader()
+        cache.set(key, value, _timeout())
+    return value
+
+
+async def _acached(name, loader):
+    """_cached() for the async views; ``loader`` is a coroutine function."""
+    key = _key(name, await cache.aget(GENERATION_KEY, 0))
+    value = await cache.aget(key)
+    stats.record(value is not None)
+    if value is None:
+        value = await loader()
+        await cache.aset(key, value, _timeout())
+    return value
+
+
+def _published():
+    from .models import BlogPost
+
+    return BlogPost.objects.filter(status='published').select_related('category')
+
+
+def _categories():
+    from .models import BlogCategory
+
+    return BlogCategory.objects.annotate(
+        post_count=Count('blogpost', filter=Q(blogpost__status='published'))
+    )
+
+
+def get_post(slug):
+    """Published post with its category, or None."""
+    # Cache misses too, as False, so unknown slugs don't hit the database
+    return _cached(f'post:{slug}', lambda: _published().filter(slug=slug).first() or False) or None
+
+
+def get_related_posts(post):
+    """Up to RELATED_LIMIT other published posts from the post's category."""
+    if not post.category_id:
+        return []
+    # One extra, so the current post can be dropped without a second query
+    posts = _cached(f'related:{post.category_id}', lambda: list(
+        _published().filter(category_id=post.category_id)[:RELATED_LIMIT + 1]
+    ))
+    return [p for p in posts if p.pk != post.pk][:RELATED_LIMIT]
+
+
+def get_recent_posts(exclude=None):
+    posts = _cached('recent', lambda: list(_published()[:RECENT_LIMIT + 1]))
+    return [p for p in posts if p.pk != exclude][:RECENT_LIMIT]
+
+
+def get_categories():
+    """All categories, each with ``post_count`` of published posts."""
+    return _cached('categories', lambda: list(_categories()))
+
+
+def get_category(slug):
+    return next((c for c in get_categories() if c.slug == slug), None)
+
+
+# Async versions of the lookups above, same keys and values
+
+async def aget_post(slug):
+    async def load():
+        return await _published().filter(slug=slug).afirst() or False
+
+    return await _acached(f'post:{slug}', load) or None
+
+
+async def aget_related_posts(post):
+    if not post.category_id:
+        return []
+
+    async def load():
+        return [p async for p in _published().filter(category_id=post.category_id)[:RELATED_LIMIT + 1]]
+
+    posts = await _acached(f'related:{post.category_id}', load)
+    return [p for p in posts if p.pk != post.pk][:RELATED_LIMIT]
+
+
+async def aget_recent_posts(exclude=None):
+    async def load():
+        return [p async for p in _published()[:RECENT_LIMIT + 1]]
+
+    posts = await _acached('recent', load)
+    return [p for p in posts if p.pk != exclude][:RECENT_LIMIT]
+
+
+async def aget_categories():
+    async def load():
+        return [c async for c in _categories()]
+
+    return await _acached('categories', load)
+
+
+async def aget_category(slug):
+    return next((c for c in await aget_categories() if c.slug == slug), None)
+
+
+def invalidate_post(post, old_slug=None, old_category_id=None):
+    names = {f'post:{post.slug}', 'recent', 'categories'}
+    if old_slug:
+        names.add(f'post:{old_slug}')
+    for category_id in (post.category_id, old_category_id):
+        if category_id:
+            names.add(f'related:{category_id}')
+    cache.delete_many([_key(name) for name in names])
+
+
+def invalidate_category(category, post_slugs=()):
+    names = {'categories', 'recent', f'related:{category.pk}'}
+    # Cached posts carry their category (name, slug) along
+    names.update(f'post:{slug}' for slug in post_slugs)
+    cache.delete_many([_key(name) for name in names])
+
+
+def invalidate_all():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
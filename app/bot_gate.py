@@ -0,0 +1,166 @@
+"""
+Bot screening in front of the form views, before any form is built.
+
+The forms' own honeypot check runs in clean(), after full validation, and a
+rejected submission re-renders the page, so spam paid for all of that (and
+often an SMTP send). ``@screen_bots`` turns obvious bots away first, the
+cheapest checks first:
+
+1. reputation: clients (keyed like the rate limits, see app/ratelimit.py)
+   with BOT_GATE_BLOCK_SCORE points collected within BOT_GATE_SCORE_WINDOW
+   seconds are rejected without looking at the request;
+2. honeypot: ``hp_field`` filled in;
+3. form token: every form carries ``{{ form_token }}``, a signed timestamp of
+   when the page was served (filled in per response on cached pages, like
+   the CSRF token). A missing or forged token, or a submit sooner than
+   BOT_GATE_MIN_SECONDS after the page was served, is rejected; a token
+   older than BOT_GATE_TOKEN_MAX_AGE (a tab left open) only costs points;
+4. duplicates: the same submitted values more than BOT_GATE_DUPLICATE_LIMIT
+   times within BOT_GATE_DUPLICATE_WINDOW seconds, from any client. The
+   limit leaves room for a double click and a retry.
+
+Every rejection adds the reason's POINTS to the client's score and is
+counted per reason; ``manage.py bot_gate_stats`` reports the counts and
+``manage.py bench_bot_gate`` measures the cost of a rejected POST.
+"""
+import functools
+import hashlib
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .ratelimit import client_key
+from .submissions import SUBMISSION_KEY_FIELD
+
+logger = logging.getLogger(__name__)
+
+FORM_TOKEN_FIELD = 'form_ts'
+SIGNING_SALT = 'app.bot_gate'
+# Stands in for the form token in pages stored by @cached_form_page
+FORM_TOKEN_PLACEHOLDER = 'formtokenplaceholder4e1d8a0c93b7'
+# Not part of what a visitor typed, so not part of the duplicate fingerprint
+UNFINGERPRINTED = {'csrfmiddlewaretoken', FORM_TOKEN_FIELD, SUBMISSION_KEY_FIELD, 'hp_field'}
+
+# Rejection reasons and the points each adds to the client's score; an
+# expired token adds points without rejecting
+POINTS = {'reputation': 0, 'honeypot': 10, 'token': 5, 'too_fast': 5, 'duplicate': 3}
+EXPIRED_TOKEN_POINTS = 2
+REJECTED_PREFIX = 'botgate:rejected:'
+SCORE_PREFIX = 'botgate:score:'
+DUPLICATE_PREFIX = 'botgate:dup:'
+
+
+def form_token():
+    return signing.dumps(int(time.time()), salt=SIGNING_SALT, compress=False)
+
+
+def fingerprint(data):
+    """Hash of the submitted values, ignoring case, surrounding space and field order."""
+    values = sorted(
+        (name, [value.strip().lower() for value in data.getlist(name)])
+        for name in data if name not in UNFINGERPRINTED
+    )
+    return hashlib.sha256(json.dumps(values).encode('utf-8')).hexdigest()[:32]
+
+
+def _incr(key, delta=1, timeout=None):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=timeout):
+            return delta
+        return cache.incr(key, delta)
+
+
+def _penalize(client, points):
+    if points:
+        _incr(f'{SCORE_PREFIX}{client}', points, getattr(settings, 'BOT_GATE_SCORE_WINDOW', 3600))
+
+
+def _token_age(token):
+    """Seconds since the token was issued, or None if it is missing or forged."""
+    try:
+        issued = signing.loads(token, salt=SIGNING_SALT)
+    except signing.BadSignature:
+        return None
+    return time.time() - issued if isinstance(issued, int) else None
+
+
+def check(request):
+    """Reason to reject the POST ``request`` (a POINTS key), or None to let it through."""
+    client = client_key(request)
+    if cache.get(f'{SCORE_PREFIX}{client}', 0) >= getattr(settings, 'BOT_GATE_BLOCK_SCORE', 10):
+        return 'reputation'
+    if request.POST.get('hp_field'):
+        return 'honeypot'
+
+    age = _token_age(request.POST.get(FORM_TOKEN_FIELD, ''))
+    if age is None:
+        return 'token'
+    if age < getattr(settings, 'BOT_GATE_MIN_SECONDS', 3):
+        return 'too_fast'
+    if age > getattr(settings, 'BOT_GATE_TOKEN_MAX_AGE', 86400):
+        _penalize(client, EXPIRED_TOKEN_POINTS)
+
+    seen = _incr(
+        f'{DUPLICATE_PREFIX}{fingerprint(request.POST)}',
+        timeout=getattr(settings, 'BOT_GATE_DUPLICATE_WINDOW', 3600),
+    )
+    if seen > getattr(settings, 'BOT_GATE_DUPLICATE_LIMIT', 2):
+        return 'duplicate'
+    return None
+
+
+def screen(request):
+    """check() plus the bookkeeping of a rejection; returns the reason or None."""
+    if request.method != 'POST' or not getattr(settings, 'BOT_GATE_ENABLED', True):
+        return None
+    reason = check(request)
+    if reason:
+        client = client_key(request)
+        _penalize(client, POINTS[reason])
+        _incr(f'{REJECTED_PREFIX}{reason}')
+        logger.info("Bot gate rejected a POST to %s from %s: %s", request.path, client, reason)
+    return reason
+
+
+def rejection_counts():
+    """{reason: rejected requests} over every worker since the last reset."""
+    keys = {f'{REJECTED_PREFIX}{reason}': reason for reason in POINTS}
+    counts = cache.get_many(list(keys))
+    return {reason: counts.get(key, 0) for key, reason in keys.items()}
+
+
+def reset_rejection_counts():
+    cache.delete_many([f'{REJECTED_PREFIX}{reason}' for reason in POINTS])
+
+
+def _rejected():
+    return HttpResponse(
+        'Nie udało się wysłać formularza. Odśwież stronę i spróbuj ponownie.',
+        status=400, content_type='text/plain; charset=utf-8',
+    )
+
+
+def screen_bots(view):
+    """Run screen() before a sync or coroutine form view."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if await sync_to_async(screen, thread_sensitive=False)(request):
+                return _rejected()
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if screen(request):
+            return _rejected()
+        return view(request, *args, **kwargs)
+    return wrapper
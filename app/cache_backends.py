@@ -0,0 +1,442 @@
+"""
+Two-tier cache backend shared across gunicorn workers.
+
+Without CACHES every worker had its own LocMemCache: cold after each restart,
+and the counters, flush locks and invalidations built on the cache (blog read
+models, view counts, listing totals, sitemap) only ever reached one process.
+TieredCache keeps
+
+- a shared tier: an SQLite file (LOCATION) every worker on the host opens, so
+  values, incr()/add() and deletes are seen by all of them and survive
+  restarts. No service to run; writes are serialized by SQLite's lock, which
+  is what makes add() and incr() atomic across processes.
+- a local tier: a per-process LRU of recently read values, bounded by
+  LOCAL_MAX_ENTRIES and LOCAL_MAX_BYTES, each entry kept for at most
+  LOCAL_TIMEOUT seconds.
+
+Local entries are checked against generation counters in a memory-mapped file
+next to the database (``<LOCATION>-gen``): keys hash into SLOTS slots and
+every write bumps its key's slot once it has committed, clear() bumps a
+global one. A worker whose local copy carries an older generation rereads
+the shared tier, so a delete or set in one worker reaches the others on their
+next read while local hits cost no SQLite round trip.
+
+Hits and misses per tier (a local miss is a key known to be absent), sets,
+deletes, evictions and stale local entries are counted per process and
+pushed to the shared tier every few seconds; ``manage.py cache_stats``
+reports the totals.
+
+    CACHES = {'default': {
+        'BACKEND': 'app.cache_backends.TieredCache',
+        'LOCATION': BASE_DIR / 'cache' / 'cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'LOCAL_MAX_ENTRIES': 1000},
+    }}
+"""
+import atexit
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no gunicorn, so a single process and the thread lock suffice
+    fcntl = None
+
+SLOTS = 4096
+CLEAR_SLOT = SLOTS
+_COUNTER = struct.Struct('<Q')
+# Local entry for a key the shared tier doesn't have (never a valid pickle)
+ABSENT = b''
+STAT_NAMES = ('local_hits', 'shared_hits', 'local_misses', 'misses', 'sets', 'deletes', 'evictions', 'stale')
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+)
+
+
+class Generations:
+    """SLOTS + 1 write counters in a memory-mapped file shared by every worker."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._map = None
+        self._fd = None
+
+    def _mapping(self):
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    size = (SLOTS + 1) * _COUNTER.size
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                    if os.fstat(fd).st_size < size:
+                        os.ftruncate(fd, size)
+                    self._fd = fd
+                    self._map = mmap.mmap(fd, size)
+        return self._map
+
+    def read(self, slot):
+        mapping = self._mapping()
+        return (
+            _COUNTER.unpack_from(mapping, slot * _COUNTER.size)[0],
+            _COUNTER.unpack_from(mapping, CLEAR_SLOT * _COUNTER.size)[0],
+        )
+
+    def bump(self, slot):
+        """Increment ``slot``; returns its new value."""
+        mapping = self._mapping()
+        offset = slot * _COUNTER.size
+        with self._lock:
+            if fcntl:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, _COUNTER.size, offset)
+            try:
+                value = _COUNTER.unpack_from(mapping, offset)[0] + 1
+                _COUNTER.pack_into(mapping, offset, value)
+            finally:
+                if fcntl:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, _COUNTER.size, offset)
+        return value
+
+
+class LocalLRU:
+    """Pickled values by key, least recently used evicted first."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(pickled value, generations, expires) or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, blob, generations, expires):
+        """Store an entry; returns how many others were evicted to fit it."""
+        if self.max_entries <= 0 or len(blob) > self.max_bytes:
+            self.pop(key)
+            return 0
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._entries[key] = (blob, generations, expires)
+            self._bytes += len(blob)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted_blob, _, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted_blob)
+                evicted += 1
+        return evicted
+
+    def pop(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TierStats:
+    """Per-process counters, added to the shared ``stats`` table every flush_interval seconds."""
+
+    flush_interval = 5
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(STAT_NAMES, 0)
+        self._last_flush = time.monotonic()
+
+    def record(self, name, n=1):
+        with self._lock:
+            self._counts[name] += n
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                return
+        self.flush()
+
+    def local(self):
+        """This process' unflushed counts."""
+        with self._lock:
+            return dict(self._counts)
+
+    def flush(self):
+        with self._lock:
+            counts = {name: n for name, n in self._counts.items() if n}
+            self._counts = dict.fromkeys(STAT_NAMES, 0)
+            self._last_flush = time.monotonic()
+        if counts:
+            with self._cache._transaction() as db:
+                db.executemany(
+                    'INSERT INTO stats (name, value) VALUES (?, ?) '
+                    'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                    counts.items(),
+                )
+
+    def totals(self):
+        """Counts from every worker, including this process' unflushed ones."""
+        self.flush()
+        totals = dict.fromkeys(STAT_NAMES, 0)
+        totals.update(self._cache._db().execute('SELECT name, value FROM stats').fetchall())
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(STAT_NAMES, 0)
+        with self._cache._transaction() as db:
+            db.execute('DELETE FROM stats')
+
+
+class TieredCache(BaseCache):
+    # Rows are culled down by _cull_frequency once MAX_ENTRIES is exceeded;
+    # the row count is only checked every cull_every writes
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = Path(location)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self.local = LocalLRU(
+            options.get('LOCAL_MAX_ENTRIES', 1000),
+            options.get('LOCAL_MAX_BYTES', 8 * 1024 * 1024),
+        )
+        self.generations = Generations(f'{self.path}-gen')
+        self.stats = TierStats(self)
+        atexit.register(self._flush_stats)
+        self._connections = threading.local()
+        self._writes = 0
+
+    def _flush_stats(self):
+        try:
+            self.stats.flush()
+        except Exception:
+            pass
+
+    # Shared tier
+
+    def _db(self):
+        connection = getattr(self._connections, 'db', None)
+        # A connection opened before gunicorn forked must not be used by the workers
+        if connection is None or self._connections.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._connections.db = connection
+            self._connections.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _fetch(self, db, key):
+        """(pickled value, expires) of a live row, or None."""
+        row = db.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row
+
+    def _cull(self, db):
+        self._writes += 1
+        if self._writes % self.cull_every:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            if self._cull_frequency == 0:
+                db.execute('DELETE FROM cache')
+            else:
+                db.execute(
+                    'DELETE FROM cache WHERE key IN '
+                    '(SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (count // self._cull_frequency,),
+                )
+
+    # Local tier
+
+    def _slot(self, key):
+        return zlib.crc32(key.encode()) % SLOTS
+
+    def _local_get(self, key, default=None):
+        """
+        (True, value) for a current local entry, ``default`` for a key known to
+        be absent; else (False, generations to fill with).
+        """
+        generations = self.generations.read(self._slot(key))
+        entry = self.local.get(key)
+        if entry is not None:
+            blob, entry_generations, expires = entry
+            if entry_generations == generations and expires > time.time():
+                if blob == ABSENT:
+                    self.stats.record('local_misses')
+                    return True, default
+                self.stats.record('local_hits')
+                return True, pickle.loads(blob)
+            self.local.pop(key)
+            if entry_generations != generations:
+                self.stats.record('stale')
+        return False, generations
+
+    def _local_set(self, key, blob, generations, expires):
+        local_expires = time.time() + self.local_timeout
+        if expires is not None:
+            local_expires = min(local_expires, expires)
+        evicted = self.local.set(key, blob, generations, local_expires)
+        if evicted:
+            self.stats.record('evictions', evicted)
+
+    def _written(self, key, blob=None, expires=None, before=None):
+        """
+        Bump ``key``'s generation after a committed write. ``blob`` is kept
+        locally only if nobody else wrote to the slot since ``before`` was read.
+        """
+        slot = self._slot(key)
+        generation = self.generations.bump(slot)
+        self.local.pop(key)
+        if blob is not None and before is not None and generation == before[0] + 1:
+            current = self.generations.read(slot)
+            if current == (generation, before[1]):
+                self._local_set(key, blob, current, expires)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        hit, value = self._local_get(key, default)
+        if hit:
+            return value
+        row = self._fetch(self._db(), key)
+        if row is None:
+            # Unset keys (generation counters before the first bump) are
+            # looked up on every request, so their absence is cached too
+            self.stats.record('misses')
+            self._local_set(key, ABSENT, value, None)
+            return default
+        self.stats.record('shared_hits')
+        self._local_set(key, row[0], value, row[1])
+        return pickle.loads(row[0])
+
+    async def aget(self, key, default=None, version=None):
+        # Local hits don't need a thread hop
+        hit, value = self._local_get(self.make_and_validate_key(key, version=version), default)
+        if hit:
+            return value
+        return await sync_to_async(self.get, thread_sensitive=False)(key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        before = self.generations.read(self._slot(key))
+        with self._transaction() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, blob, expires),
+            )
+            self._cull(db)
+        self.stats.record('sets')
+        self._written(key, blob, expires, before)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        with self._transaction() as db:
+            if self._fetch(db, key) is not None:
+                return False
+            db.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                (key, blob, expires),
+            )
+            self._cull(db)
+        self.stats.record('sets')
+        self._written(key)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._transaction() as db:
+            row = self._fetch(db, key)
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+        self._written(key)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._transaction() as db:
+            if self._fetch(db, key) is None:
+                return False
+            db.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?', (self.get_backend_timeout(timeout), key)
+            )
+        self._written(key)
+        return True
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._transaction() as db:
+            deleted = db.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount
+        self.stats.record('deletes')
+        if deleted:
+            self._written(key)
+        else:
+            self.local.pop(key)
+        return bool(deleted)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        missing = object()
+        hit, value = self._local_get(key, missing)
+        if hit:
+            return value is not missing
+        return self._fetch(self._db(), key) is not None
+
+    def clear(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache')
+        self.generations.bump(CLEAR_SLOT)
+        self.local.clear()
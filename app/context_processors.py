@@ -1,5 +1,9 @@
 from django.conf import settings
 
+from .bot_gate import FORM_TOKEN_PLACEHOLDER, form_token
+from .page_cache import CSRF_PLACEHOLDER
+from .submissions import SUBMISSION_KEY_PLACEHOLDER, submission_key
+
 def site_settings(request):
     return {
         'GA_MEASUREMENT_ID': getattr(settings, 'GA_MEASUREMENT_ID', ''),
@@ -7,3 +11,19 @@ def site_settings(request):
         'PRIMARY_COLOR': '#003366',
         'ACCENT_COLOR': '#006633',
     }
+
+
+def csrf_placeholder(request):
+    # Pages stored by @cached_form_page get the real token substituted later
+    if getattr(request, 'csrf_placeholder', False):
+        return {'csrf_token': CSRF_PLACEHOLDER}
+    return {}
+
+
+def form_tokens(request):
+    # Signed render time for the bot gate (app/bot_gate.py) and the key that
+    # makes resubmits idempotent (app/submissions.py); callables, so only
+    # pages with a form compute them
+    if getattr(request, 'csrf_placeholder', False):
+        return {'form_token': FORM_TOKEN_PLACEHOLDER, 'submission_key': SUBMISSION_KEY_PLACEHOLDER}
+    return {'form_token': form_token, 'submission_key': submission_key}
@@ -0,0 +1,237 @@
+"""
+Per-template critical CSS.
+
+For every page template under app/templates, the template source and
+everything it extends or includes is scanned for the class names and ids it
+can produce (class/id attributes, including the words inside ``{% if %}``
+branches, classes toggled from inline scripts and form widget classes from
+app/forms.py). The CSS bundle is then filtered down to the rules whose
+selectors only need those classes and ids. Type, attribute and universal
+selectors are always kept, since blog content and form widgets produce
+elements the templates don't spell out.
+
+The result is inlined in <head> by ``{% stylesheet %}`` while the full bundle
+loads asynchronously. It is rebuilt during collectstatic (see app/storage.py)
+and stored as CRITICAL_CSS_MANIFEST: {bundle path: {template name: css}}.
+"""
+import json
+import logging
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+
+from .css_bundler import URL_RE
+
+logger = logging.getLogger(__name__)
+
+CRITICAL_CSS_MANIFEST = 'css/critical.json'
+
+TEMPLATE_REF_RE = re.compile(r'{%\s*(?:extends|include)\s+["\']([^"\']+)["\']')
+ATTRIBUTE_RE = re.compile(r'\b(class|id)\s*=\s*"([^"]*)"|\b(class|id)\s*=\s*\'([^\']*)\'')
+SCRIPT_CLASS_RE = re.compile(r'classList\.(?:add|toggle|remove|contains|replace)\(\s*["\']([\w-]+)["\']')
+TEMPLATE_SYNTAX_RE = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.S)
+SELECTOR_NAME_RE = re.compile(r'([.#])(-?[_a-zA-Z][\w-]*)')
+# Parts of a selector that never take part in matching class/id names
+SELECTOR_STRIP_RE = re.compile(r'\[[^\]]*\]|"[^"]*"|\'[^\']*\'')
+# Interaction states can't be on screen at first paint
+INTERACTIVE_RE = re.compile(r':(hover|focus|focus-visible|focus-within|active)\b')
+TEMPLATE_ROOT = Path(__file__).resolve().parent / 'templates'
+# Widget classes set in Python (attrs={"class": ...}) rather than in templates
+FORMS_MODULE = Path(__file__).resolve().parent / 'forms.py'
+WIDGET_CLASS_RE = re.compile(r'["\']class["\']\s*:\s*["\']([^"\']+)["\']')
+
+
+def template_sources(name, root=TEMPLATE_ROOT, seen=None):
+    """Source of ``name`` plus every template it extends or includes."""
+    seen = set() if seen is None else seen
+    if name in seen:
+        return ''
+    seen.add(name)
+    try:
+        source = (root / name).read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return ''
+    parts = [source]
+    for ref in TEMPLATE_REF_RE.findall(source):
+        parts.append(template_sources(ref, root, seen))
+    return '\n'.join(parts)
+
+
+def used_names(source):
+    """({class names}, {ids}) a template can render."""
+    classes, ids = set(), set()
+    for match in ATTRIBUTE_RE.finditer(source):
+        kind = match.group(1) or match.group(3)
+        value = match.group(2) if match.group(2) is not None else match.group(4)
+        # Keep the literal words from {% if %} branches, drop the tags themselves
+        words = TEMPLATE_SYNTAX_RE.sub(' ', value).split()
+        (classes if kind == 'class' else ids).update(words)
+    classes.update(SCRIPT_CLASS_RE.findall(source))
+    for value in WIDGET_CLASS_RE.findall(FORMS_MODULE.read_text(encoding='utf-8')):
+        classes.update(value.split())
+    return classes, ids
+
+
+def _split_top_level(text, separator):
+    parts, depth, start, quote = [], 0, 0, None
+    for index, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:index])
+            start = index + 1
+    parts.append(text[start:])
+    return parts
+
+
+def parse(css):
+    """
+    Split a stylesheet into top-level (prelude, body) pairs; ``body`` is None
+    for statements such as @import.
+    """
+    blocks, index, n = [], 0, len(css)
+    while index < n:
+        start, depth, quote = index, 0, None
+        prelude_end = None
+        while index < n:
+            char = css[index]
+            if quote:
+                if char == '\\':
+                    index += 1
+                elif char == quote:
+                    quote = None
+            elif char in '"\'':
+                quote = char
+            elif css.startswith('/*', index):
+                index = css.find('*/', index + 2)
+                index = n if index == -1 else index + 1
+            elif char == '{':
+                if depth == 0:
+                    prelude_end = index
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    blocks.append((css[start:prelude_end].strip(), css[prelude_end + 1:index]))
+                    index += 1
+                    break
+            elif char == ';' and depth == 0:
+                blocks.append((css[start:index].strip(), None))
+                index += 1
+                break
+            index += 1
+        else:
+            tail = css[start:].strip()
+            if tail and not tail.startswith('/*'):
+                blocks.append((tail, None))
+    return blocks
+
+
+def _selector_matches(selector, classes, ids):
+    if INTERACTIVE_RE.search(selector):
+        return False
+    for kind, name in SELECTOR_NAME_RE.findall(SELECTOR_STRIP_RE.sub('', selector)):
+        if name not in (classes if kind == '.' else ids):
+            return False
+    return True
+
+
+def extract(css, classes, ids):
+    """The subset of ``css`` that can apply to a page with these classes and ids."""
+    out = []
+    for prelude, body in parse(css):
+        if body is None:
+            # @import / @charset: the async bundle brings remote imports
+            continue
+        if prelude.startswith('@'):
+            keyword = prelude.split(None, 1)[0].lower()
+            if keyword in ('@media', '@supports', '@layer', '@container'):
+                inner = extract(body, classes, ids)
+                if inner:
+                    out.append(f'{prelude}{{{inner}}}')
+            elif keyword == '@font-face':
+                out.append(f'{prelude}{{{body}}}')
+            # @keyframes etc. only matter once things move; the bundle has them
+            continue
+        selectors = [s.strip() for s in _split_top_level(prelude, ',')]
+        kept = [s for s in selectors if _selector_matches(s, classes, ids)]
+        if kept:
+            out.append(f"{','.join(kept)}{{{body}}}")
+    return ''.join(out)
+
+
+def _absolute_urls(css, base_url):
+    """Inline <style> resolves url() against the page, so anchor relative ones."""
+    def replace(match):
+        url = next(g for g in (match.group('dq'), match.group('sq'), match.group('bare')) if g is not None)
+        if not url or url.startswith(('data:', 'http:', 'https:', '//', '/', '#')):
+            return match.group(0)
+        return f'url("{posixpath.normpath(posixpath.join(base_url, url))}")'
+    return URL_RE.sub(replace, css)
+
+
+def page_templates(root=TEMPLATE_ROOT):
+    """Top-level page templates (the ones that extend a layout)."""
+    return sorted(
+        path.name for path in root.glob('*.html')
+        if re.search(r'{%\s*extends\b', path.read_text(encoding='utf-8'))
+    )
+
+
+def build(bundle_css, bundle_url):
+    """
+    Return ({template: critical css}, report) for every page template.
+
+    ``bundle_url`` is the URL of the stylesheet the CSS came from; relative
+    url()s are made absolute against it. The report lists
+    (template, critical bytes, bundle bytes) per page.
+    """
+    base_url = posixpath.dirname(bundle_url)
+    bundle_css = _absolute_urls(bundle_css, base_url)
+    size = len(bundle_css.encode('utf-8'))
+    critical, report = {}, []
+    for name in page_templates():
+        classes, ids = used_names(template_sources(name))
+        css = extract(bundle_css, classes, ids)
+        critical[name] = css
+        report.append((name, len(css.encode('utf-8')), size))
+    return critical, report
+
+
+def format_report(report):
+    lines = []
+    for name, critical_size, bundle_size in report:
+        saved = bundle_size - critical_size
+        lines.append(
+            f'{name:<28} {critical_size / 1024:6.1f} KB inline, '
+            f'{saved / 1024:6.1f} KB ({saved / bundle_size:.0%}) off the critical path'
+        )
+    return '\n'.join(lines)
+
+
+_loaded = None
+
+
+def critical_css_for(bundle_path, template_name):
+    """Critical CSS built by the last collectstatic, or None."""
+    global _loaded
+    if _loaded is None:
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        try:
+            with staticfiles_storage.open(CRITICAL_CSS_MANIFEST) as handle:
+                _loaded = json.loads(handle.read().decode('utf-8'))
+        except (OSError, ValueError):
+            if not settings.DEBUG:
+                logger.warning("No %s; run collectstatic to build critical CSS", CRITICAL_CSS_MANIFEST)
+            _loaded = {}
+    return _loaded.get(bundle_path, {}).get(template_name)
@@ -0,0 +1,191 @@
+"""
+CSS bundler used by collectstatic (see app/storage.py).
+
+Follows the local ``@import`` graph of an entry stylesheet depth-first,
+rebases relative ``url()`` references onto the bundle's directory, strips
+comments and whitespace and returns one stylesheet plus a version 3 source
+map. Remote imports (Google Fonts) can't be inlined; they are hoisted to the
+top of the bundle, where CSS requires them to be.
+
+Minification is deliberately conservative (no selector or value rewriting),
+so the bundle renders exactly like the split files.
+"""
+import json
+import posixpath
+import re
+
+IMPORT_RE = re.compile(
+    r'@import\s+(?:url\(\s*(?P<q1>["\']?)(?P<url1>[^"\')]+)(?P=q1)\s*\)|(?P<q2>["\'])(?P<url2>[^"\']+)(?P=q2))'
+    r'\s*(?P<media>[^;]*);'
+)
+URL_RE = re.compile(r'''url\(\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[^)\s]*))\s*\)''')
+# Whitespace next to these characters never matters
+TIGHT_RE = re.compile(r'\s*([{};,>])\s*')
+BASE64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+
+class CSSBundleError(Exception):
+    pass
+
+
+def _is_remote(url):
+    return url.startswith(('http://', 'https://', '//'))
+
+
+def _strip_comments(css):
+    """Drop /* */ comments (outside strings), keeping line breaks for the source map."""
+    out = []
+    i, n = 0, len(css)
+    quote = None
+    while i < n:
+        char = css[i]
+        if quote:
+            out.append(char)
+            if char == '\\' and i + 1 < n:
+                out.append(css[i + 1])
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+            out.append(char)
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            out.append('\n' * css.count('\n', i, end))
+            i = end
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return ''.join(out)
+
+
+def _minify_line(line):
+    """Collapse whitespace outside strings."""
+    parts = re.split(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', line)
+    for index in range(0, len(parts), 2):
+        part = TIGHT_RE.sub(r'\1', re.sub(r'\s+', ' ', parts[index]))
+        # Space after a colon is never significant (before one it can be: "a :hover")
+        parts[index] = re.sub(r':\s+', ':', part)
+    return ''.join(parts).strip()
+
+
+def _vlq(value):
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    encoded = ''
+    while True:
+        digit = value & 31
+        value >>= 5
+        if value:
+            digit |= 32
+        encoded += BASE64[digit]
+        if not value:
+            return encoded
+
+
+class Bundle:
+    def __init__(self, output_path, read):
+        """``read(path)`` returns the text of a static path or raises KeyError."""
+        self.output_path = output_path
+        self.output_dir = posixpath.dirname(output_path)
+        self.read = read
+        self.remote_imports = []
+        self.sources = []
+        self.sources_content = []
+        # (generated column, source index, source line) per output chunk
+        self.segments = []
+        self.chunks = []
+        self.column = 0
+
+    def add(self, path, stack=()):
+        if path in stack:
+            raise CSSBundleError(f"Circular @import: {' -> '.join(stack + (path,))}")
+        try:
+            text = self.read(path)
+        except KeyError:
+            raise CSSBundleError(f'{stack[-1] if stack else path} imports missing {path}')
+
+        source_index = len(self.sources)
+        self.sources.append(posixpath.relpath(path, self.output_dir))
+        self.sources_content.append(text)
+        base_dir = posixpath.dirname(path)
+
+        for line_number, line in enumerate(_strip_comments(text).split('\n')):
+            position = 0
+            for match in IMPORT_RE.finditer(line):
+                self._emit_css(line[position:match.start()], base_dir, source_index, line_number)
+                self._import(match, base_dir, source_index, line_number, stack + (path,))
+                position = match.end()
+            self._emit_css(line[position:], base_dir, source_index, line_number)
+
+    def _import(self, match, base_dir, source_index, line_number, stack):
+        url = match.group('url1') or match.group('url2')
+        media = match.group('media').strip()
+        if _is_remote(url):
+            self.remote_imports.append(f'@import url("{url}"){" " + media if media else ""};')
+            return
+        if media:
+            self._emit(f'@media {media}{{', source_index, line_number)
+        self.add(posixpath.normpath(posixpath.join(base_dir, url)), stack)
+        if media:
+            self._emit('}', source_index, line_number)
+
+    def _emit_css(self, text, base_dir, source_index, line_number):
+        text = URL_RE.sub(lambda m: self._rebase(m, base_dir), text)
+        self._emit(_minify_line(text), source_index, line_number)
+
+    def _rebase(self, match, base_dir):
+        url = match.group('dq') if match.group('dq') is not None else (
+            match.group('sq') if match.group('sq') is not None else match.group('bare')
+        )
+        if not url or _is_remote(url) or url.startswith(('data:', '/', '#')):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(base_dir, url))
+        return f'url("{posixpath.relpath(target, self.output_dir)}")'
+
+    def _emit(self, text, source_index, line_number):
+        if not text:
+            return
+        previous = self.chunks[-1] if self.chunks else ''
+        if previous.endswith(';') and text.startswith('}'):
+            # "a:b;}" -> "a:b}"
+            self.chunks[-1] = previous = previous[:-1]
+            self.column -= 1
+        elif previous and not (previous[-1] in '{};,>' or text[0] in '{};,>'):
+            # Selectors and values split across lines need their separator back
+            text = ' ' + text
+        self.segments.append((self.column, source_index, line_number))
+        self.chunks.append(text)
+        self.column += len(text)
+
+    def css(self):
+        map_name = posixpath.basename(self.output_path) + '.map'
+        header = ''.join(self.remote_imports)
+        return f'{header}{"".join(self.chunks)}\n/*# sourceMappingURL={map_name} */\n', len(header)
+
+    def source_map(self, offset=0):
+        mappings = []
+        previous = (0, 0, 0)
+        for column, source, line in self.segments:
+            column += offset
+            mappings.append(
+                _vlq(column - previous[0]) + _vlq(source - previous[1]) + _vlq(line - previous[2]) + 'A'
+            )
+            previous = (column, source, line)
+        return json.dumps({
+            'version': 3,
+            'file': posixpath.basename(self.output_path),
+            'sources': self.sources,
+            'sourcesContent': self.sources_content,
+            'names': [],
+            'mappings': ','.join(mappings),
+        })
+
+
+def build(entry, output_path, read):
+    """Bundle ``entry`` into ``output_path``; returns (css, source_map) as text."""
+    bundle = Bundle(output_path, read)
+    bundle.add(entry)
+    css, offset = bundle.css()
+    return css, bundle.source_map(offset)
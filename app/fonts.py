@@ -0,0 +1,231 @@
+"""
+Self-hosted, subset web fonts.
+
+``manage.py subset_fonts`` takes the families and weights in WEB_FONTS (from
+Google Fonts, or from a directory of TTF/OTF/WOFF2 files), cuts each face
+down to the Latin + Polish characters the site can render (see characters())
+and writes them as WOFF2 to app/static/fonts/. It also generates
+css/base/fonts.css with the @font-face rules, points main.css at it instead of
+fonts.googleapis.com and records the faces in FONTS_MANIFEST.
+
+Once the manifest exists, ``{% font_preloads %}`` preloads the WEB_FONT_PRELOAD
+faces and settings drop fonts.gstatic.com from the CSP font-src. Before it
+exists nothing changes.
+
+fontTools and brotli are only needed to run the command, not to serve the
+site: ``pip install fonttools brotli``.
+"""
+import io
+import json
+import re
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+
+STATIC_DIR = Path(__file__).resolve().parent / 'static'
+FONTS_DIR = STATIC_DIR / 'fonts'
+FONTS_MANIFEST = FONTS_DIR / 'fonts.json'
+FONTS_CSS = STATIC_DIR / 'css' / 'base' / 'fonts.css'
+MAIN_CSS = STATIC_DIR / 'css' / 'main.css'
+TEMPLATE_ROOT = Path(__file__).resolve().parent / 'templates'
+
+GOOGLE_FONTS_CSS = 'https://fonts.googleapis.com/css2'
+GOOGLE_IMPORT_RE = re.compile(
+    r"(?:/\*[^*]*Google Fonts[^*]*\*/\s*)?@import\s+url\(\s*['\"]?https://fonts\.googleapis\.com/[^)]*\)\s*;"
+)
+FONTS_IMPORT = "/* Fonts (self-hosted, generated by manage.py subset_fonts) */\n@import url('base/fonts.css');"
+FONT_FACE_RE = re.compile(r'@font-face\s*{([^}]*)}')
+SRC_URL_RE = re.compile(r'url\(\s*["\']?([^"\')]+)')
+
+# Always kept, whether or not a template uses them today: printable ASCII,
+# Polish letters and the typographic punctuation Polish text uses
+BASE_CHARACTERS = (
+    ''.join(chr(c) for c in range(0x20, 0x7F))
+    + 'ąćęłńóśźżĄĆĘŁŃÓŚŹŻ'
+    + '\u00a0–—„”“’‘…•·«»€©®™°×'
+)
+# Scanned characters outside these ranges (emoji, other scripts) are left to
+# the fallback fonts
+LATIN_RANGES = (
+    (0x20, 0x7E), (0xA0, 0x24F), (0x1E00, 0x1EFF),
+    (0x2000, 0x206F), (0x20A0, 0x20CF), (0x2100, 0x214F), (0x2190, 0x21FF),
+)
+SOURCE_PATTERNS = ('*.ttf', '*.otf', '*.woff', '*.woff2')
+
+
+class FontError(Exception):
+    pass
+
+
+def _is_latin(char):
+    return any(start <= ord(char) <= end for start, end in LATIN_RANGES)
+
+
+def characters(extra_text=()):
+    """
+    Characters the fonts need: BASE_CHARACTERS plus every Latin character in
+    the templates, in app/*.py (form labels, flash messages), in the JS that
+    writes text into the page and in ``extra_text`` (blog posts).
+    """
+    texts = [path.read_text(encoding='utf-8') for path in TEMPLATE_ROOT.rglob('*.html')]
+    texts += [path.read_text(encoding='utf-8') for path in TEMPLATE_ROOT.parent.glob('*.py')]
+    texts += [path.read_text(encoding='utf-8') for path in (STATIC_DIR / 'js').rglob('*.js')]
+    texts += list(extra_text)
+    used = {char for text in texts for char in text if _is_latin(char)}
+    return set(BASE_CHARACTERS) | used
+
+
+def unicode_range(codepoints):
+    """CSS unicode-range for a set of code points, merged into runs."""
+    runs = []
+    for codepoint in sorted(codepoints):
+        if runs and runs[-1][1] == codepoint - 1:
+            runs[-1][1] = codepoint
+        else:
+            runs.append([codepoint, codepoint])
+    return ','.join(f'U+{a:X}' if a == b else f'U+{a:X}-{b:X}' for a, b in runs)
+
+
+def slug(family):
+    return re.sub(r'[^a-z0-9]+', '-', family.lower()).strip('-')
+
+
+def _fetch(url, timeout=30):
+    request = urllib.request.Request(url, headers={'User-Agent': 'spektrumumyslu-subset-fonts'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read()
+    except OSError as exc:
+        raise FontError(f'Fetching {url} failed: {exc}')
+
+
+def google_sources(families):
+    """Font files behind the Google Fonts CSS for ``families`` ({family: [weights]})."""
+    query = '&'.join(
+        f"family={family.replace(' ', '+')}:wght@{';'.join(str(w) for w in sorted(weights))}"
+        for family, weights in families.items()
+    )
+    # Without a browser User-Agent Google serves plain TrueType, one file per weight
+    css = _fetch(f'{GOOGLE_FONTS_CSS}?{query}').decode('utf-8')
+    urls = []
+    for body in FONT_FACE_RE.findall(css):
+        match = SRC_URL_RE.search(body)
+        if match and match.group(1) not in urls:
+            urls.append(match.group(1))
+    if not urls:
+        raise FontError('Google Fonts returned no @font-face rules')
+    return [_fetch(url) for url in urls]
+
+
+def directory_sources(directory):
+    paths = sorted(p for pattern in SOURCE_PATTERNS for p in Path(directory).glob(pattern))
+    if not paths:
+        raise FontError(f'No font files in {directory}')
+    return [path.read_bytes() for path in paths]
+
+
+def _describe(font):
+    """(family, weight or (min, max) for variable fonts, italic) of a TTFont."""
+    names = font['name']
+    family = str(names.getName(16, 3, 1, 0x409) or names.getName(1, 3, 1, 0x409) or names.getDebugName(1))
+    italic = bool(font['OS/2'].fsSelection & 1)
+    if 'fvar' in font:
+        for axis in font['fvar'].axes:
+            if axis.axisTag == 'wght':
+                return family, (axis.minValue, axis.maxValue), italic
+    return family, font['OS/2'].usWeightClass, italic
+
+
+def _face(fonts, family, weight):
+    """Upright ``family`` at ``weight`` from the loaded fonts, instancing variable ones."""
+    from fontTools.ttLib import TTFont
+    from fontTools.varLib import instancer
+
+    for data in fonts:
+        font = TTFont(io.BytesIO(data))
+        name, weights, italic = _describe(font)
+        if name != family or italic:
+            continue
+        if weights == weight:
+            return font
+        if isinstance(weights, tuple) and weights[0] <= weight <= weights[1]:
+            # Pin every axis: wght to the weight, the others (opsz, ...) to their defaults
+            location = {axis.axisTag: axis.defaultValue for axis in font['fvar'].axes}
+            location['wght'] = weight
+            return instancer.instantiateVariableFont(font, location, updateFontNames=False)
+    raise FontError(f'No source font for {family} {weight}')
+
+
+def subset(font, chars):
+    """WOFF2 bytes of ``font`` reduced to ``chars``, and the code points it kept."""
+    from fontTools import subset as ft_subset
+
+    codepoints = {ord(c) for c in chars} & set(font.getBestCmap())
+    options = ft_subset.Options()
+    options.flavor = 'woff2'
+    options.hinting = False
+    options.desubroutinize = True
+    subsetter = ft_subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    font.flavor = 'woff2'
+    buffer = io.BytesIO()
+    font.save(buffer)
+    return buffer.getvalue(), codepoints
+
+
+def build(sources, chars, families=None, preload=None):
+    """
+    Subset every WEB_FONTS face from ``sources`` (font file bytes) and write the
+    WOFF2 files, fonts.css and FONTS_MANIFEST. Returns the manifest faces.
+    """
+    try:
+        import brotli  # noqa: F401 (fontTools needs it for WOFF2)
+        import fontTools  # noqa: F401
+    except ImportError:
+        raise FontError('subset_fonts needs fontTools and brotli: pip install fonttools brotli')
+
+    families = families if families is not None else settings.WEB_FONTS
+    preload = preload if preload is not None else getattr(settings, 'WEB_FONT_PRELOAD', [])
+    preload = {tuple(face) for face in preload}
+    FONTS_DIR.mkdir(parents=True, exist_ok=True)
+    faces, rules = [], []
+    for family, weights in families.items():
+        for weight in sorted(weights):
+            data, codepoints = subset(_face(sources, family, weight), chars)
+            path = f'fonts/{slug(family)}-{weight}.woff2'
+            (STATIC_DIR / path).write_bytes(data)
+            faces.append({'family': family, 'weight': weight, 'file': path, 'bytes': len(data),
+                          'preload': (family, weight) in preload})
+            rules.append(
+                f"@font-face {{\n  font-family: '{family}';\n  font-style: normal;\n"
+                f"  font-weight: {weight};\n  font-display: swap;\n"
+                f"  src: url('../../{path}') format('woff2');\n"
+                f"  unicode-range: {unicode_range(codepoints)};\n}}\n"
+            )
+
+    FONTS_CSS.write_text(
+        '/* Generated by `manage.py subset_fonts` from WEB_FONTS; do not edit by hand. */\n\n'
+        + '\n'.join(rules), encoding='utf-8'
+    )
+    main_css = MAIN_CSS.read_text(encoding='utf-8')
+    MAIN_CSS.write_text(GOOGLE_IMPORT_RE.sub(lambda m: FONTS_IMPORT, main_css), encoding='utf-8')
+    FONTS_MANIFEST.write_text(json.dumps({'faces': faces}, indent=2) + '\n', encoding='utf-8')
+    return faces
+
+
+_manifest = None
+
+
+def preload_files():
+    """Static paths of the faces to preload, or None while fonts aren't self-hosted."""
+    global _manifest
+    if _manifest is None:
+        try:
+            _manifest = json.loads(FONTS_MANIFEST.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            _manifest = {}
+    if not _manifest:
+        return None
+    return [face['file'] for face in _manifest.get('faces', []) if face.get('preload')]
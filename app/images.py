@@ -0,0 +1,109 @@
+"""
+Responsive image variants, generated during collectstatic.
+
+Every static image matching RESPONSIVE_IMAGE_SOURCES is resized with Pillow
+to each width in RESPONSIVE_IMAGE_WIDTHS that is smaller than the original
+(plus the original width), in AVIF, WebP and the source format. Variants are
+written as ``images/responsive/<name>-<width>w.<ext>`` before the manifest
+storage hashes them, and RESPONSIVE_IMAGES_INDEX records, per source, its
+intrinsic size and the variant paths. ``{% responsive_img %}`` (see
+app/templatetags/assets.py) turns that into <picture>/srcset markup.
+"""
+import fnmatch
+import io
+import json
+import logging
+import posixpath
+
+from django.conf import settings
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+RESPONSIVE_IMAGES_INDEX = 'images/responsive.json'
+VARIANT_DIR = 'images/responsive'
+
+# Pillow format, file extension, MIME type, save options
+FORMATS = {
+    'avif': ('AVIF', 'avif', 'image/avif', {'quality': 55}),
+    'webp': ('WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'png', 'image/png', {'optimize': True}),
+}
+
+
+def is_source(path):
+    patterns = getattr(settings, 'RESPONSIVE_IMAGE_SOURCES', [])
+    return not path.startswith(VARIANT_DIR + '/') and any(fnmatch.fnmatch(path, p) for p in patterns)
+
+
+def _target_formats(image):
+    fallback = 'png' if image.mode in ('RGBA', 'LA', 'P') else 'jpeg'
+    modern = [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+    return modern + [fallback]
+
+
+def generate(path, data):
+    """
+    Return (index entry, [(variant path, bytes)]) for the image at ``path``.
+    """
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    width, height = image.size
+    widths = sorted({w for w in getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', []) if w < width} | {width})
+    stem = posixpath.splitext(posixpath.basename(path))[0]
+
+    entry = {'width': width, 'height': height, 'sources': {}}
+    files = []
+    for fmt in _target_formats(image):
+        pillow_format, extension, mime, options = FORMATS[fmt]
+        variants = []
+        for target in widths:
+            resized = image if target == width else image.resize(
+                (target, round(height * target / width)), Image.LANCZOS
+            )
+            if fmt == 'jpeg' and resized.mode != 'RGB':
+                resized = resized.convert('RGB')
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            variant_path = f'{VARIANT_DIR}/{stem}-{target}w.{extension}'
+            files.append((variant_path, buffer.getvalue()))
+            variants.append([target, variant_path])
+        entry['sources'][mime] = variants
+    entry['fallback'] = mime
+    return entry, files
+
+
+_index = None
+
+
+def image_info(path):
+    """Index entry written by the last collectstatic for ``path``, or None."""
+    global _index
+    if _index is None:
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        try:
+            with staticfiles_storage.open(RESPONSIVE_IMAGES_INDEX) as handle:
+                _index = json.loads(handle.read().decode('utf-8'))
+        except (OSError, ValueError):
+            _index = {}
+    return _index.get(path)
+
+
+def intrinsic_size(path):
+    """(width, height) straight from the source file, for DEBUG / no index."""
+    from django.contrib.staticfiles import finders
+
+    source = finders.find(path)
+    if not source:
+        return None
+    try:
+        with Image.open(source) as image:
+            return ImageOps.exif_transpose(image).size
+    except OSError:
+        return None
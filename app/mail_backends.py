@@ -0,0 +1,175 @@
+"""
+Pooled SMTP email backend.
+
+Django's SMTP backend opens (and TLS-handshakes, and authenticates) a fresh
+connection for every send_mail() call. PooledSMTPBackend keeps up to
+EMAIL_POOL_SIZE authenticated connections per process and per SMTP account,
+NOOP-checks a connection that sat idle before reusing it, and spreads a
+multi-message batch over at most EMAIL_POOL_CONCURRENCY connections.
+
+Select it with EMAIL_BACKEND = 'app.mail_backends.PooledSMTPBackend'. The
+``smtp_sink`` management command runs a local SMTP server for offline
+benchmarks.
+"""
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """Bounded LIFO pool of open Django SMTP backends for one account."""
+
+    def __init__(self, factory, size, max_idle):
+        self._factory = factory
+        self._size = size
+        self._max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        while True:
+            try:
+                backend, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if self._healthy(backend, released_at):
+                return backend
+            self.discard(backend)
+
+        with self._lock:
+            can_create = self._created < self._size
+            if can_create:
+                self._created += 1
+        if can_create:
+            backend = self._factory()
+            try:
+                backend.open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            return backend
+
+        backend, released_at = self._idle.get(timeout=timeout)
+        if self._healthy(backend, released_at):
+            return backend
+        self.discard(backend)
+        return self.acquire(timeout)
+
+    def release(self, backend):
+        self._idle.put((backend, time.monotonic()))
+
+    def discard(self, backend):
+        try:
+            backend.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    def close_all(self):
+        while True:
+            try:
+                backend, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self.discard(backend)
+
+    def _healthy(self, backend, released_at):
+        if backend.connection is None:
+            return False
+        idle = time.monotonic() - released_at
+        if idle > self._max_idle:
+            return False
+        if idle < 1:
+            # Just used successfully; skip the NOOP round-trip
+            return True
+        try:
+            return backend.connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PooledSMTPBackend(BaseEmailBackend):
+    def __init__(self, host=None, port=None, username=None, password=None,
+                 use_tls=None, use_ssl=None, timeout=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.options = {
+            'host': host or settings.EMAIL_HOST,
+            'port': port or settings.EMAIL_PORT,
+            'username': settings.EMAIL_HOST_USER if username is None else username,
+            'password': settings.EMAIL_HOST_PASSWORD if password is None else password,
+            'use_tls': settings.EMAIL_USE_TLS if use_tls is None else use_tls,
+            'use_ssl': settings.EMAIL_USE_SSL if use_ssl is None else use_ssl,
+            'timeout': settings.EMAIL_TIMEOUT if timeout is None else timeout,
+        }
+        self.concurrency = max(1, getattr(settings, 'EMAIL_POOL_CONCURRENCY', 2))
+
+    @property
+    def pool(self):
+        key = tuple(self.options[k] for k in ('host', 'port', 'username', 'use_tls', 'use_ssl'))
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = SMTPConnectionPool(
+                    factory=lambda: SMTPBackend(fail_silently=False, **self.options),
+                    size=max(1, getattr(settings, 'EMAIL_POOL_SIZE', 2)),
+                    max_idle=getattr(settings, 'EMAIL_POOL_MAX_IDLE', 60),
+                )
+            return _pools[key]
+
+    def open(self):
+        # Connections are borrowed from the pool per send_messages() call
+        return False
+
+    def close(self):
+        pass
+
+    def send_messages(self, email_messages):
+        email_messages = list(email_messages)
+        if not email_messages:
+            return 0
+
+        workers = min(self.concurrency, len(email_messages))
+        if workers == 1:
+            return self._send_batch(email_messages)
+
+        # Round-robin so every connection gets a similar share
+        batches = [email_messages[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return sum(executor.map(self._send_batch, batches))
+
+    def _send_batch(self, email_messages):
+        """Send messages over one pooled connection; returns the number sent."""
+        pool = self.pool
+        try:
+            backend = pool.acquire(timeout=self.options['timeout'])
+        except Exception:
+            if not self.fail_silently:
+                raise
+            return 0
+
+        sent = 0
+        try:
+            for message in email_messages:
+                if backend._send(message):
+                    sent += 1
+        except Exception:
+            pool.discard(backend)
+            if not self.fail_silently:
+                raise
+        else:
+            pool.release(backend)
+        return sent
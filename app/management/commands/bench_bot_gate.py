@@ -0,0 +1,121 @@
+"""
+Measure what a rejected bot POST costs with and without the bot gate
+(app/bot_gate.py).
+
+Each kind of bot submission is POSTed to /book/ through the full middleware
+stack with the gate off (the view builds and validates the form, re-renders
+the page or saves the booking) and on (rejected by screen() before the view
+runs), and screen() is timed on its own. Every request comes from its own
+address so the rate limits stay out of the way. Runs against a throwaway
+database and cache, so no bookings or bot-gate scores are left behind.
+"""
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import override_settings
+
+from app.bot_gate import SCORE_PREFIX, SIGNING_SALT, form_token, screen
+
+CASES = ('honeypot', 'token', 'too_fast', 'duplicate', 'reputation')
+
+
+def _address(n):
+    return f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the cost per rejected bot POST with the bot gate off and on, '
+        'on a throwaway database and cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='POSTs per case and mode (default 200).')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(
+                    CACHES={'default': {
+                        'BACKEND': 'app.cache_backends.TieredCache',
+                        'LOCATION': Path(tmp) / 'cache.sqlite3',
+                    }},
+                    ALLOWED_HOSTS=['testserver'],
+                    SECURE_SSL_REDIRECT=False,
+                ):
+                    self.run_benchmark(options['requests'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_benchmark(self, count):
+        self.sequence = 0
+        client = Client()
+        # Compile templates and open connections before timing
+        for enabled in (False, True):
+            with override_settings(BOT_GATE_ENABLED=enabled):
+                self.post(client, self.payload('honeypot'))
+
+        self.stdout.write(f"POST /book/, {count} request(s) per case\n"
+                          f"{'case':<12}{'gate off ms':>12}{'gate on ms':>12}{'screen() us':>13}")
+        for case in CASES:
+            timings = {}
+            for enabled in (False, True):
+                with override_settings(BOT_GATE_ENABLED=enabled):
+                    timings[enabled] = statistics.mean(
+                        self.post(client, self.payload(case)) for _ in range(count)
+                    )
+            screen_us = statistics.mean(self.screen(case) for _ in range(count)) * 1e6
+            self.stdout.write(
+                f'{case:<12}{timings[False] * 1000:>12.2f}{timings[True] * 1000:>12.2f}{screen_us:>13.0f}'
+            )
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def payload(self, case):
+        """(POST data, client address) of one bot submission of ``case``."""
+        self.sequence += 1
+        n = self.sequence
+        # Old enough to pass the minimum fill-in time
+        issued = int(time.time()) - settings.BOT_GATE_MIN_SECONDS - 60
+        data = {
+            'name': f'Bench {n}',
+            'phone': f'600{n:06d}',
+            'email': f'bench{n}@example.com',
+            'subject': 'konsultacja',
+            'data_processing_consent': 'on',
+            'form_ts': signing.dumps(issued, salt=SIGNING_SALT, compress=False),
+        }
+        address = _address(n)
+        if case == 'honeypot':
+            data['hp_field'] = 'http://spam.example.com'
+        elif case == 'token':
+            del data['form_ts']
+        elif case == 'too_fast':
+            data['form_ts'] = form_token()
+        elif case == 'duplicate':
+            # The same values every time; past the first few all are duplicates
+            data.update(name='Bench', phone='600000000', email='bench@example.com')
+        elif case == 'reputation':
+            cache.set(f'{SCORE_PREFIX}{address}', settings.BOT_GATE_BLOCK_SCORE, 3600)
+        return data, address
+
+    def post(self, client, payload):
+        data, address = payload
+        started = time.perf_counter()
+        client.post('/book/', data, REMOTE_ADDR=address)
+        return time.perf_counter() - started
+
+    def screen(self, case):
+        data, address = self.payload(case)
+        request = RequestFactory().post('/book/', data, REMOTE_ADDR=address)
+        started = time.perf_counter()
+        screen(request)
+        return time.perf_counter() - started
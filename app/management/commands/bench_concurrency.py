@@ -0,0 +1,182 @@
+"""
+Compare the WSGI (sync gunicorn workers) and ASGI (uvicorn workers, async
+views) deployments at the same number of worker processes, i.e. at roughly
+the same memory.
+
+Each mode is started as a real gunicorn server on a free local port and
+loaded with N concurrent keep-alive clients for a fixed time. --db-latency
+adds a sleep to every SQL query (through the post_worker_init hook below,
+which gunicorn loads from this module with ``-c python:...``) to model a
+slow or remote database.
+"""
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+MODES = {
+    'wsgi': ['project.wsgi'],
+    'asgi': ['project.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'],
+}
+LATENCY_ENV = 'BENCH_DB_LATENCY_MS'
+
+
+def post_worker_init(worker):
+    """gunicorn hook: delay every query on every connection by BENCH_DB_LATENCY_MS."""
+    delay = int(os.environ.get(LATENCY_ENV, '0')) / 1000
+    if not delay:
+        return
+    from django.db.backends.signals import connection_created
+
+    def slow(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        # The wrapper object is reused across reconnects (CONN_MAX_AGE=0)
+        if slow not in connection.execute_wrappers:
+            connection.execute_wrappers.append(slow)
+
+    connection_created.connect(install, weak=False)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _rss_mb(pid):
+    """Resident memory of ``pid`` and its children, in MB (Linux /proc)."""
+    pids, total = {pid}, 0
+    for entry in Path('/proc').iterdir():
+        if entry.name.isdigit():
+            try:
+                stat = (entry / 'stat').read_text()
+            except OSError:
+                continue
+            if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+                pids.add(int(entry.name))
+    for child in pids:
+        try:
+            for line in Path(f'/proc/{child}/status').read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+def _load(port, path, concurrency, duration):
+    """(requests/s, p50 ms, p95 ms, errors) for ``concurrency`` clients over ``duration`` s."""
+    deadline = time.monotonic() + duration
+    latencies, errors, lock = [], [0], threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                connection.request('GET', path, headers={'Host': '127.0.0.1'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.monotonic() - started)
+                else:
+                    errors[0] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if not latencies:
+        return 0, 0, 0, errors[0]
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return len(latencies) / duration, statistics.median(latencies) * 1000, p95 * 1000, errors[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the sync WSGI and the async ASGI deployment at the same worker count '
+        '(requests/s, latency and memory per concurrency level).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/blog/', help='URL to request (default /blog/).')
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server (default 2).')
+        parser.add_argument('--concurrency', default='1,8,32,64', help='Comma-separated client counts.')
+        parser.add_argument('--duration', type=float, default=5, help='Seconds per concurrency level.')
+        parser.add_argument('--db-latency', type=int, default=0, help='Milliseconds added to every SQL query.')
+        parser.add_argument('--modes', default='wsgi,asgi', help='Comma-separated: wsgi, asgi.')
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        self.stdout.write(
+            f"{options['path']}  workers={options['workers']}  db latency={options['db_latency']} ms\n"
+            f"{'mode':<6}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'RSS MB':>9}"
+        )
+        for mode in options['modes'].split(','):
+            if mode not in MODES:
+                raise CommandError(f'Unknown mode {mode!r}; expected wsgi or asgi.')
+            self.run_mode(mode, levels, options)
+
+    def run_mode(self, mode, levels, options):
+        port = _free_port()
+        env = {
+            **os.environ,
+            LATENCY_ENV: str(options['db_latency']),
+            'ASYNC_VIEWS': 'True' if mode == 'asgi' else 'False',
+            # Plain HTTP on localhost
+            'SECURE_SSL_REDIRECT': 'False',
+        }
+        command = [
+            sys.executable, '-m', 'gunicorn', *MODES[mode],
+            '--workers', str(options['workers']), '--bind', f'127.0.0.1:{port}',
+            '--config', f'python:{__name__}', '--log-level', 'warning', '--timeout', '120',
+        ]
+        server = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            self.wait_until_ready(port, options['path'], server)
+            for concurrency in levels:
+                rate, p50, p95, errors = _load(port, options['path'], concurrency, options['duration'])
+                self.stdout.write(
+                    f'{mode:<6}{concurrency:>8}{rate:>9.1f}{p50:>9.1f}{p95:>9.1f}{errors:>8}'
+                    f'{_rss_mb(server.pid):>9.1f}'
+                )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    def wait_until_ready(self, port, path, server):
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {server.returncode}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                connection.request('GET', path, headers={'Host': '127.0.0.1'})
+                status = connection.getresponse().status
+                connection.close()
+            except OSError:
+                time.sleep(0.2)
+                continue
+            if status != 200:
+                raise CommandError(f'{path} returned {status}')
+            return
+        raise CommandError('Server did not start within 30 seconds')
@@ -0,0 +1,115 @@
+"""
+Compare writing cookie-consent records with one INSERT per beacon against
+the buffered ingestion (app/ingest.py) under concurrent beacons.
+
+Runs against a throwaway copy of the database (created like the test
+database and destroyed afterwards), so the live audit log is never touched.
+"""
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from app.ingest import ConsentBuffer
+from app.models import CookieConsent
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark cookie-consent ingestion under concurrent beacons: one INSERT per record vs '
+        'the buffered bulk_create (INSERT statements, time, records per second), on a throwaway database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients (default 8).')
+        parser.add_argument('--records', type=int, default=250, help='Records per client (default 250).')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            if connection.vendor == 'sqlite':
+                # A file, not the shared in-memory test DB, so writers contend like in production
+                connection.settings_dict.setdefault('TEST', {})['NAME'] = str(Path(tmp) / 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.run_benchmark(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_benchmark(self, options):
+        expected = options['threads'] * options['records']
+        # A buffer of its own, so records pending in this process's consent_buffer stay out of it
+        buffer = ConsentBuffer()
+
+        def per_row(record):
+            record.save(force_insert=True)
+
+        self.stdout.write(f"{options['threads']} clients x {options['records']} records\n"
+                          f"{'mode':<10}{'INSERTs':>9}{'seconds':>9}{'rec/s':>9}{'rows':>8}")
+        results = {}
+        for mode, write in (('per-row', per_row), ('buffered', buffer.add)):
+            CookieConsent.objects.all().delete()
+            counter = _InsertCounter()
+            # Every connection opened meanwhile (clients, the flusher thread) counts its INSERTs
+            connection_created.connect(counter.install)
+            try:
+                started = time.monotonic()
+                self.run_clients(write, options)
+                if mode == 'buffered':
+                    # What is still buffered goes out with the last flush, as at worker exit
+                    with connection.execute_wrapper(counter):
+                        buffer.flush()
+                seconds = time.monotonic() - started
+            finally:
+                connection_created.disconnect(counter.install)
+            rows = CookieConsent.objects.count()
+            results[mode] = seconds
+            self.stdout.write(
+                f'{mode:<10}{counter.count:>9}{seconds:>9.2f}{expected / seconds:>9.0f}{rows:>5}/{expected}'
+            )
+
+        ratio = results['per-row'] / results['buffered']
+        self.stdout.write(self.style.SUCCESS(f'Buffered ingestion was {ratio:.1f}x faster.'))
+
+    def run_clients(self, write, options):
+        def client(offset):
+            try:
+                for i in range(options['records']):
+                    write(CookieConsent(
+                        analytics_consent=bool(i % 2),
+                        ip_address=f'10.0.{offset}.{i % 256}',
+                        session_key=f'bench{offset}-{i}',
+                        user_agent='bench_consent_ingest',
+                        consented_at=timezone.now(),
+                    ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+class _InsertCounter:
+    """Execute wrapper counting INSERT statements across threads."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def install(self, sender, connection, **kwargs):
+        # A thread's connection wrapper outlives reconnects; count each INSERT once
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('INSERT'):
+            with self._lock:
+                self.count += 1
+        return execute(sql, params, many, context)
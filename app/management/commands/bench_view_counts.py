@@ -0,0 +1,106 @@
+"""
+Compare counting blog views with one UPDATE per hit against the buffered
+view counter (app/counters.py) under concurrent hits.
+
+Runs against a throwaway copy of the database (created like the test
+database and destroyed afterwards) and a throwaway cache, so live posts and
+pending view counts are never touched.
+"""
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Sum
+from django.test.utils import override_settings
+
+from app.counters import view_counter
+from app.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark blog view counting under concurrent hits: one UPDATE per view vs the buffered '
+        'counter (UPDATE statements, time, views accounted), on a throwaway database and cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients (default 8).')
+        parser.add_argument('--hits', type=int, default=250, help='Views per client (default 250).')
+        parser.add_argument('--posts', type=int, default=5, help='Posts the views are spread over (default 5).')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            if connection.vendor == 'sqlite':
+                # A file, not the shared in-memory test DB, so writers contend like in production
+                connection.settings_dict.setdefault('TEST', {})['NAME'] = str(Path(tmp) / 'bench.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(CACHES={'default': {
+                    'BACKEND': 'app.cache_backends.TieredCache',
+                    'LOCATION': Path(tmp) / 'cache.sqlite3',
+                }}):
+                    self.run_benchmark(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_benchmark(self, options):
+        pks = [
+            BlogPost.objects.create(title=f'Bench {i}', slug=f'bench-{i}', content='<p>Bench</p>').pk
+            for i in range(options['posts'])
+        ]
+        expected = options['threads'] * options['hits']
+
+        def direct(pk):
+            BlogPost.objects.filter(pk=pk).update(views_count=F('views_count') + 1)
+
+        self.stdout.write(f"{options['threads']} clients x {options['hits']} views over {len(pks)} post(s)\n"
+                          f"{'mode':<10}{'UPDATEs':>9}{'seconds':>9}{'views':>8}")
+        results = {}
+        for mode, hit in (('direct', direct), ('buffered', view_counter.hit)):
+            BlogPost.objects.update(views_count=0)
+            updates, seconds = self.run_mode(hit, pks, options)
+            if mode == 'buffered':
+                # What is still buffered goes out with the last flush, as at worker exit
+                with connection.execute_wrapper(_UpdateCounter(updates)):
+                    view_counter.flush(pks)
+            views = BlogPost.objects.aggregate(total=Sum('views_count'))['total']
+            results[mode] = updates[0]
+            self.stdout.write(f'{mode:<10}{updates[0]:>9}{seconds:>9.2f}{views:>5}/{expected}')
+
+        ratio = results['direct'] / max(results['buffered'], 1)
+        self.stdout.write(self.style.SUCCESS(f'Buffered counting issued {ratio:.0f}x fewer UPDATEs.'))
+
+    def run_mode(self, hit, pks, options):
+        updates = [0, threading.Lock()]
+
+        def client(offset):
+            try:
+                with connection.execute_wrapper(_UpdateCounter(updates)):
+                    for i in range(options['hits']):
+                        hit(pks[(offset + i) % len(pks)])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(options['threads'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return updates, time.monotonic() - started
+
+
+class _UpdateCounter:
+    """Execute wrapper counting UPDATE statements into ``counts`` ([n, lock])."""
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('UPDATE'):
+            with self.counts[1]:
+                self.counts[0] += 1
+        return execute(sql, params, many, context)
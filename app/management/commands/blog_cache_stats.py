@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.blog_cache import stats
+
+
+class Command(BaseCommand):
+    help = 'Show the blog read-model cache hit rate (shared across workers when the cache is).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting.')
+
+    def handle(self, *args, **options):
+        hits, misses = stats.totals()
+        total = hits + misses
+        rate = f'{hits / total:.1%}' if total else 'n/a'
+        self.stdout.write(self.style.SUCCESS(f'{hits} hit(s), {misses} miss(es), hit rate {rate}.'))
+        if options['reset']:
+            stats.reset()
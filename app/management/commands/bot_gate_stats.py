@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.bot_gate import rejection_counts, reset_rejection_counts
+
+
+class Command(BaseCommand):
+    help = 'Show how many form submissions the bot gate rejected, per reason, summed over every worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting.')
+
+    def handle(self, *args, **options):
+        counts = rejection_counts()
+        for reason, rejected in counts.items():
+            self.stdout.write(f'{reason:<12} {rejected:>8}')
+        self.stdout.write(self.style.SUCCESS(f'{sum(counts.values())} submission(s) rejected.'))
+        if options['reset']:
+            reset_rejection_counts()
@@ -0,0 +1,23 @@
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from app.critical_css import format_report
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild per-template critical CSS from the collected bundles and report the bytes '
+        'kept off the critical path (collectstatic does this automatically).'
+    )
+
+    def handle(self, *args, **options):
+        if not hasattr(staticfiles_storage, 'build_critical_css'):
+            raise CommandError('The staticfiles storage does not build CSS bundles.')
+        try:
+            reports = staticfiles_storage.build_critical_css()
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Run collectstatic first ({exc}).')
+        for bundle_path, report in reports.items():
+            self.stdout.write(f'{bundle_path}:')
+            self.stdout.write(format_report(report))
+        self.stdout.write(self.style.SUCCESS('Critical CSS rebuilt.'))
@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Show the hit rates of the tiered cache, summed over every worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting.')
+
+    def handle(self, *args, **options):
+        stats = getattr(cache, 'stats', None)
+        if stats is None:
+            raise CommandError(f'{type(cache).__name__} does not keep statistics.')
+
+        totals = stats.totals()
+        hits = totals['local_hits'] + totals['shared_hits']
+        lookups = hits + totals['local_misses'] + totals['misses']
+        for name, value in totals.items():
+            self.stdout.write(f'{name:<13} {value:>10}')
+        if lookups:
+            local = totals['local_hits'] + totals['local_misses']
+            self.stdout.write(f'hit rate {hits / lookups:.1%}, answered without SQLite {local / lookups:.1%}')
+        self.stdout.write(self.style.SUCCESS(f'{lookups} lookup(s).'))
+        if options['reset']:
+            stats.reset()
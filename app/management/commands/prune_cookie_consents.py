@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from app import retention
+from app.models import CookieConsent
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive cookie consents older than the retention period to .jsonl.gz files and delete them. '
+        'Safe to run from cron / Heroku Scheduler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CONSENT_RETENTION_DAYS,
+                            help='Keep this many days of consents (default: CONSENT_RETENTION_DAYS).')
+        parser.add_argument('--archive-dir', default=settings.CONSENT_ARCHIVE_DIR)
+        parser.add_argument('--no-archive', action='store_true', help='Delete without writing an archive.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many rows would go.')
+        parser.add_argument('--partition', action='store_true',
+                            help='PostgreSQL only: convert the table to monthly partitions (one-off).')
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Monthly partitions to keep created in advance.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['days'])
+        archive_dir = None if options['no_archive'] else options['archive_dir']
+
+        if options['dry_run']:
+            expired = CookieConsent.objects.filter(consented_at__lt=cutoff).count()
+            self.stdout.write(f'{expired} consent(s) older than {cutoff:%Y-%m-%d} would be removed.')
+            return
+
+        if options['partition']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('Partitioning is only supported on PostgreSQL.')
+            if retention.is_partitioned():
+                self.stdout.write('Table is already partitioned.')
+            else:
+                retention.convert_to_partitioned(now, options['months_ahead'])
+                self.stdout.write(self.style.SUCCESS('Converted cookie consents to monthly partitions.'))
+
+        removed = 0
+        if retention.is_partitioned():
+            created = retention.ensure_partitions(now, options['months_ahead'])
+            if created:
+                self.stdout.write(f"Created partitions: {', '.join(created)}")
+            removed += retention.drop_expired_partitions(cutoff, archive_dir, options['chunk_size'])
+
+        # Rows in partial months / the default partition / unpartitioned tables
+        removed += retention.prune(cutoff, archive_dir, options['chunk_size'])
+
+        where = f' (archived to {archive_dir})' if archive_dir else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} consent(s) older than {cutoff:%Y-%m-%d}{where}.'
+        ))
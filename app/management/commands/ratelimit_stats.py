@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app import async_views, views  # noqa: F401 (importing them registers the limits)
+from app.ratelimit import groups, rejection_counts, reset_rejection_counts
+
+
+class Command(BaseCommand):
+    help = 'Show how many requests each rate limit rejected, summed over every worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting.')
+
+    def handle(self, *args, **options):
+        counts = rejection_counts()
+        for group, rejected in sorted(counts.items()):
+            self.stdout.write(f'{group:<22} {groups[group]:>6} {rejected:>8} rejected')
+        self.stdout.write(self.style.SUCCESS(f'{sum(counts.values())} request(s) rejected.'))
+        if options['reset']:
+            reset_rejection_counts()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from app import search
+from app.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the blog full-text search index (FTS5 on SQLite, tsvector on PostgreSQL).'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        indexed = 0
+        for post in BlogPost.objects.iterator():
+            backend.index(post)
+            indexed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} blog post(s) with {type(backend).__name__}.'
+        ))
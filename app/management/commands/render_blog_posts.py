@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from app.models import BlogPost
+from app.templatetags.sanitize import ALLOWLIST_VERSION
+
+
+class Command(BaseCommand):
+    help = 'Pre-render sanitized HTML, TOC and read time for blog posts (backfill after deploy).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-render every post, not only those rendered with an older allowlist version.',
+        )
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.all()
+        if not options['all']:
+            posts = posts.exclude(render_version=ALLOWLIST_VERSION)
+
+        rendered = 0
+        for post in posts.iterator():
+            post.refresh_rendered_content()
+            rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} blog post(s).'))
@@ -0,0 +1,36 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from app import outbox
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox emails (retry with backoff, dead-letter after max attempts).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Deliver what is due and exit.')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when idle.')
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        while not self._stopping:
+            close_old_connections()
+            sent, failed = outbox.process_batch(options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f'Outbox: {sent} sent, {failed} failed.')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox worker stopped.'))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
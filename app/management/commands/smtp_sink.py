@@ -0,0 +1,102 @@
+import socketserver
+import ssl
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class SinkStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept and discard mail from smtplib."""
+
+    def handle(self):
+        server = self.server
+        with server.stats.lock:
+            server.stats.connections += 1
+        # Stand-in for the TCP/TLS/AUTH cost of a new connection to a real host
+        time.sleep(server.connect_delay)
+
+        self.reply('220 localhost smtp-sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250-localhost', '250-AUTH PLAIN LOGIN', '250 8BITMIME')
+            elif command.startswith('AUTH'):
+                self.reply('235 authenticated')
+            elif command.startswith('DATA'):
+                self.reply('354 end data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                with server.stats.lock:
+                    server.stats.messages += 1
+                self.reply('250 queued')
+            elif command.startswith('QUIT'):
+                self.reply('221 bye')
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply('250 ok')
+
+    def reply(self, *lines):
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode())
+
+
+class SMTPSinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, connect_delay=0.0, ssl_context=None):
+        super().__init__(address, SMTPSinkHandler)
+        self.stats = SinkStats()
+        self.connect_delay = connect_delay
+        self.ssl_context = ssl_context
+
+    def get_request(self):
+        sock, address = super().get_request()
+        if self.ssl_context:
+            sock = self.ssl_context.wrap_socket(sock, server_side=True)
+        return sock, address
+
+
+class Command(BaseCommand):
+    help = 'Run a local SMTP server that accepts and discards mail (for offline email benchmarks).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument('--connect-delay', type=float, default=0.0,
+                            help='Seconds to stall each new connection, simulating handshake latency.')
+        parser.add_argument('--certfile', help='Serve implicit TLS (SMTPS) with this certificate.')
+        parser.add_argument('--keyfile')
+
+    def handle(self, *args, **options):
+        context = None
+        if options['certfile']:
+            context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            context.load_cert_chain(options['certfile'], options['keyfile'])
+
+        server = SMTPSinkServer(
+            (options['host'], options['port']),
+            connect_delay=options['connect_delay'],
+            ssl_context=context,
+        )
+        self.stdout.write(f"SMTP sink listening on {options['host']}:{options['port']} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(self.style.SUCCESS(
+                f'{server.stats.messages} message(s) over {server.stats.connections} connection(s).'
+            ))
@@ -0,0 +1,54 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from app import fonts
+from app.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Subset the WEB_FONTS faces to the characters the site uses and write them as '
+        'self-hosted WOFF2 files plus css/base/fonts.css (replacing the Google Fonts import).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source-dir',
+            help='Read the fonts from this directory of TTF/OTF/WOFF2 files instead of Google Fonts.',
+        )
+
+    def handle(self, *args, **options):
+        # fontTools logs every table it prunes at INFO
+        logging.getLogger('fontTools').setLevel(logging.WARNING)
+        try:
+            blog_text = [
+                text for post in BlogPost.objects.filter(status='published')
+                .values_list('title', 'excerpt', 'content')
+                for text in post
+            ]
+        except DatabaseError:
+            self.stderr.write('Database not available; scanning templates and code only.')
+            blog_text = []
+        chars = fonts.characters(blog_text)
+
+        try:
+            if options['source_dir']:
+                sources = fonts.directory_sources(options['source_dir'])
+            else:
+                sources = fonts.google_sources(settings.WEB_FONTS)
+            faces = fonts.build(sources, chars)
+        except fonts.FontError as exc:
+            raise CommandError(str(exc))
+
+        for face in faces:
+            self.stdout.write(
+                f"{face['file']:<28} {face['bytes'] / 1024:6.1f} KB{'  (preloaded)' if face['preload'] else ''}"
+            )
+        total = sum(face['bytes'] for face in faces)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(faces)} face(s), {len(chars)} characters, {total / 1024:.1f} KB in total. '
+            'Commit app/static/fonts/ and the CSS changes.'
+        ))
@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import thumbnails
+from app.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate the featured image thumbnails of every published blog post ahead of the '
+        'first page view, or render a single local file with --file to check the output '
+        '(nothing is stored).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--file', help='Render this local image in every size and report the results without storing them.',
+        )
+
+    def handle(self, *args, **options):
+        if options['file']:
+            return self.render_file(options['file'])
+
+        built = failed = 0
+        sources = (
+            BlogPost.objects.filter(status='published').exclude(featured_image='')
+            .values_list('featured_image', flat=True).distinct()
+        )
+        for source in sources:
+            for size in thumbnails.SIZES:
+                if thumbnails.ensure(source, size):
+                    built += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f'{size} of {source} failed (see the log)')
+
+        self.stdout.write(self.style.SUCCESS(f'{built} thumbnail(s) ready, {failed} failed.'))
+
+    def render_file(self, path):
+        # Rendered in memory only: nothing is written to THUMBNAIL_ROOT or its index
+        try:
+            data = Path(path).read_bytes()
+        except OSError as exc:
+            raise CommandError(str(exc))
+        for size in thumbnails.SIZES:
+            try:
+                webp, (width, height) = thumbnails.render(data, size)
+            except thumbnails.ThumbnailError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(
+                f"{size:<8} {width}x{height}  {len(data) / 1024:.1f} KB -> {len(webp) / 1024:.1f} KB"
+            )
+        self.stdout.write(self.style.SUCCESS('Done.'))
@@ -0,0 +1,342 @@
+"""
+Prometheus metrics, added up over every worker on the host.
+
+MetricsMiddleware times each request and labels it with the URL name it
+resolved to (``view``; "unmatched" for paths outside the URLconf), so the
+number of series is bounded by the routes, not by the URLs requested:
+
+- http_request_duration_seconds: histogram per view and method, up to the
+  response being returned (a streamed body is not included);
+- http_responses_total: per view, method and status code;
+- db_queries_total / db_query_duration_seconds_total: SQL statements run for
+  the request and their time, per view. An execute wrapper installed on every
+  connection counts them into a context variable, so queries the async views
+  run through sync_to_async count too.
+
+The outbox worker adds outbox_emails_total per email kind and outcome (sent,
+retry, dead) and smtp_send_duration_seconds per outcome.
+
+Samples are added up per process; a background thread pushes them every
+METRICS_FLUSH_INTERVAL seconds, and at exit, into an SQLite file
+(METRICS_PATH) that the web workers and the outbox worker upsert into, the
+way the cache shares its tier stats (app/cache_backends.py). GET /metrics
+returns the totals in the Prometheus text exposition format together with
+what the app already counts: cache tier stats, blog read model hits,
+rate-limit and bot-gate rejections and the outbox queue by status. It needs
+``Authorization: Bearer <METRICS_TOKEN>`` and is a 404 while METRICS_TOKEN
+is unset.
+"""
+import atexit
+import contextvars
+import functools
+import hmac
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNMATCHED = 'unmatched'
+# Other request methods are labelled 'other', so clients can't add series
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# name: (type, help) of everything recorded through samples
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Time to build a response, by URL name and method.'),
+    'http_responses_total': ('counter', 'Responses by URL name, method and status code.'),
+    'db_queries_total': ('counter', 'SQL statements run while serving requests, by URL name.'),
+    'db_query_duration_seconds_total': ('counter', 'Time spent in SQL statements while serving requests, by URL name.'),
+    'outbox_emails_total': ('counter', 'Outbox send attempts by email kind and outcome (sent, retry, dead).'),
+    'smtp_send_duration_seconds': ('histogram', 'Time of one outbox send attempt over SMTP, by outcome.'),
+}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS samples ('
+    'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (name, labels))'
+)
+LE_RE = re.compile(r'(?:^|,)le="([^"]*)"$')
+
+# [statement count, seconds] of the request being served, if any
+_queries = contextvars.ContextVar('metrics_queries', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def labels(**values):
+    """Label string of a sample: labels(view='home') -> 'view="home"'."""
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in values.items())
+
+
+@functools.lru_cache(maxsize=1024)
+def _bucket_labels(series):
+    prefix = f'{series},' if series else ''
+    return tuple(f'{prefix}le="{float(le)}"' for le in BUCKETS) + (f'{prefix}le="+Inf"',)
+
+
+def histogram(name, series, seconds):
+    """Sample deltas of one observation: every bucket (so none is missing), _sum and _count."""
+    bounds = _bucket_labels(series)
+    deltas = [((f'{name}_bucket', bound), int(seconds <= le)) for le, bound in zip(BUCKETS, bounds)]
+    deltas.append(((f'{name}_bucket', bounds[-1]), 1))
+    deltas.append(((f'{name}_sum', series), seconds))
+    deltas.append(((f'{name}_count', series), 1))
+    return deltas
+
+
+class Samples:
+    """Per-process sample deltas, added to the shared ``samples`` table by a background thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._deltas = {}
+        self._thread = None
+        self._connections = threading.local()
+
+    @property
+    def interval(self):
+        return getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+
+    def add(self, deltas):
+        """Add [((name, labels), value), ...] to this process' tallies."""
+        self._ensure_thread()
+        with self._lock:
+            for key, value in deltas:
+                self._deltas[key] = self._deltas.get(key, 0) + value
+
+    def _db(self):
+        connection = getattr(self._connections, 'db', None)
+        # A connection opened before gunicorn forked must not be used by the workers
+        if connection is None or self._connections.pid != os.getpid():
+            path = settings.METRICS_PATH
+            path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(SCHEMA)
+            self._connections.db = connection
+            self._connections.pid = os.getpid()
+        return connection
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._deltas = self._deltas, {}
+            if not deltas:
+                return
+            db = self._db()
+            try:
+                db.execute('BEGIN IMMEDIATE')
+                db.executemany(
+                    'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, series, value) for (name, series), value in deltas.items()],
+                )
+                db.execute('COMMIT')
+            except BaseException:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                # Keep them for the next flush
+                with self._lock:
+                    for key, value in deltas.items():
+                        self._deltas[key] = self._deltas.get(key, 0) + value
+                raise
+
+    def totals(self):
+        """[(name, labels, value)] from every process, including this one's unflushed samples."""
+        self.flush()
+        return self._db().execute('SELECT name, labels, value FROM samples').fetchall()
+
+    def _ensure_thread(self):
+        # Also starts a new thread in each forked worker
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.error("Metrics flush failed: %s", exc)
+
+
+samples = Samples()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        samples.flush()
+    except Exception:
+        pass
+
+
+def count_queries(execute, sql, params, many, context):
+    """Connection execute wrapper adding to the current request's query count and time."""
+    queries = _queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries[0] += 1
+        queries[1] += time.perf_counter() - started
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver; the wrapper list survives reconnects."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def record_request(request, response, seconds, queries):
+    match = request.resolver_match
+    view = match.view_name if match is not None else UNMATCHED
+    method = request.method if request.method in METHODS else 'other'
+    deltas = histogram('http_request_duration_seconds', labels(view=view, method=method), seconds)
+    deltas.append((('http_responses_total', labels(view=view, method=method, status=response.status_code)), 1))
+    if queries[0]:
+        deltas.append((('db_queries_total', labels(view=view)), queries[0]))
+        deltas.append((('db_query_duration_seconds_total', labels(view=view)), queries[1]))
+    samples.add(deltas)
+
+
+def record_email(kind, outcome, seconds):
+    deltas = histogram('smtp_send_duration_seconds', labels(outcome=outcome), seconds)
+    deltas.append((('outbox_emails_total', labels(kind=kind or 'other', outcome=outcome)), 1))
+    samples.add(deltas)
+
+
+class MetricsMiddleware:
+    # Usable in the ASGI stack without pushing async views onto a thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = [0, 0.0]
+        token = _queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        record_request(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = [0, 0.0]
+        token = _queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        record_request(request, response, time.perf_counter() - started, queries)
+        return response
+
+
+def _collected():
+    """(name, type, help, [(labels, value)]) of the counts other modules keep."""
+    from django.core.cache import cache
+    from django.db.models import Count
+
+    from . import blog_cache, bot_gate, ratelimit
+    from .models import OutboxEmail
+
+    families = []
+    tier_stats = getattr(cache, 'stats', None)
+    if tier_stats is not None:
+        families.append((
+            'cache_events_total', 'counter', 'Cache hits, misses and writes by tier (app/cache_backends.py).',
+            [(labels(event=name), n) for name, n in sorted(tier_stats.totals().items())],
+        ))
+    hits, misses = blog_cache.stats.totals()
+    families.append((
+        'blog_cache_lookups_total', 'counter', 'Blog read model lookups by result.',
+        [(labels(result='hit'), hits), (labels(result='miss'), misses)],
+    ))
+    families.append((
+        'ratelimit_rejections_total', 'counter', 'Requests rejected by the rate limits, by group.',
+        [(labels(group=group), n) for group, n in sorted(ratelimit.rejection_counts().items())],
+    ))
+    families.append((
+        'bot_gate_rejections_total', 'counter', 'Form POSTs rejected by the bot gate, by reason.',
+        [(labels(reason=reason), n) for reason, n in sorted(bot_gate.rejection_counts().items())],
+    ))
+    queue = OutboxEmail.objects.values_list('status').annotate(n=Count('id')).order_by('status')
+    families.append((
+        'outbox_emails', 'gauge', 'Outbox emails by status.',
+        [(labels(status=status), n) for status, n in queue],
+    ))
+    return families
+
+
+def _value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _sample_order(row):
+    """Histogram series together, buckets by increasing le, then _sum and _count."""
+    name, series, _ = row
+    match = LE_RE.search(series) if name.endswith('_bucket') else None
+    if match is None:
+        return series, name.endswith('_count') + 1, 0
+    return series[:match.start()], 0, float(match.group(1))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    families = {}
+    for name, series, value in samples.totals():
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name.endswith(suffix) and METRICS.get(name[:-len(suffix)], ('',))[0] == 'histogram':
+                family = name[:-len(suffix)]
+        families.setdefault(family, []).append((name, series, value))
+
+    lines = []
+    for family in sorted(families):
+        kind, help_text = METRICS.get(family, ('untyped', ''))
+        lines += [f'# HELP {family} {help_text}', f'# TYPE {family} {kind}']
+        for name, series, value in sorted(families[family], key=_sample_order):
+            lines.append(f'{name}{{{series}}} {_value(value)}' if series else f'{name} {_value(value)}')
+    for family, kind, help_text, values in _collected():
+        lines += [f'# HELP {family} {help_text}', f'# TYPE {family} {kind}']
+        lines += [f'{family}{{{series}}} {_value(value)}' for series, value in values]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        raise Http404
+    scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(given.strip().encode(), token.encode()):
+        response = HttpResponse('Unauthorized', status=401, content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,50 @@
+from django.db import migrations, transaction
+
+from app import search
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        # unaccent is optional: it needs CREATE privilege on the database
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+        except Exception:
+            pass
+        schema_editor.execute('ALTER TABLE app_blogpost ADD COLUMN search_vector tsvector')
+        schema_editor.execute(
+            'CREATE INDEX app_blogpost_search_vector_gin ON app_blogpost USING gin (search_vector)'
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE app_blogpost_fts USING fts5('
+            "title, meta_keywords, excerpt, content, tokenize='unicode61 remove_diacritics 2')"
+        )
+    else:
+        return
+    # Index the posts already there, the same way manage.py rebuild_search_index does
+    BlogPost = apps.get_model('app', 'BlogPost')
+    backend = search.get_backend()
+    for post in BlogPost.objects.iterator():
+        backend.index(post)
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS app_blogpost_search_vector_gin')
+        schema_editor.execute('ALTER TABLE app_blogpost DROP COLUMN IF EXISTS search_vector')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS app_blogpost_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_blogpost_rendered_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxemail',
+            name='status',
+            field=models.CharField(choices=[('held', 'Wstrzymane do zestawienia'), ('pending', 'Oczekuje'), ('sent', 'Wysłano'), ('digested', 'Wysłano w zestawieniu'), ('dead', 'Nieudane (dead letter)')], default='pending', max_length=10),
+        ),
+    ]
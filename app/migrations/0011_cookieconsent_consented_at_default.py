@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_outboxemail_digest_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cookieconsent',
+            name='consented_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
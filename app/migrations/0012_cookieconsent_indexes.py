@@ -0,0 +1,21 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_cookieconsent_consented_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cookieconsent',
+            index=models.Index(fields=['consented_at'], name='cookieconsent_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cookieconsent',
+            index=models.Index(fields=['session_key'], name='cookieconsent_session_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+from django.db.models import F
+
+
+def backfill_published_at(apps, schema_editor):
+    # Keyset pagination orders by (published_at, id); published posts need a value
+    BlogPost = apps.get_model('app', 'BlogPost')
+    BlogPost.objects.filter(status='published', published_at__isnull=True).update(
+        published_at=F('created_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_cookieconsent_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_published_at, migrations.RunPython.noop),
+    ]
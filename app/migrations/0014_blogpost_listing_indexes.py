@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 21:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_blogpost_backfill_published_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='blogpost',
+            options={'ordering': ['-published_at', '-id'], 'verbose_name': 'Blog Post', 'verbose_name_plural': 'Blog Posts'},
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', '-published_at', '-id'], name='blogpost_status_pub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['category', 'status', '-published_at', '-id'], name='blogpost_cat_status_pub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', '-views_count'], name='blogpost_status_views_idx'),
+        ),
+    ]
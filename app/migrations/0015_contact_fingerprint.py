@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:19
+
+from django.db import migrations, models
+
+from app.submissions import contact_fingerprint
+
+
+def backfill_contact_fingerprints(apps, schema_editor):
+    # Historical models don't run save(), so fill the column here
+    for name in ('Appointment', 'TrainingInquiry'):
+        model = apps.get_model('app', name)
+        rows = list(model.objects.only('email', 'phone'))
+        for row in rows:
+            row.contact_fingerprint = contact_fingerprint(row.email, row.phone)
+        model.objects.bulk_update(rows, ['contact_fingerprint'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_blogpost_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='contact_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='traininginquiry',
+            name='contact_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['contact_fingerprint', 'created_at'], name='appointment_contact_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='traininginquiry',
+            index=models.Index(fields=['contact_fingerprint', 'created_at'], name='traininginquiry_contact_idx'),
+        ),
+        migrations.RunPython(backfill_contact_fingerprints, migrations.RunPython.noop),
+    ]
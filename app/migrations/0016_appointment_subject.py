@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 22:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_contact_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='subject',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
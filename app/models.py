@@ -3,12 +3,16 @@ from django.urls import reverse
 from django.utils import timezone
 from django.utils.text import slugify
 
+from .submissions import contact_fingerprint
+
 class Appointment(models.Model):
     name = models.CharField(max_length=120)
     email = models.EmailField(blank=True, null=True)
     phone = models.CharField(max_length=30)
     preferred_date = models.CharField(max_length=100, blank=True)
     message = models.TextField(blank=True)
+    # Raw value of the form's subject select (see views.SUBJECT_MAP)
+    subject = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     # GDPR consent fields
@@ -16,13 +20,22 @@ class Appointment(models.Model):
     data_processing_consent_date = models.DateTimeField(auto_now_add=True)
     marketing_consent = models.BooleanField(default=False)
     marketing_consent_date = models.DateTimeField(null=True, blank=True)
+    # Hash of the normalized email and phone, for spotting resubmissions (app/submissions.py)
+    contact_fingerprint = models.CharField(max_length=32, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.name} - {self.phone}"
 
+    def save(self, *args, **kwargs):
+        self.contact_fingerprint = contact_fingerprint(self.email, self.phone)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Appointment"
         verbose_name_plural = "Appointments"
+        indexes = [
+            models.Index(fields=['contact_fingerprint', 'created_at'], name='appointment_contact_idx'),
+        ]
 
 
 class TrainingInquiry(models.Model):
@@ -43,14 +56,23 @@ class TrainingInquiry(models.Model):
     message = models.TextField(blank=True)
     data_processing_consent = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Hash of the normalized email and phone, for spotting resubmissions (app/submissions.py)
+    contact_fingerprint = models.CharField(max_length=32, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.company} - {self.name} ({self.created_at:%d.%m.%Y})"
 
+    def save(self, *args, **kwargs):
+        self.contact_fingerprint = contact_fingerprint(self.email, self.phone)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Training Inquiry"
         verbose_name_plural = "Training Inquiries"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["contact_fingerprint", "created_at"], name="traininginquiry_contact_idx"),
+        ]
 
 
 class DataSubjectRightsRequest(models.Model):
@@ -161,6 +183,34 @@ class BlogPost(models.Model):
     read_time = models.PositiveIntegerField(default=5, help_text='Szacowany czas czytania w minutach')
     views_count = models.PositiveIntegerField(default=0)
 
+    # Pre-rendered content (filled on save, see app/rendering.py)
+    content_html = models.TextField(blank=True, editable=False)
+    content_toc = models.JSONField(default=list, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    render_version = models.PositiveIntegerField(default=0, editable=False)
+
+    RENDERED_FIELDS = ['content_html', 'content_toc', 'word_count', 'read_time', 'render_version']
+
+    def render_content(self):
+        """Sanitize content and store the derived artifacts on the instance."""
+        from .rendering import render_post_content
+
+        for field, value in render_post_content(self.content).items():
+            setattr(self, field, value)
+
+    def refresh_rendered_content(self):
+        """Re-render and persist only the derived columns (keeps updated_at intact)."""
+        self.render_content()
+        BlogPost.objects.filter(pk=self.pk).update(
+            **{field: getattr(self, field) for field in self.RENDERED_FIELDS}
+        )
+
+    @property
+    def needs_render(self):
+        from .templatetags.sanitize import ALLOWLIST_VERSION
+
+        return self.render_version != ALLOWLIST_VERSION
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
@@ -172,6 +222,13 @@ class BlogPost(models.Model):
         # Generate meta description if not provided
         if not self.meta_description and self.excerpt:
             self.meta_description = self.excerpt[:160]
+
+        # Sanitize once here instead of on every page view
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.RENDERED_FIELDS)
         
         super().save(*args, **kwargs)
 
@@ -184,7 +241,13 @@ class BlogPost(models.Model):
     class Meta:
         verbose_name = "Blog Post"
         verbose_name_plural = "Blog Posts"
-        ordering = ['-published_at', '-created_at']
+        # id breaks ties so the listing indexes below also cover the sort
+        ordering = ['-published_at', '-id']
+        indexes = [
+            models.Index(fields=['status', '-published_at', '-id'], name='blogpost_status_pub_idx'),
+            models.Index(fields=['category', 'status', '-published_at', '-id'], name='blogpost_cat_status_pub_idx'),
+            models.Index(fields=['status', '-views_count'], name='blogpost_status_views_idx'),
+        ]
 
 
 class StaffMember(models.Model):
@@ -258,8 +321,8 @@ class CookieConsent(models.Model):
         help_text='Browser user agent string'
     )
 
-    # Timestamps
-    consented_at = models.DateTimeField(auto_now_add=True)
+    # Timestamps (set by the request, not at the later bulk insert)
+    consented_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         consent_type = "Accepted analytics" if self.analytics_consent else "Declined analytics"
@@ -269,3 +332,43 @@ class CookieConsent(models.Model):
         verbose_name = "Cookie Consent"
         verbose_name_plural = "Cookie Consents"
         ordering = ['-consented_at']
+        indexes = [
+            models.Index(fields=['consented_at'], name='cookieconsent_at_idx'),
+            models.Index(fields=['session_key'], name='cookieconsent_session_idx'),
+        ]
+
+
+class OutboxEmail(models.Model):
+    """Outgoing email queued in the request transaction and sent by `run_outbox`."""
+    STATUS_CHOICES = [
+        ('held', 'Wstrzymane do zestawienia'),
+        ('pending', 'Oczekuje'),
+        ('sent', 'Wysłano'),
+        ('digested', 'Wysłano w zestawieniu'),
+        ('dead', 'Nieudane (dead letter)'),
+    ]
+
+    kind = models.CharField(max_length=50, blank=True, help_text='Rodzaj wiadomości, np. booking_confirmation')
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.recipients)} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Outbox Email"
+        verbose_name_plural = "Outbox Emails"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
@@ -0,0 +1,165 @@
+"""
+Durable email outbox.
+
+Views call ``enqueue()`` inside the same transaction as their model save, so
+an email exists exactly when the booking/inquiry/request does. The
+``run_outbox`` management command delivers due messages, retrying failures
+with exponential backoff and moving them to the ``dead`` status after
+OUTBOX_MAX_ATTEMPTS so they show up in the admin. With ADMIN_DIGEST_WINDOW
+set, routine admin notifications are held and sent as one summary per window.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+# A claimed message is retried after this long if the worker dies mid-send
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def enqueue(subject, body, recipients, kind='', from_email=None, hold=False):
+    """
+    Queue one email for delivery by the outbox worker.
+
+    ``hold=True`` parks it for the next admin digest instead of sending it
+    on its own (see flush_digests).
+    """
+    return OutboxEmail.objects.create(
+        kind=kind,
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.EMAIL_FROM,
+        recipients=list(recipients),
+        status='held' if hold else 'pending',
+    )
+
+
+def flush_digests():
+    """
+    Turn held notifications into one summary email per recipient list.
+
+    Runs once the oldest held notification is ADMIN_DIGEST_WINDOW seconds
+    old, so no notification waits longer than one window. A single held
+    notification is released unchanged. Returns the number of emails queued.
+    """
+    now = timezone.now()
+    window = timedelta(seconds=getattr(settings, 'ADMIN_DIGEST_WINDOW', 0))
+    queued = 0
+    with transaction.atomic():
+        held = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='held')
+            .order_by('created_at')
+        )
+        if not held or held[0].created_at > now - window:
+            return 0
+
+        groups = {}
+        for message in held:
+            groups.setdefault(tuple(message.recipients), []).append(message)
+
+        for recipients, group in groups.items():
+            if len(group) == 1:
+                OutboxEmail.objects.filter(pk=group[0].pk).update(status='pending', next_attempt_at=now)
+            else:
+                sections = [
+                    f"=== {timezone.localtime(m.created_at):%d.%m.%Y %H:%M} — {m.subject} ===\n\n{m.body.strip()}"
+                    for m in group
+                ]
+                enqueue(
+                    subject=f"Zestawienie powiadomień ({len(group)})",
+                    body="\n\n\n".join(sections),
+                    recipients=recipients,
+                    kind='admin_digest',
+                    from_email=group[0].from_email,
+                )
+                OutboxEmail.objects.filter(pk__in=[m.pk for m in group]).update(status='digested', sent_at=now)
+            queued += 1
+
+    logger.info("Admin digest: %s held notification(s) -> %s email(s)", len(held), queued)
+    return queued
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts`` (1-based): base * 2^(n-1), capped."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 6 * 60 * 60)
+    return timedelta(seconds=min(cap, base * 2 ** (attempts - 1)))
+
+
+def claim_due(limit):
+    """Lease up to ``limit`` due messages so concurrent workers skip them."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:limit]
+        )
+        if due:
+            OutboxEmail.objects.filter(pk__in=[m.pk for m in due]).update(
+                next_attempt_at=now + CLAIM_LEASE
+            )
+    return due
+
+
+def deliver(messages):
+    """Send already-claimed messages over one connection; returns (sent, failed)."""
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        for message in messages:
+            message.attempts += 1
+            started = time.perf_counter()
+            try:
+                connection.open()
+                EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=message.from_email,
+                    to=message.recipients,
+                    connection=connection,
+                ).send(fail_silently=False)
+            except Exception as exc:
+                failed += 1
+                message.last_error = f"{type(exc).__name__}: {exc}"
+                if message.attempts >= max_attempts:
+                    message.status = 'dead'
+                    outcome = 'dead'
+                    logger.error("Outbox email %s dead after %s attempts: %s", message.pk, message.attempts, exc)
+                else:
+                    message.next_attempt_at = timezone.now() + backoff(message.attempts)
+                    outcome = 'retry'
+                    logger.warning("Outbox email %s failed (attempt %s): %s", message.pk, message.attempts, exc)
+                # A broken connection would fail every following message too
+                connection.close()
+            else:
+                sent += 1
+                message.status = 'sent'
+                message.sent_at = timezone.now()
+                message.last_error = ''
+                outcome = 'sent'
+                logger.info("Outbox email %s sent to %s", message.pk, ', '.join(message.recipients))
+            metrics.record_email(message.kind, outcome, time.perf_counter() - started)
+            message.save(update_fields=['attempts', 'status', 'sent_at', 'next_attempt_at', 'last_error'])
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def process_batch(limit=20):
+    flush_digests()
+    messages = claim_due(limit)
+    if not messages:
+        return 0, 0
+    return deliver(messages)
@@ -0,0 +1,121 @@
+"""
+Full-page cache for pages whose content only changes on deploy.
+
+``@cached_page`` stores the rendered HTML of an anonymous GET for
+PAGE_CACHE_TIMEOUT seconds. The key includes scheme and host (base.html
+embeds both in canonical/JSON-LD URLs) and a version taken from the static
+files manifest hash, so every deploy starts from an empty cache. Without a
+manifest (local development) the version is the process start time.
+
+A request bypasses the cache when it has a query string (og:url embeds the
+full URI), an authenticated user or pending flash messages. Responses that
+set cookies, render a CSRF token or are not 200 are never stored. Middleware
+still runs on cached responses, so security and CSP headers are added as
+usual.
+
+``@cached_form_page`` does the same for pages with forms. They are rendered
+with placeholders in place of ``{% csrf_token %}``, ``{{ form_token }}`` and
+``{{ submission_key }}``; the visitor's own CSRF token, a fresh form token
+(app/bot_gate.py) and a new submission key (app/submissions.py) are
+substituted into the cached HTML on every response.
+"""
+import functools
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from .bot_gate import FORM_TOKEN_PLACEHOLDER, form_token
+from .submissions import SUBMISSION_KEY_PLACEHOLDER, submission_key
+
+_process_version = str(time.time_ns())
+_version = None
+
+
+def deploy_version():
+    """Hash of the collectstatic manifest; changes whenever a deploy changes assets."""
+    global _version
+    if _version is None:
+        version = getattr(staticfiles_storage, 'manifest_hash', '')
+        if not version and settings.STATIC_ROOT:
+            manifest = Path(settings.STATIC_ROOT) / 'staticfiles.json'
+            try:
+                version = json.loads(manifest.read_text()).get('hash', '') or \
+                    hashlib.md5(manifest.read_bytes()).hexdigest()
+            except (OSError, ValueError):
+                version = ''
+        _version = version or _process_version
+    return _version
+
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD') or request.GET:
+        return False
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return False
+    # len() loads the messages without marking them as used
+    return not len(messages.get_messages(request))
+
+
+def _key(request):
+    raw = f'{request.scheme}://{request.get_host()}{request.path}'
+    return f'page:{deploy_version()}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+# Stands in for the CSRF token in stored pages (rendered by the
+# app.context_processors.csrf_placeholder context processor)
+CSRF_PLACEHOLDER = 'csrfplaceholder7f3c9e1ab2d04d5b'
+
+
+def _cache_view(view, punch_csrf):
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = _key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'hit'
+        else:
+            request.csrf_placeholder = punch_csrf
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            # A page that rendered a real CSRF token is specific to this visitor
+            per_visitor = response.cookies or request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            if response.status_code != 200 or per_visitor or response.streaming:
+                return response
+            cache.set(key, (response.content, response['Content-Type']),
+                      getattr(settings, 'PAGE_CACHE_TIMEOUT', 86400))
+            response['X-Page-Cache'] = 'miss'
+
+        if punch_csrf:
+            # get_token() also makes CsrfViewMiddleware set the cookie
+            response.content = response.content.replace(
+                CSRF_PLACEHOLDER.encode(), get_token(request).encode()
+            ).replace(FORM_TOKEN_PLACEHOLDER.encode(), form_token().encode()).replace(
+                SUBMISSION_KEY_PLACEHOLDER.encode(), submission_key().encode()
+            )
+        return response
+
+    return wrapper
+
+
+def cached_page(view):
+    return _cache_view(view, punch_csrf=False)
+
+
+def cached_form_page(view):
+    """Like cached_page, for pages with forms: the CSRF token is filled in per request."""
+    return _cache_view(view, punch_csrf=True)
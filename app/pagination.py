@@ -0,0 +1,235 @@
+"""
+Keyset pagination for the blog listings.
+
+The first BLOG_NUMBERED_PAGES pages keep the SEO-friendly ``?page=N`` links
+(a small OFFSET). Past them, links carry an ``after``/``before`` cursor on
+``(published_at, id)``, so deep pages cost the same as the first one; a
+``?page=N`` past them raises PageMoved with the cursor URL of that position,
+and one past the last page is a 404. The total is counted once per filter and
+cached until blog content changes.
+"""
+import base64
+import hashlib
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404
+
+COUNT_GENERATION_KEY = 'blog:count-generation'
+
+
+def invalidate_counts():
+    try:
+        cache.incr(COUNT_GENERATION_KEY)
+    except ValueError:
+        cache.set(COUNT_GENERATION_KEY, 1, timeout=None)
+
+
+def _count_key(generation, key):
+    return f'blog:count:{generation}:{hashlib.md5(key.encode()).hexdigest()}'
+
+
+def cached_count(queryset, key):
+    """COUNT(*) for a listing, cached per filter ``key`` until posts change."""
+    cache_key = _count_key(cache.get(COUNT_GENERATION_KEY, 0), key)
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, getattr(settings, 'BLOG_COUNT_CACHE_TIMEOUT', 600))
+    return count
+
+
+async def acached_count(queryset, key):
+    """Async cached_count() for the ASGI views."""
+    cache_key = _count_key(await cache.aget(COUNT_GENERATION_KEY, 0), key)
+    count = await cache.aget(cache_key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(cache_key, count, getattr(settings, 'BLOG_COUNT_CACHE_TIMEOUT', 600))
+    return count
+
+
+def encode_cursor(post):
+    raw = f'{post.published_at.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Return (published_at, pk) or None for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode()
+        published_at, pk = raw.split('|')
+        return datetime.fromisoformat(published_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+class PageMoved(Exception):
+    """A numbered page past BLOG_NUMBERED_PAGES; ``query`` is its ``?after=`` cursor query string."""
+
+    def __init__(self, query):
+        super().__init__(query)
+        self.query = query
+
+
+def _query(params, **changes):
+    """``params`` with the page/cursor replaced by ``changes``, as a '?...' query string."""
+    query = params.copy()
+    for key in ('page', 'after', 'before'):
+        query.pop(key, None)
+    query.update(changes)
+    return f'?{query.urlencode()}'
+
+
+class KeysetPage:
+    def __init__(self, object_list, number, has_previous, has_next):
+        self.object_list = object_list
+        # None for cursor pages past the numbered range
+        self.number = number
+        self.has_previous = has_previous
+        self.has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page, count):
+        self.queryset = queryset.order_by('-published_at', '-id')
+        self.per_page = per_page
+        self.count = count
+        self.num_pages = max(1, math.ceil(count / per_page))
+        self.numbered_pages = getattr(settings, 'BLOG_NUMBERED_PAGES', 5)
+
+    def page(self, params):
+        """Resolve ``?page=`` / ``?after=`` / ``?before=`` into a KeysetPage."""
+        return _run(self._page(params))
+
+    async def apage(self, params):
+        """Async page() for the ASGI views."""
+        return await _arun(self._page(params))
+
+    def numbered(self, number):
+        return _run(self._numbered(number))
+
+    def _page(self, params):
+        """
+        Steps of page(): yields each queryset to fetch and is sent its rows,
+        so the sync and async entry points share one implementation.
+
+        The redundant ``published_at__lte``/``__gte`` bound gives the planner
+        an index range to start from; the OR alone is not sargable.
+        """
+        after = decode_cursor(params.get('after', ''))
+        if after:
+            published_at, pk = after
+            rows = yield self.queryset.filter(published_at__lte=published_at).filter(
+                Q(published_at__lt=published_at) | Q(published_at=published_at, id__lt=pk)
+            )[:self.per_page + 1]
+            return KeysetPage(rows[:self.per_page], None, True, len(rows) > self.per_page)
+
+        before = decode_cursor(params.get('before', ''))
+        if before:
+            published_at, pk = before
+            rows = yield self.queryset.filter(published_at__gte=published_at).filter(
+                Q(published_at__gt=published_at) | Q(published_at=published_at, id__gt=pk)
+            ).order_by('published_at', 'id')[:self.per_page + 1]
+            if len(rows) > self.per_page:
+                return KeysetPage(rows[:self.per_page][::-1], None, True, True)
+            # Walked back to the start: serve a regular first page
+            return (yield from self._numbered(1))
+
+        try:
+            number = int(params.get('page', 1))
+        except (TypeError, ValueError):
+            number = 1
+        if not 1 <= number <= self.num_pages:
+            raise Http404
+        if number > self.numbered_pages:
+            # An old or hand-made deep link: the same posts live behind a cursor
+            offset = (number - 1) * self.per_page
+            rows = yield self.queryset[offset - 1:offset]
+            if not rows:
+                raise Http404
+            raise PageMoved(_query(params, after=encode_cursor(rows[0])))
+        return (yield from self._numbered(number))
+
+    def _numbered(self, number):
+        number = max(1, min(number, self.num_pages, self.numbered_pages))
+        offset = (number - 1) * self.per_page
+        rows = yield self.queryset[offset:offset + self.per_page + 1]
+        return KeysetPage(rows[:self.per_page], number, number > 1, len(rows) > self.per_page)
+
+    def links(self, page, params):
+        """Previous/next/numbered URLs for the pagination partial."""
+        def url(**changes):
+            return _query(params, **changes)
+
+        previous_url = next_url = None
+        if page.has_previous:
+            if page.number:
+                previous_url = url(page=page.number - 1)
+            else:
+                previous_url = url(before=encode_cursor(page.object_list[0]))
+        if page.has_next:
+            if page.number and page.number < self.numbered_pages:
+                next_url = url(page=page.number + 1)
+            else:
+                next_url = url(after=encode_cursor(page.object_list[-1]))
+
+        last_numbered = min(self.num_pages, self.numbered_pages)
+        return {
+            'previous_url': previous_url,
+            'next_url': next_url,
+            'pages': [
+                {'number': n, 'url': url(page=n), 'current': n == page.number}
+                for n in range(1, last_numbered + 1)
+            ],
+            'more': self.num_pages > last_numbered,
+        }
+
+
+def _run(steps):
+    try:
+        queryset = next(steps)
+        while True:
+            queryset = steps.send(list(queryset))
+    except StopIteration as done:
+        return done.value
+
+
+async def _arun(steps):
+    try:
+        queryset = next(steps)
+        while True:
+            queryset = steps.send([row async for row in queryset])
+    except StopIteration as done:
+        return done.value
+
+
+def numbered_links(page_obj, params):
+    """Same link structure for a regular django Paginator page (search results)."""
+    def url(number):
+        query = params.copy()
+        query['page'] = number
+        return f'?{query.urlencode()}'
+
+    return {
+        'previous_url': url(page_obj.previous_page_number()) if page_obj.has_previous() else None,
+        'next_url': url(page_obj.next_page_number()) if page_obj.has_next() else None,
+        'pages': [
+            {'number': n, 'url': url(n), 'current': n == page_obj.number}
+            for n in page_obj.paginator.page_range
+            if page_obj.number - 3 < n < page_obj.number + 3
+        ],
+        'more': False,
+    }
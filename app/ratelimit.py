@@ -0,0 +1,161 @@
+"""
+Rate limits for the form and consent endpoints, shared by every worker.
+
+Counts live in the default cache, which app/cache_backends.py shares between
+workers, and use a sliding window: per group and client two integers, the
+count of the current fixed window and of the previous one, which is weighted
+by how much of it the sliding window still covers. That is O(1) memory per
+client and one atomic incr() per checked request; a rejected request is
+taken back out, so retrying doesn't extend the block.
+
+Clients are identified by get_client_ip() (the first X-Forwarded-For entry,
+else REMOTE_ADDR); IPv6 addresses are limited per /64, the block one host
+usually controls. Over the limit the view is not called and the client gets
+a 429 with Retry-After. Rejections are logged and counted per group;
+``manage.py ratelimit_stats`` reports them.
+"""
+import functools
+import ipaddress
+import logging
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+IPV6_PREFIX = 64
+KEY_PREFIX = 'ratelimit:'
+REJECTED_PREFIX = 'ratelimit:rejected:'
+
+# group: rate of every @ratelimit view, for the stats
+groups = {}
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60), '100/10s' -> (100, 10)."""
+    count, _, period = rate.partition('/')
+    try:
+        return int(count), int(period[:-1] or 1) * RATE_UNITS[period[-1:]]
+    except (KeyError, ValueError):
+        raise ValueError(f'Invalid rate {rate!r}; expected e.g. 5/m or 100/10s')
+
+
+def get_client_ip(request):
+    """Helper function to get client's IP address"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return ip
+
+
+def client_key(request):
+    ip = (get_client_ip(request) or '').strip()
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    if address.version == 6:
+        return str(ipaddress.ip_network(f'{address}/{IPV6_PREFIX}', strict=False).network_address)
+    return str(address)
+
+
+def _incr(key, timeout):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=timeout):
+            return 1
+        return cache.incr(key)
+
+
+def _retry_after(limit, window, elapsed, previous, current):
+    """Seconds until a request on top of ``current`` fits under ``limit`` again."""
+    room = limit - current - 1
+    if room >= 0:
+        # Wait for the previous window's weighted share to shrink to ``room``
+        seconds = window * (1 - room / previous) - elapsed
+    else:
+        # This window is full: wait until, as the previous one, it has faded enough
+        seconds = window - elapsed + window * (1 - (limit - 1) / current)
+    return max(1, math.ceil(seconds))
+
+
+def hit(group, key, rate, now=None):
+    """
+    Count one request by ``key`` against ``group``'s ``rate``. Returns 0 if it
+    is allowed, else the seconds to wait (the request is not counted then).
+    """
+    limit, window = parse_rate(rate)
+    index, elapsed = divmod(time.time() if now is None else now, window)
+    base = f'{KEY_PREFIX}{group}:{key}:'
+    current_key = f'{base}{int(index)}'
+    current = _incr(current_key, 2 * window)
+    previous = cache.get(f'{base}{int(index) - 1}', 0)
+    if previous * (1 - elapsed / window) + current <= limit:
+        return 0
+
+    cache.decr(current_key)
+    _incr(f'{REJECTED_PREFIX}{group}', None)
+    logger.warning("Rate limit %s (%s) exceeded by %s", group, rate, key)
+    return _retry_after(limit, window, elapsed, previous, current - 1)
+
+
+def rejection_counts():
+    """{group: rejected requests} over every worker since the last reset."""
+    counts = cache.get_many([f'{REJECTED_PREFIX}{group}' for group in groups])
+    return {group: counts.get(f'{REJECTED_PREFIX}{group}', 0) for group in groups}
+
+
+def reset_rejection_counts():
+    cache.delete_many([f'{REJECTED_PREFIX}{group}' for group in groups])
+
+
+def _limited(retry_after):
+    response = HttpResponse(
+        'Zbyt wiele prób. Spróbuj ponownie za chwilę.', status=429, content_type='text/plain; charset=utf-8'
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(rate, method='POST', group=None):
+    """
+    Limit ``method`` requests (None for all) to a view per client, e.g.
+    ``@ratelimit('5/m')``. The group defaults to the view's name, so the sync
+    and async versions of a view share their counts. Works on sync and
+    coroutine views.
+    """
+    parse_rate(rate)
+
+    def decorator(view):
+        name = group or view.__name__
+        groups[name] = rate
+
+        def check(request):
+            if method is not None and request.method != method:
+                return 0
+            return hit(name, client_key(request), rate)
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                retry_after = await sync_to_async(check, thread_sensitive=False)(request)
+                if retry_after:
+                    return _limited(retry_after)
+                return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            retry_after = check(request)
+            if retry_after:
+                return _limited(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,58 @@
+import re
+from html import unescape
+
+from django.utils.text import slugify
+
+from .templatetags.sanitize import ALLOWLIST_VERSION, clean_html
+
+# Average Polish reading speed used for the "min czytania" estimate
+WORDS_PER_MINUTE = 200
+
+# Headings that get an anchor and an entry in the table of contents
+_HEADING_RE = re.compile(r'<(h[23])>(.*?)</\1>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def plain_text(html):
+    """Tags replaced by spaces (so block boundaries keep words apart), entities decoded."""
+    return ' '.join(unescape(_TAG_RE.sub(' ', html)).split())
+
+
+def _add_heading_anchors(html):
+    """Give every h2/h3 a unique id and collect them into a TOC list."""
+    toc = []
+    used = set()
+
+    def replace(match):
+        tag, inner = match.group(1).lower(), match.group(2)
+        text = plain_text(inner)
+        base = slugify(text) or 'sekcja'
+        anchor, n = base, 2
+        while anchor in used:
+            anchor = f"{base}-{n}"
+            n += 1
+        used.add(anchor)
+        toc.append({'id': anchor, 'title': text, 'level': int(tag[1])})
+        return f'<{tag} id="{anchor}">{inner}</{tag}>'
+
+    return _HEADING_RE.sub(replace, html), toc
+
+
+def render_post_content(content):
+    """
+    Sanitize raw article HTML once and derive the artifacts the detail page needs.
+
+    Returns a dict with the ready-to-serve HTML, the table of contents,
+    the word count, the estimated read time and the allowlist version
+    the HTML was produced with.
+    """
+    html, toc = _add_heading_anchors(clean_html(content))
+    word_count = len(_WORD_RE.findall(plain_text(html)))
+    return {
+        'content_html': html,
+        'content_toc': toc,
+        'word_count': word_count,
+        'read_time': max(1, round(word_count / WORDS_PER_MINUTE)),
+        'render_version': ALLOWLIST_VERSION,
+    }
@@ -0,0 +1,237 @@
+"""
+Retention and archival for the CookieConsent audit log.
+
+Rows older than CONSENT_RETENTION_DAYS are written to gzip-compressed JSONL
+files (one file per calendar month, appended to on every run) under
+CONSENT_ARCHIVE_DIR and then deleted in chunks, so a run never holds a long
+lock on the table. On PostgreSQL the table can optionally be converted to
+monthly range partitions; expired months are then archived and dropped as a
+whole instead of deleted row by row. Everything is driven by
+``manage.py prune_cookie_consents``.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .models import CookieConsent
+
+logger = logging.getLogger(__name__)
+
+TABLE = CookieConsent._meta.db_table
+FIELDS = ['id', 'consented_at', 'analytics_consent', 'ip_address', 'session_key', 'user_agent']
+
+
+def archive_rows(rows, archive_dir):
+    """Append rows to per-month .jsonl.gz files and fsync them before returning."""
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(row['consented_at'].strftime('%Y-%m'), []).append(row)
+
+    for month, month_rows in by_month.items():
+        path = archive_dir / f'cookie_consents-{month}.jsonl.gz'
+        # Each run appends a new gzip member; readers see one continuous stream
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+                for row in month_rows:
+                    gz.write(json.dumps(row, cls=DjangoJSONEncoder).encode() + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+    return len(rows)
+
+
+def prune(cutoff, archive_dir=None, chunk_size=1000):
+    """
+    Archive (unless ``archive_dir`` is None) and delete rows older than ``cutoff``.
+
+    Works in primary-key chunks, one short transaction per chunk.
+    Returns the number of rows deleted.
+    """
+    expired = CookieConsent.objects.filter(consented_at__lt=cutoff).order_by('pk')
+    deleted = 0
+    while True:
+        rows = list(expired.values(*FIELDS)[:chunk_size])
+        if not rows:
+            return deleted
+        if archive_dir is not None:
+            archive_rows(rows, archive_dir)
+        with transaction.atomic():
+            deleted += CookieConsent.objects.filter(pk__in=[row['id'] for row in rows]).delete()[0]
+
+
+# --- PostgreSQL monthly partitioning ---------------------------------------
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions():
+    """Existing monthly partitions as {month_start: table_name}."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass', [TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f'{TABLE}_p'
+    return {
+        datetime.strptime(name[len(prefix):], '%Y%m').replace(tzinfo=dt_timezone.utc): name
+        for name in names if name.startswith(prefix)
+    }
+
+
+def ensure_partitions(now, months_ahead=3):
+    """
+    Create monthly partitions from this month up to ``months_ahead`` ahead.
+
+    A run that comes late finds rows of a new month already in the DEFAULT
+    partition, and PostgreSQL refuses to add a partition for a range the
+    default partition holds rows of. So each month is created as a plain
+    table, its rows are moved into it out of the default partition and it is
+    attached, all in one transaction.
+    """
+    existing = monthly_partitions()
+    default = f'{TABLE}_default'
+    columns = ', '.join(FIELDS)
+    created = []
+    for offset in range(months_ahead + 1):
+        month = _add_months(_month_start(now), offset)
+        if month in existing:
+            continue
+        name = _partition_name(month)
+        bounds = [month, _add_months(month, 1)]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [default])
+            if cursor.fetchone()[0] is None:
+                cursor.execute(
+                    f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)', bounds
+                )
+            else:
+                # Taken up front: ATTACH needs it anyway to check the default partition
+                cursor.execute(f'LOCK TABLE {default} IN ACCESS EXCLUSIVE MODE')
+                cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)')
+                cursor.execute(
+                    f'WITH moved AS (DELETE FROM {default} WHERE consented_at >= %s AND consented_at < %s '
+                    f'RETURNING {columns}) INSERT INTO {name} ({columns}) SELECT {columns} FROM moved',
+                    bounds,
+                )
+                if cursor.rowcount:
+                    logger.info("Moved %s cookie consent(s) from %s into %s", cursor.rowcount, default, name)
+                cursor.execute(
+                    f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', bounds
+                )
+        created.append(name)
+    return created
+
+
+def drop_expired_partitions(cutoff, archive_dir=None, chunk_size=1000):
+    """Archive and drop whole monthly partitions that end before ``cutoff``."""
+    dropped = 0
+    for month, name in sorted(monthly_partitions().items()):
+        if _add_months(month, 1) > cutoff:
+            continue
+        if archive_dir is not None:
+            last_id = 0
+            while True:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT {", ".join(FIELDS)} FROM {name} WHERE id > %s ORDER BY id LIMIT %s',
+                        [last_id, chunk_size],
+                    )
+                    rows = [dict(zip(FIELDS, row)) for row in cursor.fetchall()]
+                if not rows:
+                    break
+                archive_rows(rows, archive_dir)
+                last_id = rows[-1]['id']
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {name}')
+            dropped += cursor.fetchone()[0]
+            cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+            cursor.execute(f'DROP TABLE {name}')
+        logger.info("Dropped cookie consent partition %s", name)
+    return dropped
+
+
+def convert_to_partitioned(now, months_ahead=3):
+    """
+    Rebuild app_cookieconsent as a table range-partitioned by month.
+
+    Runs in one transaction under an exclusive lock. The primary key becomes
+    (id, consented_at), because PostgreSQL requires unique constraints to
+    include the partition key. The id sequence and the Django indexes are
+    carried over. A DEFAULT partition catches rows outside the monthly ranges.
+    """
+    old = f'{TABLE}_unpartitioned'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+        cursor.execute(
+            "SELECT attidentity <> '' FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+            [old],
+        )
+        is_identity = cursor.fetchone()[0]
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [old])
+        old_sequence = cursor.fetchone()[0]
+
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY RANGE (consented_at)'
+        )
+        cursor.execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+
+        cursor.execute(f'SELECT min(consented_at) FROM {old}')
+        first = cursor.fetchone()[0] or now
+        month = _month_start(first)
+        last = _add_months(_month_start(now), months_ahead)
+        while month <= last:
+            cursor.execute(
+                f'CREATE TABLE {_partition_name(month)} PARTITION OF {TABLE} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [month, _add_months(month, 1)],
+            )
+            month = _add_months(month, 1)
+
+        columns = ', '.join(FIELDS)
+        cursor.execute(f'INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {old}')
+
+        if is_identity:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+            sequence = cursor.fetchone()[0]
+            cursor.execute(
+                f'SELECT setval(%s, COALESCE((SELECT max(id) FROM {TABLE}), 0) + 1, false)', [sequence]
+            )
+        else:
+            # serial: keep the same sequence alive when the old table is dropped
+            cursor.execute(f'ALTER SEQUENCE {old_sequence} OWNED BY {TABLE}.id')
+
+        cursor.execute(f'DROP TABLE {old}')
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, consented_at)')
+        cursor.execute(f'CREATE INDEX cookieconsent_at_idx ON {TABLE} (consented_at)')
+        cursor.execute(f'CREATE INDEX cookieconsent_session_idx ON {TABLE} (session_key)')
@@ -0,0 +1,277 @@
+"""
+Full-text search for blog posts.
+
+PostgreSQL keeps a weighted ``tsvector`` column on app_blogpost behind a GIN
+index; SQLite keeps an FTS5 table keyed by post id. Both are created by
+migration 0008, which also indexes the posts already there, and kept in sync
+from the BlogPost post_save/post_delete signals (see app/signals.py). Run
+``manage.py rebuild_search_index`` to rebuild the index from scratch.
+"""
+import logging
+import re
+from html import escape, unescape
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, IntegerField, Q, When
+from django.utils.safestring import mark_safe
+
+from .rendering import plain_text
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'app_blogpost_fts'
+
+# Upper bound on ranked ids pulled from the index for a single query
+MAX_RESULTS = 500
+
+
+def _pk_subquery(queryset):
+    """SQL and params selecting the ids of ``queryset``, to limit a ranked query to it."""
+    return queryset.order_by().values('pk').query.sql_with_params()
+
+# Highlight markers are control characters so they survive escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _stem(token):
+    """Very light Polish stemming: drop the inflected ending, match by prefix."""
+    if len(token) > 5:
+        return token[:-2]
+    if len(token) > 4:
+        return token[:-1]
+    return token
+
+
+def query_terms(query):
+    return [_stem(token.lower()) for token in _TOKEN_RE.findall(query or '')][:10]
+
+
+def document_for(post):
+    """Plain-text fields indexed for a post, in weight order."""
+    body = post.content_html or post.content
+    return {
+        'title': post.title,
+        'meta_keywords': post.meta_keywords,
+        'excerpt': post.excerpt,
+        'content': plain_text(body),
+    }
+
+
+def highlight(fragment):
+    """Escape a backend snippet and turn its markers into <mark> tags."""
+    html = escape(fragment).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+class SQLiteSearchBackend:
+    """FTS5 with diacritic folding and bm25 ranking."""
+
+    # bm25 column weights: title, meta_keywords, excerpt, content
+    WEIGHTS = (10.0, 6.0, 4.0, 1.0)
+
+    def _match(self, query):
+        terms = query_terms(query)
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def index(self, post):
+        doc = document_for(post)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, meta_keywords, excerpt, content) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                [post.pk, doc['title'], doc['meta_keywords'], doc['excerpt'], doc['content']],
+            )
+
+    def remove(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+    def search(self, query, queryset, limit=MAX_RESULTS):
+        match = self._match(query)
+        if not match:
+            return []
+        within, within_params = _pk_subquery(queryset)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({within}) '
+                f'ORDER BY bm25({FTS_TABLE}, %s, %s, %s, %s) LIMIT %s',
+                [match, *within_params, *self.WEIGHTS, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def snippets(self, query, ids):
+        match = self._match(query)
+        if not match or not ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, snippet({FTS_TABLE}, 3, %s, %s, '…', 24) FROM {FTS_TABLE} "
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})',
+                [_MARK_START, _MARK_END, match, *ids],
+            )
+            return {pk: highlight(fragment) for pk, fragment in cursor.fetchall()}
+
+
+class PostgresSearchBackend:
+    """Weighted tsvector + GIN, Polish config and unaccent when installed."""
+
+    def __init__(self):
+        self._config = None
+        self._unaccent = None
+
+    def _detect(self):
+        if self._config is not None:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'unaccent'")
+            self._unaccent = cursor.fetchone() is not None
+            config = getattr(settings, 'BLOG_SEARCH_CONFIG', 'polish')
+            cursor.execute('SELECT 1 FROM pg_ts_config WHERE cfgname = %s', [config])
+            self._config = config if cursor.fetchone() else 'simple'
+
+    def _text(self, placeholder='%s'):
+        return f'unaccent({placeholder})' if self._unaccent else placeholder
+
+    def _tsquery(self, query):
+        terms = query_terms(query)
+        return ' & '.join(f"'{term}':*" for term in terms)
+
+    def index(self, post):
+        self._detect()
+        doc = document_for(post)
+        vector = ' || '.join(
+            f"setweight(to_tsvector(%s::regconfig, {self._text()}), '{weight}')"
+            for weight in 'ABCD'
+        )
+        params = []
+        for field in ('title', 'meta_keywords', 'excerpt', 'content'):
+            params += [self._config, doc[field]]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE app_blogpost SET search_vector = {vector} WHERE id = %s',
+                params + [post.pk],
+            )
+
+    def remove(self, pk):
+        # The vector lives on the row itself and goes away with it
+        pass
+
+    def search(self, query, queryset, limit=MAX_RESULTS):
+        tsquery = self._tsquery(query)
+        if not tsquery:
+            return []
+        self._detect()
+        within, within_params = _pk_subquery(queryset)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM app_blogpost, to_tsquery(%s::regconfig, {self._text()}) query '
+                f'WHERE search_vector @@ query AND id IN ({within}) '
+                f'ORDER BY ts_rank_cd(search_vector, query) DESC LIMIT %s',
+                [self._config, tsquery, *within_params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def snippets(self, query, ids):
+        tsquery = self._tsquery(query)
+        if not tsquery or not ids:
+            return {}
+        self._detect()
+        options = f'StartSel={_MARK_START}, StopSel={_MARK_END}, MaxWords=35, MinWords=15'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id, ts_headline(%s::regconfig, regexp_replace(content_html, '<[^>]+>', ' ', 'g'), "
+                f'to_tsquery(%s::regconfig, {self._text()}), %s) '
+                f'FROM app_blogpost WHERE id = ANY(%s)',
+                [self._config, self._config, tsquery, options, list(ids)],
+            )
+            return {
+                pk: highlight(' '.join(unescape(fragment).split()))
+                for pk, fragment in cursor.fetchall()
+            }
+
+
+class BasicSearchBackend:
+    """Unindexed icontains fallback for databases without a full-text backend."""
+
+    def index(self, post):
+        pass
+
+    def remove(self, pk):
+        pass
+
+    def search(self, query, queryset, limit=MAX_RESULTS):
+        if not query:
+            return []
+        posts = queryset.filter(
+            Q(title__icontains=query) |
+            Q(excerpt__icontains=query) |
+            Q(content__icontains=query) |
+            Q(meta_keywords__icontains=query)
+        )
+        return list(posts.values_list('pk', flat=True)[:limit])
+
+    def snippets(self, query, ids):
+        return {}
+
+
+_backends = {}
+
+
+def get_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == 'postgresql':
+            _backends[vendor] = PostgresSearchBackend()
+        elif vendor == 'sqlite':
+            _backends[vendor] = SQLiteSearchBackend()
+        else:
+            _backends[vendor] = BasicSearchBackend()
+    return _backends[vendor]
+
+
+def search_posts(queryset, query):
+    """
+    Narrow ``queryset`` to posts matching ``query``, ordered by rank. The
+    ranked query itself is limited to ``queryset`` (published posts, a
+    category), so MAX_RESULTS counts only posts that can be shown.
+    """
+    try:
+        ids = get_backend().search(query, queryset)
+    except DatabaseError as exc:
+        logger.error("Full-text search failed, falling back to icontains: %s", exc)
+        ids = BasicSearchBackend().search(query, queryset)
+    if not ids:
+        return queryset.none()
+    ranking = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(ranking)
+
+
+def attach_snippets(posts, query):
+    """Set ``search_snippet`` on each post of an already-sliced page."""
+    posts = list(posts)
+    try:
+        snippets = get_backend().snippets(query, [post.pk for post in posts])
+    except DatabaseError as exc:
+        logger.error("Search snippets failed: %s", exc)
+        snippets = {}
+    for post in posts:
+        post.search_snippet = snippets.get(post.pk, '')
+    return posts
+
+
+def index_post(post):
+    try:
+        get_backend().index(post)
+    except Exception as exc:
+        logger.error("Search index update failed for post %s: %s", post.pk, exc)
+
+
+def remove_post(pk):
+    try:
+        get_backend().remove(pk)
+    except Exception as exc:
+        logger.error("Search index removal failed for post %s: %s", pk, exc)
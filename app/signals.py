@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import blog_cache, pagination, search, sitemaps
+from .models import BlogCategory, BlogPost
+
+SEARCH_FIELDS = {'title', 'meta_keywords', 'excerpt', 'content'}
+
+
+@receiver(post_save, sender=BlogPost)
+def index_blog_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+def unindex_blog_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_save, sender=BlogCategory)
+@receiver(post_delete, sender=BlogCategory)
+def invalidate_sitemap(sender, **kwargs):
+    sitemaps.invalidate()
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_blog_counts(sender, **kwargs):
+    pagination.invalidate_counts()
+
+
+@receiver(pre_save, sender=BlogPost)
+def remember_blog_post_keys(sender, instance, **kwargs):
+    # Cache entries are keyed by slug and category; note the stored ones
+    old = sender.objects.filter(pk=instance.pk).values('slug', 'category_id').first() if instance.pk else None
+    instance._cached_keys = old or {}
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_delete, sender=BlogPost)
+def invalidate_blog_post_cache(sender, instance, **kwargs):
+    old = getattr(instance, '_cached_keys', {})
+    blog_cache.invalidate_post(instance, old.get('slug'), old.get('category_id'))
+
+
+@receiver(post_save, sender=BlogCategory)
+def invalidate_blog_category_cache(sender, instance, **kwargs):
+    slugs = BlogPost.objects.filter(category_id=instance.pk).values_list('slug', flat=True)
+    blog_cache.invalidate_category(instance, list(slugs))
+
+
+@receiver(post_delete, sender=BlogCategory)
+def invalidate_blog_cache_on_category_delete(sender, instance, **kwargs):
+    # Its posts were detached by a bulk SET NULL update, which sends no signals
+    blog_cache.invalidate_all()
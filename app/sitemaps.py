@@ -1,5 +1,17 @@
+import gzip
+import hashlib
+import time
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
+from django.http import HttpResponse
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date
+from django.views.decorators.http import require_GET
 from .models import BlogPost, BlogCategory
 
 
@@ -52,3 +64,89 @@ class BlogCategorySitemap(Sitemap):
 
     def location(self, item):
         return reverse('blog_category', kwargs={'slug': item.slug})
+
+
+SITEMAPS = {
+    'static': StaticViewSitemap,
+    'blog': BlogPostSitemap,
+    'categories': BlogCategorySitemap,
+}
+
+
+# --- Cached sitemap serving -------------------------------------------------
+#
+# The XML is rendered once per cache generation (bumped by BlogPost /
+# BlogCategory signals, see app/signals.py) and served from the cache with
+# ETag / Last-Modified, 304s and a pre-compressed gzip variant. Past
+# SITEMAP_INDEX_THRESHOLD URLs /sitemap.xml becomes a sitemap index pointing
+# at per-section /sitemap-<section>.xml files.
+
+GENERATION_KEY = 'sitemap:generation'
+
+
+def invalidate():
+    """Make every cached sitemap stale (called on blog content changes)."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def _use_index():
+    total = sum(sitemap().paginator.count for sitemap in SITEMAPS.values())
+    return total > getattr(settings, 'SITEMAP_INDEX_THRESHOLD', 500)
+
+
+def _build(request, section):
+    if section is None and _use_index():
+        response = sitemap_views.index(request, SITEMAPS, sitemap_url_name='sitemap_section')
+    else:
+        response = sitemap_views.sitemap(request, SITEMAPS, section=section)
+    response.render()
+
+    content = response.content
+    last_modified = response.headers.get('Last-Modified')
+    return {
+        'content': content,
+        'gzip': gzip.compress(content),
+        'content_type': response['Content-Type'],
+        'etag': hashlib.md5(content).hexdigest(),
+        'last_modified': parse_http_date(last_modified) if last_modified else int(time.time()),
+    }
+
+
+def _entry(request, section):
+    generation = cache.get(GENERATION_KEY, 0)
+    site = get_current_site(request)
+    key = (
+        f'sitemap:{generation}:{request.scheme}:{site.domain}:'
+        f'{section or "root"}:{request.GET.get("p", "1")}'
+    )
+    entry = cache.get(key)
+    if entry is None:
+        entry = _build(request, section)
+        cache.set(key, entry, getattr(settings, 'SITEMAP_CACHE_TIMEOUT', 3600))
+    return entry
+
+
+@require_GET
+def cached_sitemap(request, section=None):
+    entry = _entry(request, section)
+    use_gzip = 'gzip' in request.headers.get('Accept-Encoding', '')
+    etag = f'"{entry["etag"]}{"-gz" if use_gzip else ""}"'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=entry['last_modified'])
+    if not_modified is not None:
+        return not_modified
+
+    response = HttpResponse(
+        entry['gzip'] if use_gzip else entry['content'],
+        content_type=entry['content_type'],
+    )
+    if use_gzip:
+        response['Content-Encoding'] = 'gzip'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['X-Robots-Tag'] = 'noindex, noodp, noarchive'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,94 @@
+"""
+Static files storage: WhiteNoise's compressed manifest storage, plus CSS
+bundles and responsive image variants.
+
+For each ``bundle: entry`` pair in CSS_BUNDLES, collectstatic writes the
+bundled stylesheet (see app/css_bundler.py) and its ``.map`` next to the
+collected files before hashing, so both get a content hash, a manifest entry
+and gzip/brotli variants like any other static file. Afterwards the
+per-template critical CSS is extracted from the hashed bundles.
+
+Images matching RESPONSIVE_IMAGE_SOURCES get resized AVIF/WebP/original
+format variants the same way (see app/images.py).
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+from . import critical_css, images
+from .css_bundler import build
+
+logger = logging.getLogger(__name__)
+
+
+class BundlingStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for bundle_path, map_path in self.build_bundles(paths):
+                paths[bundle_path] = (self, bundle_path)
+                paths[map_path] = (self, map_path)
+            for variant_path in self.build_image_variants(paths):
+                paths[variant_path] = (self, variant_path)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if not dry_run:
+            self.build_critical_css()
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # A {% static %} path that doesn't exist (e.g. images/og-default.jpg)
+            # gets its unhashed URL instead of failing the whole page
+            logger.warning("Static file %s is missing from the manifest", name)
+            return name
+
+    def build_bundles(self, paths):
+        def read(path):
+            storage, source_path = paths[path]
+            with storage.open(source_path) as handle:
+                return handle.read().decode('utf-8')
+
+        built = []
+        for bundle_path, entry in getattr(settings, 'CSS_BUNDLES', {}).items():
+            css, source_map = build(entry, bundle_path, read)
+            map_path = f'{bundle_path}.map'
+            self._write(bundle_path, css.encode('utf-8'))
+            self._write(map_path, source_map.encode('utf-8'))
+            built.append((bundle_path, map_path))
+        return built
+
+    def build_image_variants(self, paths):
+        index, written = {}, []
+        for path in sorted(p for p in paths if images.is_source(p)):
+            storage, source_path = paths[path]
+            with storage.open(source_path) as handle:
+                index[path], files = images.generate(path, handle.read())
+            for variant_path, data in files:
+                self._write(variant_path, data)
+                written.append(variant_path)
+        self._write(images.RESPONSIVE_IMAGES_INDEX, json.dumps(index).encode('utf-8'))
+        logger.info("Generated %s responsive image variant(s) for %s image(s)", len(written), len(index))
+        return written
+
+    def _write(self, path, content):
+        if self.exists(path):
+            self.delete(path)
+        self._save(path, ContentFile(content))
+
+    def build_critical_css(self):
+        """Per-template critical CSS from the hashed bundles (app/critical_css.py)."""
+        manifest, reports = {}, {}
+        for bundle_path in getattr(settings, 'CSS_BUNDLES', {}):
+            with self.open(self.stored_name(bundle_path)) as handle:
+                css = handle.read().decode('utf-8')
+            manifest[bundle_path], reports[bundle_path] = critical_css.build(css, self.url(bundle_path))
+            logger.info(
+                "Critical CSS for %s:\n%s", bundle_path, critical_css.format_report(reports[bundle_path])
+            )
+        self._write(critical_css.CRITICAL_CSS_MANIFEST, json.dumps(manifest).encode('utf-8'))
+        return reports
@@ -0,0 +1,151 @@
+"""
+Duplicate suppression for the booking and training inquiry forms.
+
+Every form carries ``{{ submission_key }}``, a random key made when the page
+is served (per response on cached pages, like the CSRF token). The first
+POST with a key claims it in the cache for SUBMISSION_DEDUP_WINDOW seconds
+and records the redirect it answered with; a double click or retry with the
+same key gets that redirect back from one cache lookup, without a second row
+or email. A retry that arrives while the first POST is still running waits
+up to SUBMISSION_WAIT seconds for its outcome. POSTs that don't redirect
+(invalid forms, errors) release the key.
+
+A resubmission from a freshly loaded page carries a new key, so rows also
+store contact_fingerprint, a hash of the normalized email and phone, indexed
+with created_at: find_duplicate() looks up a row from the same contact
+within the window in one index probe.
+"""
+import functools
+import hashlib
+import re
+import secrets
+import time
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponseRedirect
+from django.utils import timezone
+
+SUBMISSION_KEY_FIELD = 'submission_key'
+# Stands in for the key in pages stored by @cached_form_page
+SUBMISSION_KEY_PLACEHOLDER = 'submissionkeyplaceholder0b5c2e9d'
+KEY_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+KEY_PREFIX = 'submission:'
+PENDING = 'pending'
+
+
+def submission_key():
+    return secrets.token_urlsafe(16)
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_phone(phone):
+    """Digits only, without the Polish country code: '+48 600-100-200' -> '600100200'."""
+    digits = re.sub(r'\D', '', phone or '')
+    for prefix in ('0048', '48'):
+        if digits.startswith(prefix) and len(digits) - len(prefix) == 9:
+            return digits[len(prefix):]
+    return digits
+
+
+def contact_fingerprint(email, phone):
+    """Indexed hash of who submitted a form; '' when there is neither email nor phone."""
+    email, phone = normalize_email(email), normalize_phone(phone)
+    if not email and not phone:
+        return ''
+    return hashlib.sha256(f'{email}|{phone}'.encode('utf-8')).hexdigest()[:32]
+
+
+def _window():
+    return getattr(settings, 'SUBMISSION_DEDUP_WINDOW', 600)
+
+
+def find_duplicate(model, fingerprint, **same):
+    """Latest ``model`` row from ``fingerprint`` within the window (matching ``same``), or None."""
+    if not fingerprint:
+        return None
+    since = timezone.now() - timedelta(seconds=_window())
+    return (
+        model.objects.filter(contact_fingerprint=fingerprint, created_at__gte=since, **same)
+        .order_by('-created_at').first()
+    )
+
+
+def _claim(request, scope):
+    """
+    None when this POST may run (its key is now claimed, or it has none),
+    else the URL the first POST with the same key redirected to.
+    """
+    key = request.POST.get(SUBMISSION_KEY_FIELD, '')
+    if not KEY_RE.match(key):
+        return None
+    cache_key = f'{KEY_PREFIX}{scope}:{key}'
+    deadline = time.monotonic() + getattr(settings, 'SUBMISSION_WAIT', 3)
+    while not cache.add(cache_key, PENDING, _window()):
+        outcome = cache.get(cache_key)
+        if outcome not in (None, PENDING):
+            return outcome
+        if outcome is None:
+            continue
+        if time.monotonic() >= deadline:
+            # The first POST is taking too long; don't make the visitor wait for it
+            return None
+        time.sleep(0.05)
+    request.submission_key = cache_key
+    return None
+
+
+def _finish(request, response):
+    cache_key = getattr(request, 'submission_key', None)
+    if cache_key is None:
+        return
+    if isinstance(response, HttpResponseRedirect):
+        cache.set(cache_key, response['Location'], _window())
+    else:
+        cache.delete(cache_key)
+
+
+def idempotent(scope):
+    """
+    Answer repeated POSTs of one submission key to the view with the first
+    one's redirect. Works on sync and coroutine views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != 'POST':
+                    return await view(request, *args, **kwargs)
+                location = await sync_to_async(_claim, thread_sensitive=False)(request, scope)
+                if location:
+                    return HttpResponseRedirect(location)
+                try:
+                    response = await view(request, *args, **kwargs)
+                except BaseException:
+                    await sync_to_async(_finish, thread_sensitive=False)(request, None)
+                    raise
+                await sync_to_async(_finish, thread_sensitive=False)(request, response)
+                return response
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view(request, *args, **kwargs)
+            location = _claim(request, scope)
+            if location:
+                return HttpResponseRedirect(location)
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                _finish(request, None)
+                raise
+            _finish(request, response)
+            return response
+        return wrapper
+    return decorator
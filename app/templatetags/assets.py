@@ -0,0 +1,109 @@
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from app.critical_css import critical_css_for
+from app.fonts import preload_files
+from app.images import image_info, intrinsic_size
+from app.thumbnails import thumbnail_for
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def stylesheet(context, entry):
+    """
+    <link> to the collectstatic bundle of ``entry`` (see CSS_BUNDLES), or to
+    ``entry`` itself in DEBUG, where the split @import files are served as-is.
+
+    When collectstatic built critical CSS for the page template, that is
+    inlined and the bundle is preloaded without blocking first paint.
+    """
+    if settings.DEBUG:
+        return format_html('<link rel="stylesheet" href="{}">', static(entry))
+    bundle = next((b for b, e in getattr(settings, 'CSS_BUNDLES', {}).items() if e == entry), None)
+    if bundle is None:
+        return format_html('<link rel="stylesheet" href="{}">', static(entry))
+
+    href = static(bundle)
+    template_name = getattr(context.template, 'name', None)
+    critical = critical_css_for(bundle, template_name) if template_name else None
+    if not critical:
+        return format_html('<link rel="stylesheet" href="{}">', href)
+    return format_html(
+        '<style>{}</style>\n'
+        '  <link rel="preload" href="{}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '  <noscript><link rel="stylesheet" href="{}"></noscript>',
+        # Never let the stylesheet close the <style> element early
+        mark_safe(critical.replace('</', '<\\/')), href, href,
+    )
+
+
+@register.simple_tag
+def font_preloads():
+    """
+    Preload hints for the self-hosted WEB_FONT_PRELOAD faces (see app/fonts.py),
+    or preconnects to Google Fonts until ``manage.py subset_fonts`` has run.
+    """
+    files = preload_files()
+    if files is None:
+        return format_html(
+            '<link rel="preconnect" href="https://fonts.googleapis.com">\n'
+            '  <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>'
+        )
+    return format_html_join(
+        '\n  ', '<link rel="preload" href="{}" as="font" type="font/woff2" crossorigin>',
+        ((static(path),) for path in files),
+    )
+
+
+@register.simple_tag
+def responsive_img(path, alt='', sizes='100vw', loading='lazy', width=None, height=None, **attrs):
+    """
+    <picture> with AVIF/WebP sources and a srcset over the widths generated by
+    collectstatic (see app/images.py). width/height default to the image's
+    intrinsic size so the browser can reserve space before it loads. Extra
+    keyword arguments (class, style, ...) become <img> attributes.
+
+    Without generated variants (DEBUG, or before collectstatic) it renders a
+    plain <img> of the original file.
+    """
+    info = None if settings.DEBUG else image_info(path)
+    if info:
+        intrinsic = (info['width'], info['height'])
+    else:
+        intrinsic = intrinsic_size(path) or (None, None)
+    width = width or intrinsic[0]
+    height = height or intrinsic[1]
+
+    img_attrs = {'alt': alt, 'width': width, 'height': height, 'loading': loading, 'decoding': 'async', **attrs}
+    if not info:
+        img_attrs = {'src': static(path), **img_attrs}
+        return format_html('<img{}>', _attributes(img_attrs))
+
+    def srcset(variants):
+        return ', '.join(f'{static(variant)} {w}w' for w, variant in variants)
+
+    fallback = info['sources'][info['fallback']]
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((mime, srcset(variants), sizes) for mime, variants in info['sources'].items() if mime != info['fallback']),
+    )
+    img_attrs = {'src': static(fallback[-1][1]), 'srcset': srcset(fallback), 'sizes': sizes, **img_attrs}
+    return format_html('<picture>{}<img{}></picture>', sources, _attributes(img_attrs))
+
+
+@register.filter
+def thumbnail(source, size):
+    """
+    ``{% with thumb=post.featured_image|thumbnail:'card' %}``: a WebP thumbnail
+    of an image URL with ``url``, ``width`` and ``height`` (see app/thumbnails.py
+    for the sizes).
+    """
+    return thumbnail_for(source, size) if source else None
+
+
+def _attributes(attrs):
+    return format_html_join('', ' {}="{}"', ((k, v) for k, v in attrs.items() if v is not None))
@@ -4,6 +4,10 @@ from django.utils.safestring import mark_safe
 
 register = template.Library()
 
+# Bump whenever the allowlist below changes — stored BlogPost.content_html
+# rendered with an older version is re-sanitized on next access.
+ALLOWLIST_VERSION = 1
+
 # Whitelist of tags allowed — covers rich-text editor output + inline SVG icons
 ALLOWED_TAGS = [
     'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'div', 'em',
@@ -37,16 +41,20 @@ ALLOWED_ATTRIBUTES = {
 ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
 
 
-@register.filter(name='sanitize_html')
-def sanitize_html(value):
-    """Sanitize HTML content, allowing only safe tags and attributes."""
+def clean_html(value):
+    """Run bleach with the allowlist above and return the cleaned string."""
     if not value:
         return ''
-    cleaned = bleach.clean(
+    return bleach.clean(
         value,
         tags=ALLOWED_TAGS,
         attributes=ALLOWED_ATTRIBUTES,
         protocols=ALLOWED_PROTOCOLS,
         strip=True,
     )
-    return mark_safe(cleaned)
+
+
+@register.filter(name='sanitize_html')
+def sanitize_html(value):
+    """Sanitize HTML content, allowing only safe tags and attributes."""
+    return mark_safe(clean_html(value))
@@ -0,0 +1,312 @@
+import re
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import outbox
+from .counters import LOCK_KEY, ViewCounter
+from .forms import AppointmentForm
+from .ingest import ConsentBuffer
+from .models import Appointment, BlogCategory, BlogPost, CookieConsent, OutboxEmail
+from .search import get_backend, search_posts
+from .views import _saveBooking, sendAdminNotification
+
+DIGEST_WINDOW = 600
+EXPLAIN_POSTS = 100_000
+
+# Plan lines that mean a blog query is reading the whole table or sorting it
+FULL_SCAN_PATTERNS = {
+    'sqlite': [
+        re.compile(r'\bSCAN app_blogpost\b(?! USING (COVERING )?INDEX)'),
+        re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    ],
+    'postgresql': [
+        re.compile(r'Seq Scan on app_blogpost\b'),
+        re.compile(r'(?<!Incremental )\bSort\s+\(cost'),
+    ],
+}
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    ADMIN_NOTIFICATION_EMAIL='admin@example.com',
+    ADMIN_DIGEST_URGENT=['dsr'],
+)
+class AdminDigestTests(TestCase):
+    def notify(self, n, kind='booking'):
+        for i in range(n):
+            sendAdminNotification(subject=f'Powiadomienie {i}', body=f'Treść {i}', kind=kind)
+
+    def age_held(self):
+        """Make every held notification older than the digest window."""
+        OutboxEmail.objects.filter(status='held').update(
+            created_at=timezone.now() - timedelta(seconds=DIGEST_WINDOW + 1)
+        )
+
+    @override_settings(ADMIN_DIGEST_WINDOW=0)
+    def test_no_window_sends_one_email_per_event(self):
+        self.notify(3)
+        outbox.process_batch()
+        self.assertEqual(sorted(m.subject for m in mail.outbox), ['Powiadomienie 0', 'Powiadomienie 1', 'Powiadomienie 2'])
+        self.assertFalse(OutboxEmail.objects.filter(status='held').exists())
+
+    @override_settings(ADMIN_DIGEST_WINDOW=DIGEST_WINDOW)
+    def test_notifications_are_held_and_sent_as_one_digest(self):
+        self.notify(3)
+        outbox.process_batch()
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboxEmail.objects.filter(status='held').count(), 3)
+
+        self.age_held()
+        outbox.process_batch()
+        self.assertEqual(len(mail.outbox), 1)
+        digest = mail.outbox[0]
+        self.assertEqual(digest.subject, 'Zestawienie powiadomień (3)')
+        self.assertEqual(digest.to, ['admin@example.com'])
+        for i in range(3):
+            self.assertIn(f'Powiadomienie {i}', digest.body)
+            self.assertIn(f'Treść {i}', digest.body)
+        self.assertEqual(OutboxEmail.objects.filter(status='digested').count(), 3)
+
+    @override_settings(ADMIN_DIGEST_WINDOW=DIGEST_WINDOW)
+    def test_digest_waits_for_the_window(self):
+        self.notify(2)
+        self.assertEqual(outbox.flush_digests(), 0)
+        self.assertEqual(OutboxEmail.objects.filter(status='held').count(), 2)
+
+    @override_settings(ADMIN_DIGEST_WINDOW=DIGEST_WINDOW)
+    def test_dsr_bypasses_the_window(self):
+        self.notify(1, kind='dsr')
+        outbox.process_batch()
+        self.assertEqual([m.subject for m in mail.outbox], ['Powiadomienie 0'])
+        self.assertFalse(OutboxEmail.objects.filter(status='held').exists())
+
+    @override_settings(ADMIN_DIGEST_WINDOW=DIGEST_WINDOW)
+    def test_lone_held_notification_goes_out_unchanged(self):
+        self.notify(1)
+        self.age_held()
+        outbox.process_batch()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Powiadomienie 0')
+        self.assertEqual(mail.outbox[0].body, 'Treść 0')
+        self.assertEqual(OutboxEmail.objects.get().status, 'sent')
+
+
+class BookingDedupTests(TestCase):
+    def book(self, subject='adhd', **data):
+        form = AppointmentForm({
+            'name': 'Anna Nowak', 'phone': '+48 600 100 200', 'email': 'anna@example.com',
+            'data_processing_consent': 'on', **data,
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        return _saveBooking(form, subject)
+
+    def test_resubmission_is_not_saved_again(self):
+        first = self.book()
+        again = self.book(phone='600-100-200', email='Anna@Example.com ')
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_other_person_from_the_same_contact_is_booked(self):
+        self.book()
+        self.book(name='Jan Nowak')
+        self.assertEqual(Appointment.objects.count(), 2)
+
+    def test_other_subject_from_the_same_person_is_booked(self):
+        self.book()
+        self.book(subject='terapia')
+        self.assertEqual(list(Appointment.objects.order_by('pk').values_list('subject', flat=True)), ['adhd', 'terapia'])
+
+
+@skipUnless(connection.vendor in FULL_SCAN_PATTERNS, 'No plan checks for this database backend')
+class BlogQueryPlanTests(TestCase):
+    """EXPLAIN the blog queries over EXPLAIN_POSTS posts; none may scan or sort the whole table."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = BlogCategory.objects.bulk_create(
+            BlogCategory(name=f'Explain {i}', slug=f'explain-{i}') for i in range(20)
+        )
+        now = timezone.now()
+        BlogPost.objects.bulk_create(
+            (
+                BlogPost(
+                    title=f'Explain post {i}',
+                    slug=f'explain-post-{i}',
+                    excerpt='Lorem ipsum',
+                    content='<p>Lorem ipsum</p>',
+                    category=categories[i % len(categories)],
+                    # One in ten is a draft, published ones spread over the years
+                    status='draft' if i % 10 == 0 else 'published',
+                    published_at=None if i % 10 == 0 else now - timedelta(minutes=i * 7),
+                    views_count=i % 5000,
+                )
+                for i in range(EXPLAIN_POSTS)
+            ),
+            batch_size=2000,
+        )
+        with connection.cursor() as cursor:
+            # Fresh statistics, as autovacuum / a maintained SQLite DB would have
+            cursor.execute('ANALYZE')
+
+    def queries(self):
+        """The blog queries from app/views.py and app/pagination.py, with sample parameters."""
+        published = BlogPost.objects.filter(status='published')
+        sample = published.order_by('-published_at', '-id')[200:201].get()
+        category = sample.category
+        cursor_filter = Q(published_at__lt=sample.published_at) | Q(
+            published_at=sample.published_at, id__lt=sample.pk
+        )
+        return {
+            'listing': published.select_related('category').order_by('-published_at', '-id')[:7],
+            'listing (cursor)': published.filter(published_at__lte=sample.published_at)
+            .filter(cursor_filter).order_by('-published_at', '-id')[:7],
+            'category listing': published.filter(category=category).order_by('-published_at', '-id')[:7],
+            'category listing (cursor)': published.filter(category=category)
+            .filter(published_at__lte=sample.published_at).filter(cursor_filter)
+            .order_by('-published_at', '-id')[:7],
+            'detail': BlogPost.objects.filter(slug=sample.slug, status='published'),
+            'related': published.filter(category=category).exclude(pk=sample.pk)[:3],
+            'recent': published.exclude(pk=sample.pk)[:5],
+            'popular': published.order_by('-views_count')[:5],
+        }
+
+    def assertPlansUseIndexes(self, patterns):
+        for name, queryset in self.queries().items():
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                bad = [line for line in plan.splitlines() if any(p.search(line) for p in patterns)]
+                self.assertEqual(bad, [], f'{name} falls back to a full scan or sort:\n{plan}')
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite plans')
+    def test_sqlite_plans_use_indexes(self):
+        self.assertPlansUseIndexes(FULL_SCAN_PATTERNS['sqlite'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL plans')
+    def test_postgresql_plans_use_indexes(self):
+        self.assertPlansUseIndexes(FULL_SCAN_PATTERNS['postgresql'])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    VIEW_COUNT_FLUSH_THRESHOLD=3,
+)
+class ViewCounterTests(TestCase):
+    def test_lost_lock_race_starts_a_new_window(self):
+        counter = ViewCounter()
+        cache.add(LOCK_KEY, 1)
+        for _ in range(3):
+            counter.hit(1)
+        self.assertEqual(counter._pending, 0)
+        self.assertEqual(counter._dirty, {1})
+
+        # The next hit doesn't retry the lock
+        cache.delete(LOCK_KEY)
+        counter.hit(1)
+        self.assertEqual(counter._pending, 1)
+        self.assertEqual(cache.get('blog:views:1'), 4)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        # Drafts that outrank the published post: the term is in their title
+        for i in range(3):
+            BlogPost.objects.create(title=f'Mindfulness {i}', slug=f'draft-{i}', content='<p>Mindfulness</p>')
+        cls.published = BlogPost.objects.create(
+            title='Uważność', slug='published', content='<p>Ćwiczenia mindfulness na co dzień</p>',
+            status='published', published_at=now,
+        )
+
+    def test_ranked_limit_counts_only_the_given_posts(self):
+        published = BlogPost.objects.filter(status='published')
+        self.assertEqual(get_backend().search('mindfulness', published, limit=2), [self.published.pk])
+
+    def test_search_posts_skips_drafts(self):
+        posts = search_posts(BlogPost.objects.filter(status='published'), 'mindfulness')
+        self.assertEqual(list(posts), [self.published])
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SearchIndexMigrationTests(TransactionTestCase):
+    before = [('app', '0007_blogpost_rendered_content')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_posts_written_before_the_index_are_found(self):
+        old_apps = self.migrate(self.before)
+        old_apps.get_model('app', 'BlogPost').objects.create(
+            title='Uważność', slug='uwaznosc', content='<p>Ćwiczenia mindfulness</p>',
+            content_html='<p>Ćwiczenia mindfulness</p>', status='published',
+        )
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        posts = search_posts(BlogPost.objects.all(), 'mindfulness')
+        self.assertEqual([post.slug for post in posts], ['uwaznosc'])
+
+
+@override_settings(CONSENT_BUFFER_MAX=3, CONSENT_BATCH_SIZE=100)
+class ConsentBufferTests(TestCase):
+    def test_failed_insert_keeps_records_and_logs_what_overflows(self):
+        buffer = ConsentBuffer()
+        buffer._ensure_thread = lambda: None
+        with mock.patch.object(CookieConsent.objects, 'bulk_create', side_effect=Exception('db down')):
+            with self.assertLogs('app.ingest', 'ERROR') as logs:
+                for i in range(4):
+                    buffer.add(CookieConsent(session_key=f's{i}'))
+        self.assertEqual([r.session_key for r in buffer._records], ['s1', 's2', 's3'])
+        self.assertTrue(any('dropped 1 record(s)' in line for line in logs.output))
+        self.assertTrue(any('"session_key": "s0"' in line for line in logs.output))
+
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(CookieConsent.objects.count(), 3)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    BLOG_NUMBERED_PAGES=5,
+)
+class BlogPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        BlogPost.objects.bulk_create(
+            BlogPost(
+                title=f'Wpis {i}', slug=f'wpis-{i}', content='<p>Treść</p>',
+                status='published', published_at=now - timedelta(hours=i),
+            )
+            for i in range(40)
+        )
+
+    def titles(self, response):
+        return [post.title for post in response.context['page_obj']]
+
+    def test_page_past_the_numbered_range_redirects_to_its_cursor(self):
+        response = self.client.get('/blog/?page=6', secure=True)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith('/blog/?after='))
+        page = self.client.get(response['Location'], secure=True)
+        self.assertEqual(self.titles(page), [f'Wpis {i}' for i in range(30, 36)])
+
+    def test_page_past_the_last_page_is_not_found(self):
+        self.assertEqual(self.client.get('/blog/?page=8', secure=True).status_code, 404)
+        self.assertEqual(self.client.get('/blog/?page=0', secure=True).status_code, 404)
+
+    def test_numbered_pages_are_served(self):
+        response = self.client.get('/blog/?page=5', secure=True)
+        self.assertEqual(self.titles(response), [f'Wpis {i}' for i in range(24, 30)])
@@ -0,0 +1,198 @@
+"""
+Sized WebP thumbnails of blog featured images.
+
+``BlogPost.featured_image`` is a free-form URL: a remote http(s) image or a
+path under STATIC_URL. The first time a (source, size) pair is rendered the
+``|thumbnail`` filter links to a signed URL; that view reads the source once
+(remote images with a timeout and a size limit), crops it to the size's
+aspect ratio, encodes WebP and stores it as ``<content hash>.webp`` under
+THUMBNAIL_ROOT. A small index file maps the pair to the stored name, so later
+renders link straight to the hashed file, which is served with a one-year
+immutable Cache-Control.
+
+Sources that can't be read or decoded fall back to the original URL; the
+failure is remembered for THUMBNAIL_FAILURE_TIMEOUT seconds so a broken
+image isn't refetched on every page view.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core import signing
+from django.core.cache import cache
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name: (width, height), twice the CSS box each one fills for 2x screens
+SIZES = {
+    'card': (800, 400),     # .blog-card-image: card width x 200px
+    'detail': (1600, 800),  # .featured-img: container width, max-height 500px
+    'related': (160, 120),  # .related-post-image: 80x60
+}
+WEBP_OPTIONS = {'quality': 80, 'method': 6}
+# Bump when the rendering changes so existing thumbnails are regenerated
+VERSION = 1
+SIGNING_SALT = 'app.thumbnails'
+NAME_RE = re.compile(r'^[0-9a-f]{20}\.webp$')
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+class Thumbnail:
+    def __init__(self, url, width, height):
+        self.url = url
+        self.width = width
+        self.height = height
+
+    def __str__(self):
+        return self.url
+
+
+def _root():
+    return Path(getattr(settings, 'THUMBNAIL_ROOT', settings.BASE_DIR / 'thumbnails'))
+
+
+def _key(source, size):
+    raw = f'{VERSION}|{size}|{SIZES[size]}|{source}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _index_path(key):
+    return _root() / 'index' / f'{key}.json'
+
+
+def lookup(source, size):
+    """Index entry {name, width, height} of an already generated thumbnail, or None."""
+    try:
+        return json.loads(_index_path(_key(source, size)).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def read_source(source):
+    """Bytes of ``source``: a file under STATIC_URL or an http(s) URL."""
+    parts = urlsplit(source)
+    if not parts.scheme and source.startswith(settings.STATIC_URL):
+        path = finders.find(parts.path[len(settings.STATIC_URL):])
+        if not path:
+            raise ThumbnailError(f'{source} is not a static file')
+        return Path(path).read_bytes()
+    if parts.scheme not in ('http', 'https'):
+        raise ThumbnailError(f'Unsupported image source {source!r}')
+
+    limit = getattr(settings, 'THUMBNAIL_MAX_SOURCE_BYTES', 10 * 1024 * 1024)
+    request = urllib.request.Request(source, headers={'User-Agent': 'spektrumumyslu-thumbnailer'})
+    try:
+        with urllib.request.urlopen(request, timeout=getattr(settings, 'THUMBNAIL_FETCH_TIMEOUT', 5)) as response:
+            data = response.read(limit + 1)
+    except (OSError, ValueError) as exc:
+        raise ThumbnailError(f'Fetching {source} failed: {exc}')
+    if len(data) > limit:
+        raise ThumbnailError(f'{source} is larger than {limit} bytes')
+    return data
+
+
+def render(data, size):
+    """WebP bytes and (width, height) of ``data`` cropped and resized to ``size``."""
+    target_width, target_height = SIZES[size]
+    try:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        raise ThumbnailError(f'Not a usable image: {exc}')
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    # Never upscale: a small source keeps the aspect ratio at its own size
+    scale = min(1, image.width / target_width, image.height / target_height)
+    box = (max(1, round(target_width * scale)), max(1, round(target_height * scale)))
+    thumbnail = ImageOps.fit(image, box, Image.LANCZOS)
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, 'WEBP', **WEBP_OPTIONS)
+    return buffer.getvalue(), box
+
+
+def _write_atomic(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(handle, 'wb') as out:
+        out.write(content)
+    os.replace(temporary, path)
+
+
+def generate(source, size, read=read_source):
+    """
+    Build and store the thumbnail of ``source`` at ``size``; returns its index
+    entry. ``read(source)`` returns the source bytes (pass your own to render
+    from somewhere other than STATIC_URL/http).
+    """
+    data, (width, height) = render(read(source), size)
+    name = f'{hashlib.sha256(data).hexdigest()[:20]}.webp'
+    path = _root() / name
+    if not path.exists():
+        _write_atomic(path, data)
+    entry = {'name': name, 'width': width, 'height': height}
+    _write_atomic(_index_path(_key(source, size)), json.dumps(entry).encode('utf-8'))
+    return entry
+
+
+def _failure_key(source, size):
+    return f'thumbnail:failed:{_key(source, size)}'
+
+
+def ensure(source, size):
+    """Index entry for (source, size), generating it if needed; None if it can't be built."""
+    entry = lookup(source, size)
+    if entry or cache.get(_failure_key(source, size)):
+        return entry
+    try:
+        return generate(source, size)
+    except ThumbnailError as exc:
+        logger.warning("Thumbnail %s of %s failed: %s", size, source, exc)
+        cache.set(_failure_key(source, size), True, getattr(settings, 'THUMBNAIL_FAILURE_TIMEOUT', 600))
+        return None
+
+
+def file_path(name):
+    """Path of a stored thumbnail, or None for names that aren't ours."""
+    if not NAME_RE.match(name):
+        return None
+    path = _root() / name
+    return path if path.is_file() else None
+
+
+def sign(source, size):
+    return signing.dumps([source, size], salt=SIGNING_SALT, compress=True)
+
+
+def unsign(token):
+    """(source, size) from a token made by sign(); raises signing.BadSignature."""
+    source, size = signing.loads(token, salt=SIGNING_SALT)
+    if size not in SIZES:
+        raise signing.BadSignature('Unknown thumbnail size')
+    return source, size
+
+
+def thumbnail_for(source, size):
+    """Thumbnail to render for ``source``: the stored file once it exists, else the signed URL."""
+    if size not in SIZES:
+        raise ValueError(f'Unknown thumbnail size {size!r}; expected one of {", ".join(SIZES)}')
+    entry = lookup(source, size)
+    if entry:
+        return Thumbnail(reverse('thumbnail_file', args=[entry['name']]), entry['width'], entry['height'])
+    width, height = SIZES[size]
+    if cache.get(_failure_key(source, size)):
+        return Thumbnail(source, width, height)
+    return Thumbnail(reverse('thumbnail', args=[sign(source, size)]), width, height)
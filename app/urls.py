@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI (ASYNC_VIEWS) the blog, healthcheck and write endpoints are the
+# coroutine versions from app/async_views.py
+live = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', views.home, name='home'),
-    path('book/', views.book, name='book'),
+    path('book/', live.book, name='book'),
     path('kontakt/', views.contact, name='contact'),
     path('privacy/', views.privacy, name='privacy'),
     path('cookie-policy/', views.cookie_policy, name='cookie_policy'),
@@ -20,9 +25,11 @@ urlpatterns = [
     path('terapia-indywidualna/', views.terapia_indywidualna, name='terapia_indywidualna'),
     path('szkolenia-dla-firm/', views.trainings, name='trainings'),
     path('szkolenia-zapytanie/', views.training_inquiry, name='training_inquiry'),
-    path('blog/', views.blog, name='blog'),
-    path('blog/kategoria/<slug:slug>/', views.blog_category, name='blog_category'),
-    path('blog/<slug:slug>/', views.blog_post_detail, name='blog_post_detail'),
-    path('health/', views.healthcheck, name='healthcheck'),
-    path('api/log-cookie-consent/', views.log_cookie_consent, name='log_cookie_consent'),
+    path('blog/', live.blog, name='blog'),
+    path('blog/kategoria/<slug:slug>/', live.blog_category, name='blog_category'),
+    path('blog/<slug:slug>/', live.blog_post_detail, name='blog_post_detail'),
+    path('thumbs/t/<str:token>/', views.thumbnail, name='thumbnail'),
+    path('thumbs/<str:name>', views.thumbnail_file, name='thumbnail_file'),
+    path('health/', live.healthcheck, name='healthcheck'),
+    path('api/log-cookie-consent/', live.log_cookie_consent, name='log_cookie_consent'),
 ]
@@ -1,38 +1,62 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.shortcuts import render, redirect
+from django.http import FileResponse, Http404, HttpResponse
 from django.utils import timezone
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.core.paginator import Paginator
-from django.db.models import Q, F
+from django.core import signing
 
 from django.views.decorators.http import require_POST
-from django_ratelimit.decorators import ratelimit
+import ipaddress
 import json
-import threading
 import logging
 from .forms import AppointmentForm, DataSubjectRightsForm, TrainingInquiryForm
-from .models import Appointment, DataSubjectRightsRequest, BlogPost, BlogCategory, CookieConsent, TrainingInquiry
+from .models import Appointment, DataSubjectRightsRequest, BlogPost, CookieConsent, TrainingInquiry
+from . import blog_cache, outbox, thumbnails
+from .bot_gate import screen_bots
+from .counters import view_counter
+from .ingest import consent_buffer
+from .page_cache import cached_form_page, cached_page
+from .pagination import KeysetPaginator, PageMoved, cached_count, numbered_links
+from .ratelimit import get_client_ip, ratelimit
+from .search import attach_snippets, search_posts
+from .submissions import contact_fingerprint, find_duplicate, idempotent
 
 logger = logging.getLogger(__name__)
 
 
-def sendAdminNotification(subject, body):
-    """Send an email notification directly to the admin."""
-    try:
-        send_mail(
-            subject=subject,
-            message=body,
-            from_email=settings.EMAIL_FROM,
-            recipient_list=[settings.ADMIN_NOTIFICATION_EMAIL],
-            fail_silently=False,
-        )
-        logger.info("Admin notification sent to %s", settings.ADMIN_NOTIFICATION_EMAIL)
-    except Exception as exc:
-        logger.error("Admin notification failed: %s", exc)
-
-
+def _emailConfigured():
+    return bool(
+        settings.EMAIL_HOST and
+        settings.EMAIL_HOST.strip() and
+        settings.EMAIL_HOST_USER and
+        settings.EMAIL_HOST_USER.strip()
+    )
+
+
+def sendAdminNotification(subject, body, kind):
+    """
+    Queue an email notification to the admin (delivered by run_outbox).
+
+    Unless ``kind`` is listed in ADMIN_DIGEST_URGENT, it is held for the
+    next digest while ADMIN_DIGEST_WINDOW is enabled.
+    """
+    hold = (
+        settings.ADMIN_DIGEST_WINDOW > 0 and
+        kind not in settings.ADMIN_DIGEST_URGENT
+    )
+    outbox.enqueue(
+        subject=subject,
+        body=body,
+        recipients=[settings.ADMIN_NOTIFICATION_EMAIL],
+        kind=f'admin_{kind}',
+        hold=hold,
+    )
+    logger.info("Admin notification queued for %s%s", settings.ADMIN_NOTIFICATION_EMAIL, " (digest)" if hold else "")
+
+
+@cached_form_page
 def home(request):
     form = AppointmentForm()
     return render(request, 'home.html', {'form': form})
@@ -47,65 +71,99 @@ SUBJECT_MAP = {
 }
 
 
-def _sendBookingEmails(name, phone, email, subject_label, created_at, data_processing_consent, marketing_consent):
-    """Send booking emails in a background thread so the user isn't blocked."""
-    try:
-        email_configured = (
-            settings.EMAIL_HOST and
-            settings.EMAIL_HOST.strip() and
-            settings.EMAIL_HOST_USER and
-            settings.EMAIL_HOST_USER.strip()
-        )
-        if not email_configured:
-            logger.info("Email not configured - skipping email notifications")
-            return
-
-        # Send confirmation email to customer
-        if email:
-            send_mail(
-                subject="Potwierdzenie umówienia wizyty - Gabinet Psychologiczny",
-                message=(
-                    f"Szanowni Państwo {name},\n\n"
-                    f"Dziękujemy za umówienie wizyty w naszym gabinecie psychologicznym.\n\n"
-                    f"Szczegóły wizyty:\n"
-                    f"- Imię i nazwisko: {name}\n"
-                    f"- Telefon: {phone}\n"
-                    f"- Email: {email}\n"
-                    f"- Temat: {subject_label}\n\n"
-                    f"Skontaktujemy się z Państwem w ciągu 24 godzin w celu potwierdzenia dokładnego terminu wizyty.\n\n"
-                    f"W razie pytań prosimy o kontakt:\n"
-                    f"- Telefon: +48 606 841 722\n"
-                    f"- Email: {settings.EMAIL_FROM}\n\n"
-                    f"Z poważaniem,\nGabinet Psychologiczny"
-                ),
-                from_email=settings.EMAIL_FROM,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            logger.info("Confirmation email sent to %s", email)
+def _queueBookingEmails(name, phone, email, subject_label, created_at, data_processing_consent, marketing_consent):
+    """Queue booking emails in the outbox; call inside the appointment's transaction."""
+    if not _emailConfigured():
+        logger.info("Email not configured - skipping email notifications")
+        return
 
-        # Send notification to admin
-        sendAdminNotification(
-            subject=f"Nowa wizyta - {name}",
+    # Confirmation email to customer
+    if email:
+        outbox.enqueue(
+            subject="Potwierdzenie umówienia wizyty - Gabinet Psychologiczny",
             body=(
-                f"NOWA WIZYTA UMÓWIONA:\n\n"
-                f"Osoba: {name}\n"
-                f"Telefon: {phone}\n"
-                f"Email: {email or 'Nie podano'}\n"
-                f"Temat: {subject_label}\n"
-                f"Data zgłoszenia: {created_at}\n\n"
-                f"ZGODY RODO:\n"
-                f"- Przetwarzanie danych: {'TAK' if data_processing_consent else 'NIE'}\n"
-                f"- Marketing: {'TAK' if marketing_consent else 'NIE'}\n\n"
-                f"Skontaktuj się z klientem w ciągu 24h."
+                f"Szanowni Państwo {name},\n\n"
+                f"Dziękujemy za umówienie wizyty w naszym gabinecie psychologicznym.\n\n"
+                f"Szczegóły wizyty:\n"
+                f"- Imię i nazwisko: {name}\n"
+                f"- Telefon: {phone}\n"
+                f"- Email: {email}\n"
+                f"- Temat: {subject_label}\n\n"
+                f"Skontaktujemy się z Państwem w ciągu 24 godzin w celu potwierdzenia dokładnego terminu wizyty.\n\n"
+                f"W razie pytań prosimy o kontakt:\n"
+                f"- Telefon: +48 606 841 722\n"
+                f"- Email: {settings.EMAIL_FROM}\n\n"
+                f"Z poważaniem,\nGabinet Psychologiczny"
             ),
+            recipients=[email],
+            kind='booking_confirmation',
+        )
+        logger.info("Confirmation email queued for %s", email)
+
+    # Notification to admin
+    sendAdminNotification(
+        subject=f"Nowa wizyta - {name}",
+        body=(
+            f"NOWA WIZYTA UMÓWIONA:\n\n"
+            f"Osoba: {name}\n"
+            f"Telefon: {phone}\n"
+            f"Email: {email or 'Nie podano'}\n"
+            f"Temat: {subject_label}\n"
+            f"Data zgłoszenia: {created_at}\n\n"
+            f"ZGODY RODO:\n"
+            f"- Przetwarzanie danych: {'TAK' if data_processing_consent else 'NIE'}\n"
+            f"- Marketing: {'TAK' if marketing_consent else 'NIE'}\n\n"
+            f"Skontaktuj się z klientem w ciągu 24h."
+        ),
+        kind='booking',
+    )
+
+
+def _saveBooking(form, raw_subject):
+    """
+    Save the appointment from a valid AppointmentForm and queue its emails
+    atomically. The same booking (contact, name and subject) within
+    SUBMISSION_DEDUP_WINDOW is returned instead of saving and emailing again;
+    another person booked from the same contact is a new booking.
+    """
+    appointment = form.save(commit=False)
+    appointment.subject = (raw_subject or '')[:50]
+    duplicate = find_duplicate(
+        Appointment, contact_fingerprint(appointment.email, appointment.phone),
+        name__iexact=appointment.name.strip(), subject=appointment.subject,
+    )
+    if duplicate is not None:
+        logger.info(f"Appointment resubmitted, keeping ID {duplicate.id}")
+        return duplicate
+    appointment.data_processing_consent = form.cleaned_data.get('data_processing_consent', False)
+    appointment.marketing_consent = form.cleaned_data.get('marketing_consent', False)
+
+    if appointment.marketing_consent:
+        appointment.marketing_consent_date = timezone.now()
+
+    # Subject comes from POST (not a model field)
+    subject_label = SUBJECT_MAP.get(raw_subject, raw_subject or 'Nie podano')
+
+    # Save and queue emails atomically; run_outbox delivers them
+    with transaction.atomic():
+        appointment.save()
+        logger.info(f"Appointment saved successfully: ID {appointment.id}")
+
+        _queueBookingEmails(
+            name=appointment.name,
+            phone=appointment.phone,
+            email=appointment.email or "",
+            subject_label=subject_label,
+            created_at=appointment.created_at.strftime("%d.%m.%Y %H:%M"),
+            data_processing_consent=appointment.data_processing_consent,
+            marketing_consent=appointment.marketing_consent,
         )
-        logger.info("Admin notification sent")
-    except Exception as exc:
-        logger.error("Background email sending failed: %s", exc)
+    return appointment
 
 
-@ratelimit(key='ip', rate='5/m', method='POST', block=True)
+@ratelimit('5/m')
+@idempotent('book')
+@screen_bots
 def book(request):
     if request.method == 'POST':
         logger.info("Booking form submitted")
@@ -115,37 +173,7 @@ def book(request):
         if form.is_valid():
             logger.info("Form is valid")
             try:
-                # Save the appointment with GDPR consent data
-                appointment = form.save(commit=False)
-                appointment.data_processing_consent = form.cleaned_data.get('data_processing_consent', False)
-                appointment.marketing_consent = form.cleaned_data.get('marketing_consent', False)
-
-                if appointment.marketing_consent:
-                    appointment.marketing_consent_date = timezone.now()
-
-                appointment.save()
-                logger.info(f"Appointment saved successfully: ID {appointment.id}")
-
-                # Capture subject from POST (not a model field)
-                raw_subject = request.POST.get('subject', '')
-                subject_label = SUBJECT_MAP.get(raw_subject, raw_subject or 'Nie podano')
-
-                # Send emails in background thread (user gets instant response)
-                thread = threading.Thread(
-                    target=_sendBookingEmails,
-                    kwargs={
-                        "name": appointment.name,
-                        "phone": appointment.phone,
-                        "email": appointment.email or "",
-                        "subject_label": subject_label,
-                        "created_at": appointment.created_at.strftime("%d.%m.%Y %H:%M"),
-                        "data_processing_consent": appointment.data_processing_consent,
-                        "marketing_consent": appointment.marketing_consent,
-                    },
-                    daemon=True,
-                )
-                thread.start()
-
+                _saveBooking(form, request.POST.get('subject', ''))
                 messages.success(request, 'Wizyta została umówiona pomyślnie!')
                 return redirect('thanks')
 
@@ -159,112 +187,150 @@ def book(request):
             return render(request, 'home.html', {'form': form})
     return redirect('home')
 
+@cached_page
 def thanks(request):
     return render(request, 'thanks.html')
 
+@cached_form_page
 def contact(request):
     form = AppointmentForm()
     return render(request, 'contact.html', {'form': form})
 
+@cached_page
 def privacy(request):
     return render(request, 'privacy.html')
 
+@cached_page
 def about_us(request):
     return render(request, 'about_us.html')
 
+@cached_page
 def pricing(request):
     return render(request, 'pricing.html')
 
+@cached_form_page
 def diagnoza_adhd(request):
     form = AppointmentForm()
     return render(request, 'diagnoza_adhd.html', {'form': form})
 
+@cached_form_page
 def diagnoza_autyzmu(request):
     form = AppointmentForm()
     return render(request, 'diagnoza_autyzmu.html', {'form': form})
 
+@cached_form_page
 def wsparcie_online(request):
     form = AppointmentForm()
     return render(request, 'wsparcie_online.html', {'form': form})
 
+@cached_form_page
 def konsultacje(request):
     form = AppointmentForm()
     return render(request, 'konsultacje.html', {'form': form})
 
+@cached_form_page
 def tus(request):
     form = AppointmentForm()
     return render(request, 'tus.html', {'form': form})
 
+@cached_form_page
 def terapia_indywidualna(request):
     form = AppointmentForm()
     return render(request, 'terapia_indywidualna.html', {'form': form})
 
+@cached_form_page
 def trainings(request):
     form = TrainingInquiryForm()
     return render(request, 'trainings.html', {'form': form})
 
 
-def _sendTrainingInquiryEmails(name, company, email, phone, subject, message, created_at):
-    """Send training inquiry notification to admin in background."""
-    try:
-        email_configured = (
-            settings.EMAIL_HOST and
-            settings.EMAIL_HOST.strip() and
-            settings.EMAIL_HOST_USER and
-            settings.EMAIL_HOST_USER.strip()
-        )
-        if not email_configured:
-            logger.info("Email not configured - skipping training inquiry notification")
-            return
-
-        contact_info = []
-        if email:
-            contact_info.append(f"Email: {email}")
-        if phone:
-            contact_info.append(f"Telefon: {phone}")
-
-        sendAdminNotification(
-            subject=f"Zapytanie szkoleniowe - {company}",
+def _queueTrainingInquiryEmails(name, company, email, phone, subject, message, created_at):
+    """Queue training inquiry emails in the outbox; call inside the inquiry's transaction."""
+    if not _emailConfigured():
+        logger.info("Email not configured - skipping training inquiry notification")
+        return
+
+    contact_info = []
+    if email:
+        contact_info.append(f"Email: {email}")
+    if phone:
+        contact_info.append(f"Telefon: {phone}")
+
+    sendAdminNotification(
+        subject=f"Zapytanie szkoleniowe - {company}",
+        body=(
+            f"NOWE ZAPYTANIE SZKOLENIOWE:\n\n"
+            f"Firma: {company}\n"
+            f"Osoba kontaktowa: {name}\n"
+            f"{chr(10).join(contact_info)}\n"
+            f"Temat: {subject}\n"
+            f"Data zgłoszenia: {created_at}\n"
+            f"\nWiadomość:\n{message or '(brak)'}\n\n"
+            f"Skontaktuj się z klientem w ciągu 24h."
+        ),
+        kind='training_inquiry',
+    )
+
+    # Confirmation to client if email provided
+    if email:
+        outbox.enqueue(
+            subject="Potwierdzenie zapytania szkoleniowego - Spektrum Umysłu",
             body=(
-                f"NOWE ZAPYTANIE SZKOLENIOWE:\n\n"
-                f"Firma: {company}\n"
-                f"Osoba kontaktowa: {name}\n"
-                f"{chr(10).join(contact_info)}\n"
-                f"Temat: {subject}\n"
-                f"Data zgłoszenia: {created_at}\n"
-                f"\nWiadomość:\n{message or '(brak)'}\n\n"
-                f"Skontaktuj się z klientem w ciągu 24h."
+                f"Szanowni Państwo,\n\n"
+                f"Dziękujemy za zainteresowanie naszą ofertą szkoleniową.\n\n"
+                f"Szczegóły zapytania:\n"
+                f"- Firma: {company}\n"
+                f"- Temat: {subject}\n\n"
+                f"Skontaktujemy się z Państwem w ciągu 24 godzin.\n\n"
+                f"W razie pytań prosimy o kontakt:\n"
+                f"- Telefon: +48 606 841 722\n"
+                f"- Email: {settings.EMAIL_FROM}\n\n"
+                f"Z poważaniem,\nSpektrum Umysłu"
             ),
+            recipients=[email],
+            kind='training_inquiry_confirmation',
         )
-
-        # Send confirmation to client if email provided
-        if email:
-            send_mail(
-                subject="Potwierdzenie zapytania szkoleniowego - Spektrum Umysłu",
-                message=(
-                    f"Szanowni Państwo,\n\n"
-                    f"Dziękujemy za zainteresowanie naszą ofertą szkoleniową.\n\n"
-                    f"Szczegóły zapytania:\n"
-                    f"- Firma: {company}\n"
-                    f"- Temat: {subject}\n\n"
-                    f"Skontaktujemy się z Państwem w ciągu 24 godzin.\n\n"
-                    f"W razie pytań prosimy o kontakt:\n"
-                    f"- Telefon: +48 606 841 722\n"
-                    f"- Email: {settings.EMAIL_FROM}\n\n"
-                    f"Z poważaniem,\nSpektrum Umysłu"
-                ),
-                from_email=settings.EMAIL_FROM,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-            logger.info("Training inquiry confirmation sent to %s", email)
-
-        logger.info("Training inquiry admin notification sent")
-    except Exception as exc:
-        logger.error("Training inquiry email failed: %s", exc)
+        logger.info("Training inquiry confirmation queued for %s", email)
+
+
+def _saveTrainingInquiry(form):
+    """
+    Save a valid TrainingInquiryForm and queue its emails atomically; the same
+    inquiry (contact, subject and message) within SUBMISSION_DEDUP_WINDOW is
+    returned instead of saving and emailing again.
+    """
+    inquiry = form.save(commit=False)
+    inquiry.data_processing_consent = form.cleaned_data.get("data_processing_consent", False)
+    duplicate = find_duplicate(
+        TrainingInquiry, contact_fingerprint(inquiry.email, inquiry.phone),
+        subject=inquiry.subject, message=inquiry.message,
+    )
+    if duplicate is not None:
+        logger.info(f"Training inquiry resubmitted, keeping ID {duplicate.id}")
+        return duplicate
+
+    subject_label = dict(TrainingInquiry.SUBJECT_CHOICES).get(inquiry.subject, inquiry.subject)
+
+    # Save and queue emails atomically; run_outbox delivers them
+    with transaction.atomic():
+        inquiry.save()
+        logger.info(f"Training inquiry saved: ID {inquiry.id}")
+
+        _queueTrainingInquiryEmails(
+            name=inquiry.name,
+            company=inquiry.company,
+            email=inquiry.email or "",
+            phone=inquiry.phone or "",
+            subject=subject_label,
+            message=inquiry.message,
+            created_at=inquiry.created_at.strftime("%d.%m.%Y %H:%M"),
+        )
+    return inquiry
 
 
-@ratelimit(key="ip", rate="5/m", method="POST", block=True)
+@ratelimit("5/m")
+@idempotent("training_inquiry")
+@screen_bots
 def training_inquiry(request):
     if request.method == "POST":
         logger.info("Training inquiry form submitted")
@@ -273,30 +339,7 @@ def training_inquiry(request):
         if form.is_valid():
             logger.info("Training inquiry form is valid")
             try:
-                inquiry = form.save(commit=False)
-                inquiry.data_processing_consent = form.cleaned_data.get("data_processing_consent", False)
-                inquiry.save()
-                logger.info(f"Training inquiry saved: ID {inquiry.id}")
-
-                subject_label = dict(TrainingInquiry.SUBJECT_CHOICES).get(
-                    inquiry.subject, inquiry.subject
-                )
-
-                thread = threading.Thread(
-                    target=_sendTrainingInquiryEmails,
-                    kwargs={
-                        "name": inquiry.name,
-                        "company": inquiry.company,
-                        "email": inquiry.email or "",
-                        "phone": inquiry.phone or "",
-                        "subject": subject_label,
-                        "message": inquiry.message,
-                        "created_at": inquiry.created_at.strftime("%d.%m.%Y %H:%M"),
-                    },
-                    daemon=True,
-                )
-                thread.start()
-
+                _saveTrainingInquiry(form)
                 messages.success(request, "Dziękujemy! Twoje zapytanie zostało wysłane. Skontaktujemy się w ciągu 24h.")
                 return redirect("thanks")
 
@@ -310,6 +353,13 @@ def training_inquiry(request):
             return render(request, "trainings.html", {"form": form})
     return redirect("trainings")
 
+def _searchPage(posts, search_query, params):
+    """(page, total, pagination links) for ranked search results, numbered pages."""
+    paginator = Paginator(posts, 6)  # 6 posts per page
+    page_obj = paginator.get_page(params.get('page'))
+    page_obj.object_list = attach_snippets(page_obj.object_list, search_query)
+    return page_obj, paginator.count, numbered_links(page_obj, params)
+
 def blog(request):
     # Get filters from request
     category_slug = request.GET.get('category', '')
@@ -323,50 +373,62 @@ def blog(request):
         posts = posts.filter(category__slug=category_slug)
     
     if search_query:
-        posts = posts.filter(
-            Q(title__icontains=search_query) |
-            Q(excerpt__icontains=search_query) |
-            Q(content__icontains=search_query) |
-            Q(meta_keywords__icontains=search_query)
-        )
+        # Ranked full-text search (FTS5 / tsvector, see app/search.py)
+        posts = search_posts(posts, search_query)
     
-    # Pagination
-    paginator = Paginator(posts, 6)  # 6 posts per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination: ranked search results keep numbered pages, plain listings
+    # use keyset pagination on (published_at, id) with a cached total
+    if search_query:
+        page_obj, total_posts, pagination = _searchPage(posts, search_query, request.GET)
+    else:
+        total_posts = cached_count(posts, f'category={category_slug}')
+        paginator = KeysetPaginator(posts, 6, total_posts)
+        try:
+            page_obj = paginator.page(request.GET)
+        except PageMoved as moved:
+            return redirect(f'{request.path}{moved.query}')
+        pagination = paginator.links(page_obj, request.GET)
     
-    # Get categories for filter sidebar
-    categories = BlogCategory.objects.all()
+    # Get categories for filter sidebar (cached, with post counts)
+    categories = blog_cache.get_categories()
     
     # Get selected category for display
     selected_category = None
     if category_slug:
-        selected_category = get_object_or_404(BlogCategory, slug=category_slug)
+        selected_category = blog_cache.get_category(category_slug)
+        if selected_category is None:
+            raise Http404
     
     context = {
         'page_obj': page_obj,
         'categories': categories,
         'selected_category': selected_category,
         'search_query': search_query,
-        'total_posts': posts.count(),
+        'total_posts': total_posts,
+        'pagination': pagination,
     }
     
     return render(request, 'blog.html', context)
 
 def blog_post_detail(request, slug):
-    post = get_object_or_404(BlogPost, slug=slug, status='published')
+    # Post, related and recent lists come from the read-model cache (app/blog_cache.py)
+    post = blog_cache.get_post(slug)
+    if post is None:
+        raise Http404
+
+    # Stored HTML is stale only after the sanitize allowlist changed
+    if post.needs_render:
+        post.refresh_rendered_content()
+        blog_cache.invalidate_post(post)
     
-    # Increment view count
-    BlogPost.objects.filter(pk=post.pk).update(views_count=F('views_count') + 1)
+    # Increment view count (buffered, flushed in bulk — see app/counters.py)
+    view_counter.hit(post.pk)
     
     # Get related posts (same category, excluding current post)
-    related_posts = BlogPost.objects.filter(
-        status='published',
-        category=post.category
-    ).exclude(pk=post.pk)[:3] if post.category else []
+    related_posts = blog_cache.get_related_posts(post)
     
     # Get recent posts for sidebar
-    recent_posts = BlogPost.objects.filter(status='published').exclude(pk=post.pk)[:5]
+    recent_posts = blog_cache.get_recent_posts(exclude=post.pk)
     
     context = {
         'post': post,
@@ -377,28 +439,60 @@ def blog_post_detail(request, slug):
     return render(request, 'blog_post_detail.html', context)
 
 def blog_category(request, slug):
-    category = get_object_or_404(BlogCategory, slug=slug)
-    posts = BlogPost.objects.filter(category=category, status='published')
+    category = blog_cache.get_category(slug)
+    if category is None:
+        raise Http404
+    posts = BlogPost.objects.filter(category=category, status='published').select_related('category')
     
-    # Pagination
-    paginator = Paginator(posts, 6)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination with a cached total (see app/pagination.py)
+    total_posts = cached_count(posts, f'category={category.slug}')
+    paginator = KeysetPaginator(posts, 6, total_posts)
+    try:
+        page_obj = paginator.page(request.GET)
+    except PageMoved as moved:
+        return redirect(f'{request.path}{moved.query}')
     
     context = {
         'category': category,
         'page_obj': page_obj,
+        'pagination': paginator.links(page_obj, request.GET),
+        'total_posts': total_posts,
     }
     
     return render(request, 'blog_category.html', context)
 
+def thumbnail(request, token):
+    # First request for a featured image size: build it (app/thumbnails.py), then
+    # send the browser to the content-hashed file
+    try:
+        source, size = thumbnails.unsign(token)
+    except signing.BadSignature:
+        raise Http404
+    entry = thumbnails.ensure(source, size)
+    # The source was signed by us, so falling back to it isn't an open redirect
+    response = redirect('thumbnail_file', entry['name']) if entry else redirect(source)
+    response['Cache-Control'] = 'public, max-age=86400' if entry else 'no-cache'
+    return response
+
+def thumbnail_file(request, name):
+    path = thumbnails.file_path(name)
+    if path is None:
+        raise Http404
+    response = FileResponse(path.open('rb'), content_type='image/webp')
+    # Names are content hashes, so a stored file never changes
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@cached_page
 def cookie_policy(request):
     return render(request, 'cookie_policy.html')
 
+@cached_page
 def terms(request):
     return render(request, 'terms.html')
 
-@ratelimit(key='ip', rate='3/m', method='POST', block=True)
+@ratelimit('3/m')
+@screen_bots
 def data_subject_rights(request):
     if request.method == 'POST':
         form = DataSubjectRightsForm(request.POST)
@@ -417,21 +511,15 @@ def data_subject_rights(request):
                 details=form.cleaned_data.get('details', ''),
                 privacy_consent=form.cleaned_data['privacy_consent']
             )
-            dsr_request.save()
-            
-            # Send confirmation email to user
-            try:
-                email_configured = (
-                    settings.EMAIL_HOST and
-                    settings.EMAIL_HOST.strip() and
-                    settings.EMAIL_HOST_USER and
-                    settings.EMAIL_HOST_USER.strip()
-                )
-
-                if email_configured:
-                    send_mail(
+            # Save and queue emails atomically; run_outbox delivers them
+            with transaction.atomic():
+                dsr_request.save()
+
+                if _emailConfigured():
+                    # Confirmation email to user
+                    outbox.enqueue(
                         subject=f'Potwierdzenie żądania RODO - {dsr_request.tracking_number}',
-                        message=f"""
+                        body=f"""
 Szanowni Państwo,
 
 Potwierdzamy otrzymanie Państwa żądania dotyczącego realizacji praw wynikających z RODO.
@@ -447,12 +535,11 @@ W razie pytań prosimy o kontakt pod adresem email lub telefonicznie.
 Z poważaniem,
 {getattr(settings, 'SITE_NAME', 'Gabinet Psychologiczny')}
                         """,
-                        from_email=settings.EMAIL_FROM,
-                        recipient_list=[dsr_request.email],
-                        fail_silently=False,
+                        recipients=[dsr_request.email],
+                        kind='dsr_confirmation',
                     )
-                    
-                    # Send notification to admin
+
+                    # Notification to admin
                     sendAdminNotification(
                         subject=f"Nowe żądanie RODO - {dsr_request.tracking_number}",
                         body=(
@@ -464,9 +551,8 @@ Z poważaniem,
                             f"Telefon: {dsr_request.phone or 'Nie podano'}\n\n"
                             f"Szczegóły w panelu administracyjnym."
                         ),
+                        kind='dsr',
                     )
-            except Exception:
-                pass
             
             messages.success(
                 request, 
@@ -483,49 +569,66 @@ Z poważaniem,
     
     return render(request, 'data_subject_rights.html', {'form': form})
 
-def healthcheck(request):
-    """Health check endpoint — returns only ok/error, no internal details."""
+def _pingDatabase():
     from django.db import connection
 
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
 
+def healthcheck(request):
+    """Health check endpoint — returns only ok/error, no internal details."""
+    try:
+        _pingDatabase()
         return HttpResponse("ok", content_type="text/plain", status=200)
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return HttpResponse("error", content_type="text/plain", status=500)
 
-@ratelimit(key='ip', rate='10/m', method='POST', block=True)
-@require_POST
-def log_cookie_consent(request):
-    """Log user's cookie consent decision to database for audit trail"""
-    try:
-        data = json.loads(request.body)
-        analytics_consent = data.get('analytics', False)
-
-        # Get client information for audit
-        ip_address = get_client_ip(request)
-        user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
-        session_key = request.session.session_key or ''
-
-        # Create consent log
-        CookieConsent.objects.create(
-            analytics_consent=analytics_consent,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            session_key=session_key
-        )
-
-        return JsonResponse({'status': 'success'})
-    except Exception as e:
-        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+def _consentFromRequest(request):
+    """Unsaved CookieConsent for a consent beacon, or None if it is malformed."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return None
+        analytics = data.get('analytics', False) if isinstance(data, dict) else None
+    else:
+        analytics = request.POST.get('analytics')
 
-def get_client_ip(request):
-    """Helper function to get client's IP address"""
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
+    if analytics in (True, '1', 'true'):
+        analytics_consent = True
+    elif analytics in (False, '0', 'false'):
+        analytics_consent = False
     else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+        return None
+
+    # Get client information for audit (invalid IPs would fail the whole batch)
+    ip_address = get_client_ip(request)
+    try:
+        ip_address = str(ipaddress.ip_address((ip_address or '').strip()))
+    except ValueError:
+        ip_address = None
+
+    return CookieConsent(
+        analytics_consent=analytics_consent,
+        ip_address=ip_address,
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
+        session_key=request.session.session_key or '',
+        consented_at=timezone.now(),
+    )
+
+@ratelimit('10/m')
+@require_POST
+def log_cookie_consent(request):
+    """
+    Log user's cookie consent decision for the audit trail.
+
+    Accepts a navigator.sendBeacon form post (or the older JSON body),
+    queues the record for a batched insert (see app/ingest.py) and
+    returns 204 straight away.
+    """
+    consent = _consentFromRequest(request)
+    if consent is None:
+        return HttpResponse(status=400)
+    consent_buffer.add(consent)
+    return HttpResponse(status=204)
@@ -1,10 +1,27 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.http import HttpResponsePermanentRedirect
+from whitenoise.middleware import WhiteNoiseMiddleware
+
 
 class DomainRedirectMiddleware:
+    # Usable in the ASGI stack without pushing async views onto a thread
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.redirect(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.redirect(request) or await self.get_response(request)
+
+    def redirect(self, request):
         host = request.get_host().lower()
         
         # Split host from port if present
@@ -26,5 +43,44 @@ class DomainRedirectMiddleware:
         if hostname in redirect_sources:
             new_url = f"https://{target_domain}{request.get_full_path()}"
             return HttpResponsePermanentRedirect(new_url)
+        return None
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that can also sit in an async middleware chain."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # Opening, stat()ing and reading the file happen in a thread
+            response = await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+            file = getattr(response, 'file_to_stream', None)
+            if file is not None:
+                response.streaming_content = _read_chunks(file, response.block_size)
+            return response
+        return await self.get_response(request)
+
 
-        return self.get_response(request)
+async def _read_chunks(file, block_size):
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(block_size):
+            yield chunk
+    finally:
+        file.close()
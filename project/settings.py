@@ -60,7 +60,8 @@ MIDDLEWARE = [
     'project.middleware.DomainRedirectMiddleware',  # Custom domain redirection (Must be first to handle SSL+Domain)
     'django.middleware.security.SecurityMiddleware',
     'csp.middleware.CSPMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'project.middleware.StaticFilesMiddleware',  # WhiteNoise, async-capable
+    'app.metrics.MetricsMiddleware',  # Per-view latency, status and query metrics (not static files)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +70,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Serve the blog, healthcheck and form endpoints with the async views in
+# app/async_views.py. project/asgi.py turns this on; WSGI keeps the sync views
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
@@ -83,6 +88,8 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'app.context_processors.site_settings',
+                'app.context_processors.csrf_placeholder',
+                'app.context_processors.form_tokens',
             ],
         },
     },
@@ -98,6 +105,87 @@ DATABASES = {
     'default': env.db('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
 }
 
+# Cache: per-process LRU in front of an SQLite file shared by every worker on
+# the host (app/cache_backends.py); invalidations reach all workers
+CACHE_DIR = Path(env('CACHE_DIR', default=str(BASE_DIR / 'cache')))
+CACHES = {
+    'default': {
+        'BACKEND': 'app.cache_backends.TieredCache',
+        'LOCATION': CACHE_DIR / 'cache.sqlite3',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('CACHE_MAX_ENTRIES', default=20000),
+            'LOCAL_MAX_ENTRIES': env.int('CACHE_LOCAL_MAX_ENTRIES', default=1000),
+            'LOCAL_MAX_BYTES': env.int('CACHE_LOCAL_MAX_BYTES', default=8 * 1024 * 1024),
+            'LOCAL_TIMEOUT': env.int('CACHE_LOCAL_TIMEOUT', default=60),
+        },
+    }
+}
+
+# Blog full-text search: PostgreSQL text search config (falls back to 'simple'
+# when the config is not installed). SQLite uses FTS5 and ignores this.
+BLOG_SEARCH_CONFIG = env('BLOG_SEARCH_CONFIG', default='polish')
+
+# Blog view counter: hits are buffered in the cache and written in one bulk
+# UPDATE per interval (seconds) or threshold (hits per worker)
+VIEW_COUNT_FLUSH_INTERVAL = env.int('VIEW_COUNT_FLUSH_INTERVAL', default=30)
+VIEW_COUNT_FLUSH_THRESHOLD = env.int('VIEW_COUNT_FLUSH_THRESHOLD', default=50)
+
+# Cookie-consent audit log: records are buffered per worker and written with
+# bulk_create every interval (seconds) or once a batch is full
+CONSENT_BATCH_SIZE = env.int('CONSENT_BATCH_SIZE', default=100)
+CONSENT_FLUSH_INTERVAL = env.int('CONSENT_FLUSH_INTERVAL', default=5)
+CONSENT_BUFFER_MAX = env.int('CONSENT_BUFFER_MAX', default=2000)
+
+# Cookie-consent retention (`manage.py prune_cookie_consents`): older rows are
+# archived as monthly .jsonl.gz files and deleted
+CONSENT_RETENTION_DAYS = env.int('CONSENT_RETENTION_DAYS', default=730)
+CONSENT_ARCHIVE_DIR = env('CONSENT_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'cookie_consents'))
+
+# Sitemap: cached XML (invalidated on blog changes); switches to a sitemap
+# index with per-section files past this many URLs
+SITEMAP_CACHE_TIMEOUT = env.int('SITEMAP_CACHE_TIMEOUT', default=3600)
+SITEMAP_INDEX_THRESHOLD = env.int('SITEMAP_INDEX_THRESHOLD', default=500)
+
+# Blog listings: numbered ?page=N links for the first pages, cursor links
+# after that; totals are cached until a post changes
+BLOG_NUMBERED_PAGES = env.int('BLOG_NUMBERED_PAGES', default=5)
+BLOG_COUNT_CACHE_TIMEOUT = env.int('BLOG_COUNT_CACHE_TIMEOUT', default=600)
+
+# Blog read models (post by slug, related, recent, categories); entries are
+# dropped by signals on change, the timeout is a safety net
+BLOG_CACHE_TIMEOUT = env.int('BLOG_CACHE_TIMEOUT', default=300)
+
+# Bot gate in front of the form views (app/bot_gate.py): submits faster than
+# MIN_SECONDS after the page was served, honeypots, forged tokens and repeated
+# payloads are rejected before the form is built; clients reaching BLOCK_SCORE
+# points within SCORE_WINDOW seconds are turned away outright
+BOT_GATE_ENABLED = env.bool('BOT_GATE_ENABLED', default=True)
+BOT_GATE_MIN_SECONDS = env.int('BOT_GATE_MIN_SECONDS', default=3)
+BOT_GATE_TOKEN_MAX_AGE = env.int('BOT_GATE_TOKEN_MAX_AGE', default=86400)
+BOT_GATE_DUPLICATE_LIMIT = env.int('BOT_GATE_DUPLICATE_LIMIT', default=2)
+BOT_GATE_DUPLICATE_WINDOW = env.int('BOT_GATE_DUPLICATE_WINDOW', default=3600)
+BOT_GATE_BLOCK_SCORE = env.int('BOT_GATE_BLOCK_SCORE', default=10)
+BOT_GATE_SCORE_WINDOW = env.int('BOT_GATE_SCORE_WINDOW', default=3600)
+
+# Booking/training inquiry resubmits (same form submission key, or same
+# contact) within this many seconds get the first one's redirect instead of a
+# second row and email; a retry waits up to SUBMISSION_WAIT seconds for the
+# first POST to finish
+SUBMISSION_DEDUP_WINDOW = env.int('SUBMISSION_DEDUP_WINDOW', default=600)
+SUBMISSION_WAIT = env.int('SUBMISSION_WAIT', default=3)
+
+# Prometheus metrics (app/metrics.py): each process adds its samples to a file
+# shared by every worker on the host every FLUSH_INTERVAL seconds. /metrics
+# needs "Authorization: Bearer <METRICS_TOKEN>" and is a 404 without a token
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+METRICS_PATH = Path(env('METRICS_PATH', default=str(CACHE_DIR / 'metrics.sqlite3')))
+METRICS_FLUSH_INTERVAL = env.int('METRICS_FLUSH_INTERVAL', default=5)
+
+# Full-page cache for static marketing/legal pages; keyed by the static
+# manifest hash, so a deploy invalidates it
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=86400)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -135,7 +223,41 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'app' / 'static']
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# STATICFILES_STORAGE was removed in Django 5.1; STORAGES is what takes effect.
+# The staticfiles backend is WhiteNoise's compressed manifest storage plus the
+# CSS bundles below, built during collectstatic
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'app.storage.BundlingStaticFilesStorage'},
+}
+
+# bundle path: entry stylesheet whose @import graph it inlines. Templates
+# link the bundle via {% stylesheet %} unless DEBUG is on
+CSS_BUNDLES = {
+    'css/main.bundle.css': 'css/main.css',
+}
+
+# Images resized to these widths (AVIF, WebP and original format) during
+# collectstatic; rendered with {% responsive_img %}
+RESPONSIVE_IMAGE_SOURCES = ['images/*.jpg', 'images/*.JPG', 'images/*.png']
+RESPONSIVE_IMAGE_WIDTHS = [64, 128, 240, 320, 480, 640, 960, 1280]
+
+# Blog featured image thumbnails (app/thumbnails.py): WebP files generated on
+# first request and stored here under their content hash
+THUMBNAIL_ROOT = Path(env('THUMBNAIL_ROOT', default=str(BASE_DIR / 'thumbnails')))
+THUMBNAIL_FETCH_TIMEOUT = env.int('THUMBNAIL_FETCH_TIMEOUT', default=5)
+THUMBNAIL_MAX_SOURCE_BYTES = env.int('THUMBNAIL_MAX_SOURCE_BYTES', default=10 * 1024 * 1024)
+THUMBNAIL_FAILURE_TIMEOUT = env.int('THUMBNAIL_FAILURE_TIMEOUT', default=600)
+
+# Web fonts, self-hosted once `manage.py subset_fonts` has written
+# app/static/fonts/ (see app/fonts.py): family: weights used by the CSS, and
+# the faces preloaded in <head> (body text and headings)
+WEB_FONTS = {
+    'Poppins': [400, 500, 600, 700],
+    'Inter': [400, 500, 600, 700],
+}
+WEB_FONT_PRELOAD = [('Inter', 400), ('Poppins', 600)]
+SELF_HOSTED_FONTS = (BASE_DIR / 'app' / 'static' / 'fonts' / 'fonts.json').exists()
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -165,7 +287,7 @@ CONTENT_SECURITY_POLICY = {
         'script-src': ["'self'", "'unsafe-inline'", 'https://www.googletagmanager.com', 'https://www.google-analytics.com'],
         'style-src': ["'self'", "'unsafe-inline'"],
         'img-src': ["'self'", 'data:', 'https://www.google-analytics.com', 'https://www.googletagmanager.com'],
-        'font-src': ["'self'", 'https://fonts.gstatic.com'],
+        'font-src': ["'self'"] if SELF_HOSTED_FONTS else ["'self'", 'https://fonts.gstatic.com'],
         'connect-src': ["'self'", 'https://www.google-analytics.com', 'https://www.googletagmanager.com'],
         'frame-src': ["'none'"],
         'object-src': ["'none'"],
@@ -175,7 +297,8 @@ CONTENT_SECURITY_POLICY = {
 }
 
 # Email (Zoho Mail SMTP)
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Pooled backend keeps authenticated SMTP connections open between sends
+EMAIL_BACKEND = env("EMAIL_BACKEND", default="app.mail_backends.PooledSMTPBackend")
 EMAIL_HOST = env("EMAIL_HOST", default="smtp.zoho.eu")
 EMAIL_HOST_USER = env("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = env("EMAIL_HOST_PASSWORD", default="")
@@ -183,8 +306,23 @@ EMAIL_PORT = env.int("EMAIL_PORT", default=465)
 EMAIL_USE_SSL = True
 EMAIL_TIMEOUT = 10
 EMAIL_FROM = env("EMAIL_FROM", default="no-reply@example.com")
+EMAIL_POOL_SIZE = env.int("EMAIL_POOL_SIZE", default=2)  # connections per process
+EMAIL_POOL_CONCURRENCY = env.int("EMAIL_POOL_CONCURRENCY", default=2)  # parallel sends per batch
+EMAIL_POOL_MAX_IDLE = env.int("EMAIL_POOL_MAX_IDLE", default=60)  # seconds before reconnecting
 ADMIN_NOTIFICATION_EMAIL = "jakub.lewandowski@spektrumumyslu.pl"
 
+# Email outbox (delivered by `manage.py run_outbox`): retry n waits
+# base * 2^(n-1) seconds up to the cap, then the message is dead-lettered
+OUTBOX_MAX_ATTEMPTS = env.int("OUTBOX_MAX_ATTEMPTS", default=8)
+OUTBOX_RETRY_BASE_SECONDS = env.int("OUTBOX_RETRY_BASE_SECONDS", default=60)
+OUTBOX_RETRY_MAX_SECONDS = env.int("OUTBOX_RETRY_MAX_SECONDS", default=6 * 60 * 60)
+
+# Admin notification digest: hold notifications and send one summary per
+# window (seconds, 0 = send each one immediately). Urgent kinds always go out
+# on their own. Kinds: 'booking', 'training_inquiry', 'dsr'.
+ADMIN_DIGEST_WINDOW = env.int("ADMIN_DIGEST_WINDOW", default=0)
+ADMIN_DIGEST_URGENT = env.list("ADMIN_DIGEST_URGENT", default=["dsr"])
+
 # GA4 id passed to templates via context processor
 GA_MEASUREMENT_ID = env('GA_MEASUREMENT_ID', default='')
 
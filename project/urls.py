@@ -17,20 +17,17 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
-from django.contrib.sitemaps.views import sitemap
-from app.sitemaps import StaticViewSitemap, BlogPostSitemap, BlogCategorySitemap
-
-sitemaps = {
-    'static': StaticViewSitemap,
-    'blog': BlogPostSitemap,
-    'categories': BlogCategorySitemap,
-}
+from app.metrics import metrics_view
+from app.sitemaps import cached_sitemap
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('app.urls')),
     # robots.txt as plain text template
     path('robots.txt', TemplateView.as_view(template_name="robots.txt", content_type="text/plain"), name='robots'),
-    # sitemap
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    # sitemap (cached; becomes a sitemap index once the blog grows)
+    path('sitemap.xml', cached_sitemap, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap-<str:section>.xml', cached_sitemap, name='sitemap_section'),
+    # Prometheus scrape endpoint (bearer token, see METRICS_TOKEN)
+    path('metrics', metrics_view, name='metrics'),
 ]